@@ -0,0 +1,108 @@
+import argparse
+import os
+import random
+from typing import List
+
+"""
+Synthetic Corpus Generator
+--------------------------
+Writes a reproducible corpus of markdown files for the benchmarks. The text is built
+from a fixed vocabulary with a Zipf-like word distribution, split into headings and
+paragraphs, and every file gets a few unique identifiers (e.g. 'ERR-12-4711'), so lexical
+and dense retrieval both have something to find. The size scales from a few MB to
+several GB; files are written one at a time, so memory use stays constant.
+
+Usage (from the project directory):
+    python -m benchmarks.corpus --size-mb 100 --output-dir ./bench_corpus
+"""
+
+TOPICS = [
+    "retrieval", "embedding", "vector", "index", "cache", "latency", "throughput", "model",
+    "prompt", "context", "token", "chunk", "document", "query", "answer", "pipeline",
+    "batch", "memory", "storage", "network", "cluster", "shard", "replica", "schema",
+]
+FILLERS = [
+    "the", "a", "of", "and", "to", "in", "is", "for", "with", "on", "that", "by", "this",
+    "are", "from", "as", "be", "it", "can", "when", "each", "which", "more", "than",
+]
+VERBS = [
+    "stores", "returns", "improves", "reduces", "measures", "splits", "encodes", "ranks",
+    "merges", "loads", "writes", "reads", "updates", "filters", "compresses", "balances",
+]
+
+
+def make_sentence(rng: random.Random, vocabulary: List[str]) -> str:
+    """Returns one sentence of 8 to 20 words."""
+    words = []
+    for _ in range(rng.randint(8, 20)):
+        pick = rng.random()
+        if pick < 0.45:
+            words.append(rng.choice(FILLERS))
+        elif pick < 0.6:
+            words.append(rng.choice(VERBS))
+        else:
+            # Zipf-like: low indices of the vocabulary are much more frequent
+            words.append(vocabulary[min(int(rng.paretovariate(1.2)) - 1, len(vocabulary) - 1)])
+    return " ".join(words).capitalize() + "."
+
+
+def make_document(rng: random.Random, vocabulary: List[str], size_bytes: int, doc_idx: int) -> str:
+    """Returns a markdown document of about size_bytes characters."""
+    parts = [f"# {rng.choice(TOPICS).capitalize()} notes {doc_idx}\n"]
+    length = len(parts[0])
+    while length < size_bytes:
+        if rng.random() < 0.1:
+            part = f"\n## {rng.choice(TOPICS).capitalize()} {rng.choice(TOPICS)}\n"
+        else:
+            sentences = [make_sentence(rng, vocabulary) for _ in range(rng.randint(2, 6))]
+            if rng.random() < 0.05:
+                sentences.append(f"Error ERR-{doc_idx}-{rng.randint(1000, 9999)} is raised by {rng.choice(TOPICS)}.")
+            part = "\n" + " ".join(sentences) + "\n"
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)
+
+
+def generate_corpus(output_dir: str, size_mb: float, file_size_kb: int = 64, seed: int = 0) -> int:
+    """
+    Writes the corpus.
+
+    Args:
+        output_dir: Directory of the markdown files
+        size_mb: Total size of the corpus in MB
+        file_size_kb: Approximate size of one file in KB
+        seed: Random seed, the same seed always produces the same corpus
+
+    Returns:
+        Number of written files
+    """
+    rng = random.Random(seed)
+    vocabulary = TOPICS + [f"{rng.choice(TOPICS)}{suffix}" for suffix in range(2000)]
+    os.makedirs(output_dir, exist_ok=True)
+    total_bytes = int(size_mb * 1024 * 1024)
+    file_bytes = file_size_kb * 1024
+    written = 0
+    doc_idx = 0
+    while written < total_bytes:
+        text = make_document(rng, vocabulary, min(file_bytes, total_bytes - written), doc_idx)
+        with open(os.path.join(output_dir, f"doc_{doc_idx:06d}.md"), "w", encoding="utf-8") as file:
+            file.write(text)
+        written += len(text)
+        doc_idx += 1
+    return doc_idx
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic markdown corpus")
+    parser.add_argument("--size-mb", type=float, default=10, help="Total size of the corpus in MB")
+    parser.add_argument("--file-size-kb", type=int, default=64, help="Approximate size of one file in KB")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output-dir", default="./bench_corpus", help="Directory of the generated files")
+    args = parser.parse_args()
+
+    files = generate_corpus(args.output_dir, args.size_mb, args.file_size_kb, args.seed)
+    print(f"Wrote {files} files ({args.size_mb} MB) to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+import numpy as np
+from benchmarks.corpus import TOPICS, make_document
+from benchmarks.hnswtuning import directory_bytes
+from benchmarks.suite import sample_queries
+
+"""
+Deduplication Benchmark
+-----------------------
+Ingests a synthetic corpus with boilerplate and copied documents once per deduplication
+mode (DEDUPLICATION=none, exact, near) and reports, for every mode:
+
+- chunks embedded and linked as duplicates, ingestion time and stored chunks
+- size of the vector database directory
+- redundant top-k slots: search results that duplicate a higher-ranked result of the
+  same query, i.e. context slots RAGAssistant.invoke would waste on repeated text
+
+Every document starts and ends with one of a few boilerplate blocks (headers, legal
+notices), and --copy-ratio of the documents are copies of earlier ones with a few words
+changed. Every mode uses its own embedding cache, so no mode reuses embeddings of another.
+
+Usage (from the project directory):
+    python -m benchmarks.deduplication --documents 300 --copy-ratio 0.2 --output deduplication.json
+    python -m benchmarks.deduplication --documents 1000 --backend flat --modes none,near
+"""
+
+BOILERPLATE = [
+    "Copyright {year} Example Corp. All rights reserved. This document is confidential and intended "
+    "for internal use only. Do not distribute it outside of the organization without written approval.",
+    "This page is maintained by the platform team. For questions, open a ticket in the service desk "
+    "and include the name of the document, the section and a short description of the problem.",
+    "Disclaimer: the information in this document is provided as is, without warranty of any kind. "
+    "Procedures and limits may change at any time; always check the latest version before relying on it.",
+]
+
+
+def make_documents(count: int, size_bytes: int, copy_ratio: float, edits: int, seed: int) -> List[Dict]:
+    """Returns documents with boilerplate headers and footers, some of them edited copies of earlier ones."""
+    rng = random.Random(seed)
+    vocabulary = TOPICS + [f"{rng.choice(TOPICS)}{suffix}" for suffix in range(2000)]
+    documents = []
+    for doc_idx in range(count):
+        if documents and rng.random() < copy_ratio:
+            words = rng.choice(documents)["content"].split(" ")
+            for _ in range(edits):
+                words[rng.randrange(len(words))] = rng.choice(vocabulary)
+            content = " ".join(words)
+        else:
+            header = rng.choice(BOILERPLATE).format(year=2024)
+            footer = rng.choice(BOILERPLATE).format(year=2024)
+            content = f"{header}\n\n{make_document(rng, vocabulary, size_bytes, doc_idx)}\n\n{footer}\n"
+        documents.append({"content": content, "metadata": {"source": f"doc_{doc_idx:06d}.md"}})
+    return documents
+
+
+def redundant_slots(documents: List[str], threshold: float) -> int:
+    """Returns the number of results that duplicate a higher-ranked result."""
+    from src.deduplicator import minhash, normalize_text
+
+    redundant = 0
+    kept_texts, kept_signatures = set(), []
+    for document in documents:
+        text = normalize_text(document)
+        signature = minhash(document)
+        if text in kept_texts or any(np.mean(signature == kept) >= threshold for kept in kept_signatures):
+            redundant += 1
+        kept_texts.add(text)
+        kept_signatures.append(signature)
+    return redundant
+
+
+def run_mode(mode: str, args, documents: List[Dict], queries: List[str], work_dir: str) -> Dict:
+    """Ingests the documents with one deduplication mode and measures it."""
+    from src.vectordb import VectorDB
+
+    os.environ["VECTOR_DB_PATH"] = os.path.join(work_dir, f"vector_db_{mode}")
+    os.environ["EMBEDDING_CACHE_DIR"] = os.path.join(work_dir, f"embedding_cache_{mode}")
+    os.environ["DEDUPLICATION"] = mode
+    os.environ["DEDUP_THRESHOLD"] = str(args.threshold)
+    vector_db = VectorDB(f"dedup_{mode}")
+    vector_db.warm_up(background=False)
+
+    started = time.perf_counter()
+    stats = vector_db.add_documents(documents)
+    ingest_seconds = time.perf_counter() - started
+
+    redundant = 0
+    for query in queries:
+        results = vector_db.search(query, n_results=args.k, mode="dense")
+        redundant += redundant_slots(results["documents"][0], args.threshold)
+    # Persist the cache now, its exit handler would run after the work directory is removed
+    vector_db.embedding_cache.flush()
+    return {
+        "chunks_embedded": stats["chunks_embedded"],
+        "chunks_deduplicated": stats["chunks_deduplicated"],
+        "stored_chunks": vector_db.store.count(),
+        "ingest_seconds": round(ingest_seconds, 3),
+        "index_mb": round(directory_bytes(os.environ["VECTOR_DB_PATH"]) / 1024 / 1024, 2),
+        "redundant_slot_ratio": round(redundant / (len(queries) * args.k), 4),
+    }
+
+
+def run(args) -> Dict:
+    documents = make_documents(args.documents, args.doc_kb * 1024, args.copy_ratio, args.edits, args.seed)
+    queries = sample_queries([doc["content"] for doc in documents], args.queries, args.seed)
+    os.environ["VECTOR_STORE_BACKEND"] = args.backend
+    os.environ["QUERY_CACHE_SIZE"] = "0"
+
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "python": sys.version.split()[0],
+        "modes": {},
+    }
+    work_dir = tempfile.mkdtemp(prefix="bench_dedup_")
+    try:
+        for mode in args.modes.split(","):
+            results["modes"][mode] = run_mode(mode, args, documents, queries, work_dir)
+            print(f"{mode}: {results['modes'][mode]}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    baseline = results["modes"].get("none")
+    if baseline:
+        for mode, result in results["modes"].items():
+            if mode != "none":
+                result["embedding_reduction"] = round(1 - result["chunks_embedded"] / max(1, baseline["chunks_embedded"]), 4)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion cost, index size and redundant results with and without chunk deduplication")
+    parser.add_argument("--documents", type=int, default=300, help="Number of documents")
+    parser.add_argument("--doc-kb", type=int, default=4, help="Approximate size of one original document in KB")
+    parser.add_argument("--copy-ratio", type=float, default=0.2, help="Fraction of documents that are edited copies of earlier ones")
+    parser.add_argument("--edits", type=int, default=3, help="Words changed in every copy")
+    parser.add_argument("--queries", type=int, default=200, help="Number of search queries")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--threshold", type=float, default=0.7, help="DEDUP_THRESHOLD of the near mode and of the redundancy check")
+    parser.add_argument("--backend", default="chroma", help="Vector store backend: chroma or flat")
+    parser.add_argument("--modes", default="none,exact,near", help="Comma-separated deduplication modes; 'none' is the baseline")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", default="", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
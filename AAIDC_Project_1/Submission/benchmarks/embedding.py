@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+from benchmarks.corpus import TOPICS, make_document
+
+"""
+Embedding Benchmark
+-------------------
+Measures the ingestion throughput (chunks per second) of the embedding engines: every
+engine ingests the same synthetic documents with VectorDB.add_documents into an empty
+collection with an empty embedding cache, so the numbers include the batching of the
+ingestion pipeline. The ONNX engines are validated against the in-process PyTorch
+model on warm-up (EMBEDDING_VALIDATION_MIN_COSINE); an engine that fails the validation
+is reported as skipped.
+
+Engines:
+- inprocess/torch: the model in the calling process (baseline)
+- multiprocess/torch: --workers worker processes with their share of the CPU cores
+- inprocess/onnx, inprocess/onnx-int8, multiprocess/onnx-int8: the ONNX runtimes,
+  skipped if the ONNX backend of sentence-transformers is not installed
+
+Usage (from the project directory):
+    python -m benchmarks.embedding --documents 100 --output embedding.json
+    python -m benchmarks.embedding --workers 4 --batch-size 64 --engines inprocess/torch,multiprocess/torch
+"""
+
+DEFAULT_ENGINES = "inprocess/torch,multiprocess/torch,inprocess/onnx,inprocess/onnx-int8,multiprocess/onnx-int8"
+
+
+def make_documents(count: int, size_bytes: int, seed: int = 0) -> List[Dict]:
+    """Returns count synthetic documents of about size_bytes each."""
+    rng = random.Random(seed)
+    vocabulary = TOPICS + [f"{rng.choice(TOPICS)}{suffix}" for suffix in range(2000)]
+    return [
+        {"content": make_document(rng, vocabulary, size_bytes, doc_idx), "metadata": {"source": f"doc_{doc_idx:06d}.md"}}
+        for doc_idx in range(count)
+    ]
+
+
+def measure(spec: str, args, documents: List[Dict], work_dir: str) -> Dict:
+    """Warms the engine up (loading and validating its model), then times add_documents() of all documents."""
+    from src.vectordb import VectorDB
+
+    kind, runtime = spec.split("/")
+    name = spec.replace("/", "_").replace("-", "_")
+    os.environ["EMBEDDING_ENGINE"] = kind
+    os.environ["EMBEDDING_RUNTIME"] = runtime
+    os.environ["VECTOR_DB_PATH"] = os.path.join(work_dir, f"vector_db_{name}")
+    os.environ["EMBEDDING_CACHE_DIR"] = os.path.join(work_dir, f"embedding_cache_{name}")
+    vector_db = VectorDB(f"embedding_{name}", args.model)
+    try:
+        started = time.perf_counter()
+        vector_db.warm_up(background=False)
+        warm_up_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        stats = vector_db.add_documents(documents, batch_size=args.batch_size)
+        seconds = time.perf_counter() - started
+        # Persist the cache now, its exit handler would run after the work directory is removed
+        vector_db.embedding_cache.flush()
+        result = {
+            "warm_up_seconds": round(warm_up_seconds, 3),
+            "chunks": stats["chunks_embedded"],
+            "ingest_seconds": round(seconds, 3),
+            "chunks_per_second": round(stats["chunks_embedded"] / seconds, 1),
+        }
+        if vector_db.embedding_engine.validation is not None:
+            result["validation"] = vector_db.embedding_engine.validation
+        return result
+    finally:
+        vector_db.embedding_engine.close()
+
+
+def run(args) -> Dict:
+    documents = make_documents(args.documents, args.doc_kb * 1024, args.seed)
+    os.environ["VECTOR_STORE_BACKEND"] = args.backend
+    os.environ["QUERY_CACHE_SIZE"] = "0"
+    if args.workers:
+        os.environ["EMBEDDING_WORKERS"] = str(args.workers)
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "engines": {},
+        "skipped": {},
+    }
+    baseline = None
+    work_dir = tempfile.mkdtemp(prefix="bench_embedding_")
+    try:
+        for spec in args.engines.split(","):
+            try:
+                result = measure(spec, args, documents, work_dir)
+            except (ImportError, RuntimeError, ValueError) as e:
+                results["skipped"][spec] = str(e)
+                print(f"{spec}: skipped ({e})")
+                continue
+            if baseline is None:
+                baseline = result["chunks_per_second"]
+            result["speedup"] = round(result["chunks_per_second"] / baseline, 2)
+            results["engines"][spec] = result
+            print(f"{spec}: {result}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion throughput of the in-process, multi-process and ONNX embedding engines")
+    parser.add_argument("--documents", type=int, default=100, help="Number of documents to ingest")
+    parser.add_argument("--doc-kb", type=int, default=16, help="Approximate size of one document in KB")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per batch of the ingestion pipeline (INGEST_BATCH_SIZE)")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes of the multiprocess engine (default: CPU count / 2)")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"), help="Embedding model")
+    parser.add_argument("--backend", default="flat", help="Vector store backend: chroma or flat")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--engines", default=DEFAULT_ENGINES, help="Comma-separated engine/runtime pairs; the first one is the speedup baseline")
+    parser.add_argument("--output", default="", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import asyncio
+import hashlib
+import random
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from langchain_core.language_models.chat_models import SimpleChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+"""
+Fake LLM Module
+---------------
+Deterministic local stand-in for the chat model of the RAG chain. It answers without
+network access or API keys, with a configurable latency, so benchmarks measure the
+overhead of the application itself.
+
+The answer is derived from a hash of the prompt: the same prompt always gets the same
+answer, and a different context gets a different one. To simulate an unreliable provider,
+a share of the requests can be slow (tail latency) or fail. The async methods sleep on the
+event loop, so many concurrent requests do not need a thread each.
+
+Usage:
+    llm = FakeChatModel(latency_seconds=0.2, tokens_per_second=50)
+    flaky = FakeChatModel(latency_seconds=0.05, tail_probability=0.05, tail_latency_seconds=2.0)
+    assistant = RAGAssistant(llm=llm)
+"""
+
+WORDS = ["the", "context", "shows", "that", "retrieval", "answers", "this", "question", "with", "relevant", "chunks"]
+
+
+class FakeChatModel(SimpleChatModel):
+    """
+    Chat model with a deterministic answer and simulated latency.
+    """
+
+    latency_seconds: float = 0.0
+    """Time to the first token."""
+    tokens_per_second: float = 0.0
+    """Generation speed after the first token, 0 for instant."""
+    answer_tokens: int = 32
+    """Number of words of every answer."""
+    tail_probability: float = 0.0
+    """Share of the requests with tail_latency_seconds to the first token instead."""
+    tail_latency_seconds: float = 0.0
+    """Time to the first token of the slow requests."""
+    failure_probability: float = 0.0
+    """Share of the requests that fail right away with an error."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _call(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        return "".join(self._generate_tokens(messages))
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for token in self._generate_tokens(messages):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens = [token async for token in self._agenerate_tokens(messages)]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        async for token in self._agenerate_tokens(messages):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    def _generate_tokens(self, messages: List[BaseMessage]) -> Iterator[str]:
+        """Yields the answer word by word, sleeping for the simulated latency."""
+        time.sleep(self._first_token_latency())
+        for position, word in enumerate(self._answer(messages)):
+            if position and self.tokens_per_second:
+                time.sleep(1.0 / self.tokens_per_second)
+            yield word
+
+    async def _agenerate_tokens(self, messages: List[BaseMessage]) -> AsyncIterator[str]:
+        """Async version of _generate_tokens."""
+        await asyncio.sleep(self._first_token_latency())
+        for position, word in enumerate(self._answer(messages)):
+            if position and self.tokens_per_second:
+                await asyncio.sleep(1.0 / self.tokens_per_second)
+            yield word
+
+    def _first_token_latency(self) -> float:
+        """Draws the latency of a request, or raises for a failing request."""
+        if random.random() < self.failure_probability:
+            raise RuntimeError("Simulated provider failure")
+        return self.tail_latency_seconds if random.random() < self.tail_probability else self.latency_seconds
+
+    def _answer(self, messages: List[BaseMessage]) -> List[str]:
+        """Returns the words of the deterministic answer of the prompt."""
+        prompt = "\n".join(str(message.content) for message in messages)
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        words = [WORDS[digest[position % len(digest)] % len(WORDS)] for position in range(self.answer_tokens)]
+        return [word if position == 0 else f" {word}" for position, word in enumerate(words)]
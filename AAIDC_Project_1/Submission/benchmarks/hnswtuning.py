@@ -0,0 +1,206 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from benchmarks.vectorstores import percentile_ms, random_embeddings
+from src.vectorstore import ChromaVectorStore
+
+"""
+HNSW Tuning Sweep
+-----------------
+Builds the ChromaDB HNSW index under a grid of settings (M, construction_ef, search_ef)
+on a sample of the corpus and reports, for every setting, recall@k against exact search,
+p50/p99 query latency, build time and index size on disk. It then recommends the
+fastest setting (lowest p99 latency) that reaches the recall target, as CHROMA_HNSW_*
+settings for the .env file.
+
+The sample is made of chunks of the documents in --data-dir, embedded with the
+configured embedding model; held-out chunks serve as queries. Without --data-dir,
+random embeddings are used.
+
+Usage (from the project directory):
+    python -m benchmarks.hnswtuning --data-dir ./data --sample 20000 --recall-target 0.95 --output hnsw.json
+    python -m benchmarks.hnswtuning --sample 50000 --m 16,32 --search-ef 32,64,128
+"""
+
+
+def _ints(text: str) -> List[int]:
+    return [int(value) for value in text.split(",") if value.strip()]
+
+
+def corpus_sample(data_dir: str, count: int, model_name: str, seed: int) -> np.ndarray:
+    """Returns the embeddings of a random sample of count chunks of the corpus."""
+    from src.chunking import split_text
+    from src.documentloader import DocumentLoader
+    from src.embeddingengine import create_embedding_engine
+
+    chunks = []
+    for document in DocumentLoader(data_dir).iter_documents():
+        chunks.extend(split_text(document["content"], 250, 100))
+    if len(chunks) < count:
+        print(f"The corpus has {len(chunks)} chunks, using all of them")
+    chunks = random.Random(seed).sample(chunks, min(count, len(chunks)))
+    engine = create_embedding_engine(model_name)
+    try:
+        return engine.encode(chunks, batch_size=64)
+    finally:
+        engine.close()
+
+
+def exact_top_k(embeddings: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """Returns the rows of the k nearest embeddings of every query under the given distance."""
+    if space == "cosine":
+        embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = queries @ embeddings.T
+    if space == "l2":
+        # Smallest squared distance |q|^2 - 2 q.x + |x|^2 is the largest 2 q.x - |x|^2
+        scores = 2 * scores - np.sum(embeddings * embeddings, axis=1)
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def directory_bytes(directory: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names
+    )
+
+
+def build(directory: str, embeddings: np.ndarray, settings: Dict, batch_size: int) -> Tuple[ChromaVectorStore, float]:
+    """Builds a collection with the HNSW settings and returns it with the build time in seconds."""
+    store = ChromaVectorStore(directory, "hnsw_tuning", {"description": "HNSW tuning", **settings})
+    started = time.perf_counter()
+    for start in range(0, len(embeddings), batch_size):
+        end = min(start + batch_size, len(embeddings))
+        store.add(
+            [f"chunk_{idx}" for idx in range(start, end)],
+            embeddings[start:end].tolist(),
+            [""] * (end - start),
+            [{"row": idx} for idx in range(start, end)],
+        )
+    store.flush()
+    return store, time.perf_counter() - started
+
+
+def reopen(directory: str, settings: Dict) -> Optional[ChromaVectorStore]:
+    """
+    Opens the collection in a fresh ChromaDB client, so its index is loaded again with the
+    current search_ef. Returns None if this ChromaDB version cannot drop its cached clients.
+    """
+    try:
+        from chromadb.api.client import SharedSystemClient
+    except ImportError:
+        return None
+    SharedSystemClient.clear_system_cache()
+    return ChromaVectorStore(directory, "hnsw_tuning", {"description": "HNSW tuning", **settings})
+
+
+def measure(store: ChromaVectorStore, queries: np.ndarray, k: int, truth: np.ndarray) -> Dict:
+    """Queries one embedding at a time and returns recall@k and the latency percentiles."""
+    store.query([queries[0].tolist()], n_results=k)
+    latencies = []
+    hits = 0
+    for row, query in enumerate(queries):
+        started = time.perf_counter()
+        results = store.query([query.tolist()], n_results=k)
+        latencies.append(time.perf_counter() - started)
+        found = {int(chunk_id.split("_")[1]) for chunk_id in results["ids"][0]}
+        hits += len(found.intersection(truth[row]))
+    return {
+        f"recall_at_{k}": round(hits / (len(queries) * k), 4),
+        "query_p50_ms": percentile_ms(latencies, 50),
+        "query_p99_ms": percentile_ms(latencies, 99),
+    }
+
+
+def recommend(settings: List[Dict], k: int, recall_target: float) -> Optional[Dict]:
+    """Returns the setting with the lowest p99 latency that reaches the recall target, or the best recall."""
+    recall_key = f"recall_at_{k}"
+    feasible = [setting for setting in settings if setting[recall_key] >= recall_target]
+    if not feasible:
+        return max(settings, key=lambda setting: (setting[recall_key], -setting["query_p99_ms"]), default=None)
+    return min(feasible, key=lambda setting: (setting["query_p99_ms"], setting["build_seconds"]))
+
+
+def run(args) -> Dict:
+    total = args.sample + args.queries
+    if args.data_dir:
+        vectors = corpus_sample(args.data_dir, total, args.model, args.seed)
+    else:
+        vectors = random_embeddings(total, args.dim, args.seed)
+    queries, embeddings = vectors[:args.queries], vectors[args.queries:]
+    truth = exact_top_k(embeddings, queries, args.k, args.space)
+
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "python": sys.version.split()[0],
+        "chunks": len(embeddings),
+        "settings": [],
+    }
+    for m, construction_ef in itertools.product(_ints(args.m), _ints(args.construction_ef)):
+        build_settings = {"hnsw:space": args.space, "hnsw:M": m, "hnsw:construction_ef": construction_ef}
+        directory = tempfile.mkdtemp(prefix="bench_hnsw_")
+        try:
+            store, build_seconds = build(directory, embeddings, build_settings, args.batch_size)
+            index_bytes = directory_bytes(directory)
+            for search_ef in _ints(args.search_ef):
+                # A loaded index keeps its search_ef: change it, then load the index again
+                reopened = reopen(directory, build_settings) if store.set_search_ef(search_ef) else None
+                if reopened is not None:
+                    store = reopened
+                else:
+                    shutil.rmtree(directory, ignore_errors=True)
+                    store, build_seconds = build(directory, embeddings, {**build_settings, "hnsw:search_ef": search_ef}, args.batch_size)
+                setting = {"m": m, "construction_ef": construction_ef, "search_ef": search_ef}
+                setting.update(measure(store, queries, args.k, truth))
+                setting["build_seconds"] = round(build_seconds, 3)
+                setting["index_mb"] = round(index_bytes / 1024 / 1024, 2)
+                results["settings"].append(setting)
+                print(setting)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    best = recommend(results["settings"], args.k, args.recall_target)
+    results["recommendation"] = best
+    if best is not None:
+        reached = "reaches" if best[f"recall_at_{args.k}"] >= args.recall_target else "is closest to"
+        print(f"Recommended setting ({reached} recall@{args.k} >= {args.recall_target}):")
+        print(f"CHROMA_HNSW_SPACE={args.space}")
+        print(f"CHROMA_HNSW_M={best['m']}")
+        print(f"CHROMA_HNSW_CONSTRUCTION_EF={best['construction_ef']}")
+        print(f"CHROMA_HNSW_SEARCH_EF={best['search_ef']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs. latency sweep over the ChromaDB HNSW settings")
+    parser.add_argument("--data-dir", default="", help="Corpus folder to sample chunks from (default: random embeddings)")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"), help="Embedding model of the corpus sample")
+    parser.add_argument("--sample", type=int, default=20000, help="Number of indexed chunks")
+    parser.add_argument("--queries", type=int, default=200, help="Number of held-out query chunks")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of the random embeddings")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--space", default="cosine", choices=["l2", "cosine", "ip"], help="Distance metric")
+    parser.add_argument("--m", default="8,16,32", help="Comma-separated values of M")
+    parser.add_argument("--construction-ef", default="100,200", help="Comma-separated values of construction_ef")
+    parser.add_argument("--search-ef", default="10,20,50,100,200", help="Comma-separated values of search_ef")
+    parser.add_argument("--recall-target", type=float, default=0.95, help="Minimum recall@k of the recommended setting")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Chunks added per call")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the sample")
+    parser.add_argument("--output", default="", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Dict, List
+from langchain_core.messages import HumanMessage
+from benchmarks.fakellm import FakeChatModel
+from benchmarks.vectorstores import percentile_ms
+
+"""
+LLM Router Benchmark
+--------------------
+Measures the tail latency of LLM requests to providers with a slow tail, with and without
+the hedging LLMRouter. Both providers are local stand-ins (benchmarks.fakellm): most
+requests take --latency-ms, a --tail-probability share takes --tail-latency-ms, and a
+--failure-probability share fails right away.
+
+Scenarios:
+- single: every request goes to one provider, as with one API key
+- router: two providers behind the LLMRouter, hedged after --hedge-after-ms
+
+Usage (from the project directory):
+    python -m benchmarks.llmrouter --requests 500 --concurrency 50 --output llmrouter.json
+    python -m benchmarks.llmrouter --tail-probability 0.1 --failure-probability 0.05 --hedge-after-ms 0
+"""
+
+
+def make_provider(args) -> FakeChatModel:
+    return FakeChatModel(
+        latency_seconds=args.latency_ms / 1000,
+        tail_probability=args.tail_probability,
+        tail_latency_seconds=args.tail_latency_ms / 1000,
+        failure_probability=args.failure_probability,
+        answer_tokens=8,
+    )
+
+
+async def measure(llm, requests: int, concurrency: int) -> Dict:
+    """Sends the requests with bounded concurrency and returns the latency percentiles and the error count."""
+    slots = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(idx: int):
+        nonlocal errors
+        async with slots:
+            started = time.perf_counter()
+            try:
+                await llm.ainvoke([HumanMessage(content=f"question {idx}")])
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*[one(idx) for idx in range(requests)])
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99),
+    }
+
+
+async def run(args) -> Dict:
+    from src.llmrouter import LLMRouter
+
+    results = {"config": vars(args).copy(), "python": sys.version.split()[0]}
+    results["config"].pop("output")
+
+    random.seed(args.seed)
+    results["single"] = await measure(make_provider(args), args.requests, args.concurrency)
+    print(f"single: {results['single']}")
+
+    random.seed(args.seed)
+    router = LLMRouter(
+        [("primary", make_provider(args)), ("secondary", make_provider(args))],
+        hedge_after_ms=args.hedge_after_ms,
+        reset_seconds=1.0,
+    )
+    results["router"] = await measure(router, args.requests, args.concurrency)
+    results["router"]["providers"] = router.provider_stats()
+    results["router"]["hedged_share"] = round(router.hedged_requests / args.requests, 4)
+    print(f"router: {results['router']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tail latency of a single LLM provider vs. the hedging LLM router")
+    parser.add_argument("--requests", type=int, default=500, help="Number of LLM requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent requests")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Usual latency of a provider")
+    parser.add_argument("--tail-latency-ms", type=float, default=1000.0, help="Latency of the slow requests")
+    parser.add_argument("--tail-probability", type=float, default=0.05, help="Share of slow requests")
+    parser.add_argument("--failure-probability", type=float, default=0.0, help="Share of failing requests")
+    parser.add_argument("--hedge-after-ms", type=float, default=100.0, help="Hedge delay, 0 for the rolling p95")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the simulated latencies")
+    parser.add_argument("--output", default="", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
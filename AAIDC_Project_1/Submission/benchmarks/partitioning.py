@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+import numpy as np
+from benchmarks.vectorstores import percentile_ms, random_embeddings
+from src.partitioning import PartitionedVectorStore
+from src.vectorstore import create_vector_store
+
+"""
+Partitioning Benchmark
+----------------------
+Measures the latency of per-tenant queries on a multi-tenant collection of random
+embeddings, stored in two ways:
+
+- filtered: one collection, queried with a metadata filter on the tenant
+- partitioned: one sub-collection per tenant (PARTITION_BY=tenant), only the tenant's
+  partition is queried
+
+It also reports the overlap of the two result sets (1.0 for the exact flat backend).
+
+Usage (from the project directory):
+    python -m benchmarks.partitioning --chunks 50000 --tenants 20 --backend flat --output partitioning.json
+    python -m benchmarks.partitioning --chunks 50000 --tenants 20 --backend chroma
+"""
+
+
+def fill(store, embeddings: np.ndarray, tenants: List[str], batch_size: int) -> float:
+    """Adds the embeddings with their tenant metadata and returns the seconds taken."""
+    started = time.perf_counter()
+    for start in range(0, len(embeddings), batch_size):
+        end = min(start + batch_size, len(embeddings))
+        store.add(
+            [f"chunk_{idx}" for idx in range(start, end)],
+            embeddings[start:end].tolist(),
+            [f"document {idx}" for idx in range(start, end)],
+            [{"source": f"{tenants[idx]}/doc_{idx // 50}", "tenant": tenants[idx]} for idx in range(start, end)],
+        )
+    store.flush()
+    return time.perf_counter() - started
+
+
+def measure(query_fn, queries: np.ndarray, query_tenants: List[str]) -> Dict:
+    """Runs one query per query embedding and returns the latency percentiles and the found IDs."""
+    latencies = []
+    found = []
+    for query, tenant in zip(queries, query_tenants):
+        started = time.perf_counter()
+        results = query_fn(query.tolist(), tenant)
+        latencies.append(time.perf_counter() - started)
+        found.append(set(results["ids"][0]))
+    return {
+        "query_p50_ms": percentile_ms(latencies, 50),
+        "query_p95_ms": percentile_ms(latencies, 95),
+        "query_p99_ms": percentile_ms(latencies, 99),
+        "found": found,
+    }
+
+
+def run(args) -> Dict:
+    embeddings = random_embeddings(args.chunks, args.dim, seed=0)
+    queries = random_embeddings(args.queries, args.dim, seed=1)
+    rng = np.random.default_rng(2)
+    tenant_names = [f"tenant_{idx}" for idx in range(args.tenants)]
+    tenants = [tenant_names[idx] for idx in rng.integers(0, args.tenants, args.chunks)]
+    query_tenants = [tenant_names[idx] for idx in rng.integers(0, args.tenants, args.queries)]
+
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "python": sys.version.split()[0],
+    }
+    directory = tempfile.mkdtemp(prefix="bench_partitioning_")
+    try:
+        single = create_vector_store(args.backend, directory, "filtered")
+        ingest_seconds = fill(single, embeddings, tenants, args.batch_size)
+        filtered = measure(
+            lambda query, tenant: single.query([query], n_results=args.k, where={"tenant": tenant}), queries, query_tenants
+        )
+        filtered["ingest_seconds"] = round(ingest_seconds, 3)
+
+        partitioned_store = PartitionedVectorStore(
+            lambda slug: create_vector_store(args.backend, directory, f"partitioned__{slug}"),
+            os.path.join(directory, "partitions_partitioned.json"),
+            "tenant",
+        )
+        ingest_seconds = fill(partitioned_store, embeddings, tenants, args.batch_size)
+        partitioned = measure(
+            lambda query, tenant: partitioned_store.query_partitions([query], args.k, {tenant: None}), queries, query_tenants
+        )
+        partitioned["ingest_seconds"] = round(ingest_seconds, 3)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    overlap = [len(a & b) / max(1, len(a)) for a, b in zip(filtered.pop("found"), partitioned.pop("found"))]
+    partitioned["overlap_with_filtered"] = round(float(np.mean(overlap)), 4)
+    partitioned["p50_speedup"] = round(filtered["query_p50_ms"] / max(partitioned["query_p50_ms"], 1e-6), 2)
+    results["filtered"] = filtered
+    results["partitioned"] = partitioned
+    print(f"filtered: {filtered}")
+    print(f"partitioned: {partitioned}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-tenant query latency: metadata filter vs. tenant partitions")
+    parser.add_argument("--chunks", type=int, default=20000, help="Number of stored embeddings")
+    parser.add_argument("--tenants", type=int, default=20, help="Number of tenants")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension (all-MiniLM-L6-v2: 384)")
+    parser.add_argument("--queries", type=int, default=200, help="Number of timed queries")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Chunks added per call")
+    parser.add_argument("--backend", default="flat", help="Vector store backend: flat or chroma")
+    parser.add_argument("--output", default="", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from typing import Dict
+import numpy as np
+from src.vectorstore import NumpyFlatVectorStore, QuantizedFlatVectorStore
+from benchmarks.vectorstores import percentile_ms, random_embeddings
+
+"""
+Quantization Benchmark
+----------------------
+Measures the recall loss of the quantized flat vector store against exact float search,
+for int8 and binary codes and several rescore factors, together with the query latency
+and the RAM used by the codes per vector.
+
+Random embeddings are close to the worst case for binary codes; pass real embeddings
+(a 2D .npy file, e.g. exported from the collection) for representative numbers.
+
+Usage (from the project directory):
+    python -m benchmarks.quantization --chunks 50000 --rescore-factors 1,4,10 --output quantization.json
+    python -m benchmarks.quantization --embeddings my_embeddings.npy --queries 200
+"""
+
+
+def measure(store, queries: np.ndarray, k: int, truth: np.ndarray) -> Dict:
+    """Runs the queries against the store and returns latency percentiles and recall@k."""
+    latencies = []
+    hits = 0
+    for row, query in enumerate(queries):
+        started = time.perf_counter()
+        results = store.query([query.tolist()], n_results=k)
+        latencies.append(time.perf_counter() - started)
+        found = {int(chunk_id.split("_")[1]) for chunk_id in results["ids"][0]}
+        hits += len(found.intersection(truth[row]))
+    return {
+        "query_p50_ms": percentile_ms(latencies, 50),
+        "query_p95_ms": percentile_ms(latencies, 95),
+        f"recall_at_{k}": round(hits / (len(queries) * k), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the recall loss of quantized vector search")
+    parser.add_argument("--chunks", type=int, default=20000, help="Number of random stored embeddings")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of the random embeddings")
+    parser.add_argument("--embeddings", default="", help="Use the embeddings of this .npy file instead of random ones")
+    parser.add_argument("--queries", type=int, default=200, help="Number of timed queries")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--rescore-factors", default="1,4,10", help="Comma-separated rescore factors")
+    parser.add_argument("--output", default="", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        embeddings = np.load(args.embeddings).astype(np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        # Stored embeddings perturbed with noise act as queries with a known neighborhood
+        rng = np.random.default_rng(1)
+        picked = embeddings[rng.choice(len(embeddings), args.queries)]
+        queries = picked + 0.1 * rng.standard_normal(picked.shape).astype(np.float32) / np.sqrt(embeddings.shape[1])
+    else:
+        embeddings = random_embeddings(args.chunks, args.dim, seed=0)
+        queries = random_embeddings(args.queries, args.dim, seed=1)
+    truth = np.argsort(-(queries @ embeddings.T), axis=1)[:, :args.k]
+
+    directory = tempfile.mkdtemp(prefix="bench_quantization_")
+    try:
+        ids = [f"chunk_{idx}" for idx in range(len(embeddings))]
+        documents = [""] * len(embeddings)
+        metadatas = [{"source": "benchmark"} for _ in range(len(embeddings))]
+        baseline = NumpyFlatVectorStore(directory, dtype="float32")
+        baseline.add(ids, embeddings, documents, metadatas)
+        baseline.flush()
+
+        results = {
+            "chunks": len(embeddings),
+            "dim": embeddings.shape[1],
+            "queries": len(queries),
+            "k": args.k,
+            "float32": {"bytes_per_vector": embeddings.shape[1] * 4, **measure(baseline, queries, args.k, truth)},
+        }
+        print(f"float32: {results['float32']}")
+
+        for quantization in ("int8", "binary"):
+            for factor in (int(value) for value in args.rescore_factors.split(",")):
+                # The stores share the float32 embeddings file, only the codes differ
+                store = QuantizedFlatVectorStore(directory, quantization=quantization, rescore_factor=factor)
+                name = f"{quantization}_rescore_{factor}"
+                results[name] = {
+                    "bytes_per_vector": store._codes.shape[1] + (4 if quantization == "int8" else 0),
+                    **measure(store, queries, args.k, truth),
+                }
+                print(f"{name}: {results[name]}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+import numpy as np
+from benchmarks.vectorstores import percentile_ms, random_embeddings
+from src.sharding import ShardedVectorStore, create_store
+
+"""
+Sharding Benchmark
+------------------
+Stores the same random embeddings in a collection of every shard count in --shards
+(1 is the unsharded store) and reports, for every count:
+
+- ingestion time with --batch-size chunks per add() call
+- latency percentiles of single queries (scatter-gather over every shard)
+- query throughput with --concurrency threads querying at the same time
+- recall@k against exact brute-force search, so a merge that loses hits shows up
+- the chunks of every shard, to check that the hash routing is balanced
+
+Usage (from the project directory):
+    python -m benchmarks.sharding --chunks 200000 --shards 1,2,4 --output sharding.json
+    python -m benchmarks.sharding --chunks 50000 --backend flat --concurrency 8
+"""
+
+
+def benchmark_shards(shards: int, args, embeddings: np.ndarray, queries: np.ndarray, truth: np.ndarray) -> Dict:
+    """Ingests the embeddings into a fresh collection with the shard count and measures it."""
+    directory = tempfile.mkdtemp(prefix=f"bench_shards_{shards}_")
+    store = None
+    try:
+        if shards > 1:
+            store = ShardedVectorStore(args.backend, directory, "sharding", shards)
+            # Start the shard workers before the clock runs
+            store.count()
+        else:
+            store = create_store(args.backend, directory, "sharding")
+        ids = [f"chunk_{idx}" for idx in range(len(embeddings))]
+
+        started = time.perf_counter()
+        for start in range(0, len(embeddings), args.batch_size):
+            end = min(start + args.batch_size, len(embeddings))
+            store.add(
+                ids[start:end],
+                embeddings[start:end].tolist(),
+                [f"document {idx}" for idx in range(start, end)],
+                [{"source": f"doc_{idx // 20}.md"} for idx in range(start, end)],
+            )
+        store.flush()
+        ingest_seconds = time.perf_counter() - started
+
+        latencies: List[float] = []
+        hits = 0
+        for row, query in enumerate(queries):
+            started = time.perf_counter()
+            results = store.query([query.tolist()], n_results=args.k)
+            latencies.append(time.perf_counter() - started)
+            found = {int(chunk_id.split("_")[1]) for chunk_id in results["ids"][0]}
+            hits += len(found.intersection(truth[row]))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(lambda query: store.query([query.tolist()], n_results=args.k), queries))
+        concurrent_seconds = time.perf_counter() - started
+
+        return {
+            "ingest_seconds": round(ingest_seconds, 3),
+            "ingest_chunks_per_second": round(len(embeddings) / ingest_seconds, 1),
+            "query_p50_ms": percentile_ms(latencies, 50),
+            "query_p95_ms": percentile_ms(latencies, 95),
+            "query_p99_ms": percentile_ms(latencies, 99),
+            "concurrent_queries_per_second": round(len(queries) / concurrent_seconds, 1),
+            f"recall_at_{args.k}": round(hits / (len(queries) * args.k), 4),
+            "shard_chunks": store.shard_counts() if shards > 1 else [store.count()],
+        }
+    finally:
+        if isinstance(store, ShardedVectorStore):
+            store.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion and scatter-gather query cost of sharded collections")
+    parser.add_argument("--chunks", type=int, default=100000, help="Number of stored embeddings")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension (all-MiniLM-L6-v2: 384)")
+    parser.add_argument("--queries", type=int, default=200, help="Number of timed queries")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Chunks added per call")
+    parser.add_argument("--shards", default="1,2,4", help="Comma-separated shard counts to compare; 1 is the unsharded store")
+    parser.add_argument("--backend", default="chroma", help="Vector store backend of the shards: chroma or flat")
+    parser.add_argument("--concurrency", type=int, default=4, help="Threads of the throughput measurement")
+    parser.add_argument("--output", default="", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    os.environ['ANONYMIZED_TELEMETRY'] = 'False'
+    embeddings = random_embeddings(args.chunks, args.dim, seed=0)
+    queries = random_embeddings(args.queries, args.dim, seed=1)
+    truth = np.argsort(-(queries @ embeddings.T), axis=1)[:, :args.k]
+
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "shards": {},
+    }
+    for shards in [int(value) for value in args.shards.split(",")]:
+        results["shards"][str(shards)] = benchmark_shards(shards, args, embeddings, queries, truth)
+        print(f"{shards} shards: {results['shards'][str(shards)]}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
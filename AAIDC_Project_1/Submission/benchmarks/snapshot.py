@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict
+from benchmarks.corpus import generate_corpus
+from benchmarks.suite import sample_queries
+
+"""
+Snapshot Benchmark
+------------------
+Compares two ways of bringing up a new replica on a synthetic corpus:
+
+- ingest: load, chunk and embed the corpus into an empty collection (empty embedding cache)
+- snapshot: import a snapshot file exported from the first collection
+
+For both it reports the time until the collection is ready to serve, and for the
+snapshot the export time and file size. The top-k results of both collections are
+compared on sample queries (overlap 1.0 means the replica answers identically).
+With --backend chroma, the import inserts every vector into a new HNSW index, so its
+time is dominated by the index build rather than by reading the snapshot.
+
+Usage (from the project directory):
+    python -m benchmarks.snapshot --size-mb 5 --output snapshot.json
+    python -m benchmarks.snapshot --size-mb 20 --backend chroma
+"""
+
+
+def run(args) -> Dict:
+    work_dir = tempfile.mkdtemp(prefix="bench_snapshot_")
+    os.environ["VECTOR_STORE_BACKEND"] = args.backend
+    os.environ["EMBEDDING_CACHE_DIR"] = os.path.join(work_dir, "embedding_cache")
+    os.environ["QUERY_CACHE_SIZE"] = "0"
+    from src.documentloader import DocumentLoader
+    from src.vectordb import VectorDB
+
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "python": sys.version.split()[0],
+    }
+    try:
+        corpus_dir = args.corpus_dir or os.path.join(work_dir, "corpus")
+        if not args.corpus_dir:
+            generate_corpus(corpus_dir, args.size_mb, seed=args.seed)
+
+        os.environ["VECTOR_DB_PATH"] = os.path.join(work_dir, "primary")
+        primary = VectorDB("snapshot_primary")
+        primary.warm_up(background=False)
+        started = time.perf_counter()
+        loader = DocumentLoader(corpus_dir, chunk_size=primary.chunk_size, chunk_overlap=primary.chunk_overlap)
+        stats = primary.add_documents(loader.iter_documents())
+        results["ingest"] = {"chunks": stats["chunks_embedded"], "ready_seconds": round(time.perf_counter() - started, 3)}
+        print(f"ingest: {results['ingest']}")
+
+        snapshot_path = os.path.join(work_dir, "collection.snap")
+        started = time.perf_counter()
+        primary.export_snapshot(snapshot_path)
+        export_seconds = time.perf_counter() - started
+
+        os.environ["VECTOR_DB_PATH"] = os.path.join(work_dir, "replica")
+        started = time.perf_counter()
+        replica = VectorDB("snapshot_replica")
+        imported = replica.import_snapshot(snapshot_path)
+        results["snapshot"] = {
+            "chunks": imported["chunks"],
+            "export_seconds": round(export_seconds, 3),
+            "file_mb": round(os.path.getsize(snapshot_path) / 1024 / 1024, 2),
+            "ready_seconds": round(time.perf_counter() - started, 3),
+        }
+        results["snapshot"]["speedup"] = round(results["ingest"]["ready_seconds"] / max(results["snapshot"]["ready_seconds"], 1e-6), 1)
+        print(f"snapshot: {results['snapshot']}")
+
+        documents = primary.store.get(include=["documents", "metadatas"], limit=2000)
+        queries = sample_queries(primary.resolve_documents(documents["documents"], documents["metadatas"]), args.queries, args.seed)
+        overlap = 0
+        for query in queries:
+            expected = set(primary.search(query, n_results=args.k)["ids"][0])
+            found = set(replica.search(query, n_results=args.k)["ids"][0])
+            overlap += len(expected & found) / max(1, len(expected))
+        results["snapshot"]["result_overlap"] = round(overlap / len(queries), 4)
+        print(f"result overlap: {results['snapshot']['result_overlap']}")
+        # Persist the cache now, its exit handler would run after the work directory is removed
+        primary.embedding_cache.flush()
+        replica.embedding_cache.flush()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replica cold start: full ingestion vs. snapshot import")
+    parser.add_argument("--size-mb", type=float, default=5, help="Size of the synthetic corpus in MB")
+    parser.add_argument("--corpus-dir", default="", help="Use this corpus folder instead of a synthetic one")
+    parser.add_argument("--backend", default="flat", help="Vector store backend: flat or chroma")
+    parser.add_argument("--queries", type=int, default=100, help="Number of queries compared between both collections")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", default="", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+"""
+Startup Benchmark
+-----------------
+Measures the import time of the application modules and the startup time of the
+vector database, each in a fresh Python process, and detects regressions against a
+previously saved baseline.
+
+Usage (from the project directory):
+    python -m benchmarks.startup --output startup.json
+    python -m benchmarks.startup --baseline startup.json --tolerance 0.25
+
+The exit code is 1 if any measurement is slower than the baseline by more than the tolerance.
+"""
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Statements timed in a fresh interpreter. Each one prints its duration in seconds.
+MEASUREMENTS = {
+    "import_src_app": "import src.app",
+    "import_src_vectordb": "import src.vectordb",
+    "vectordb_init": "from src.vectordb import VectorDB\nstart = time.perf_counter()\nVectorDB()",
+    "embedding_model_load": (
+        "from src.vectordb import VectorDB\ndb = VectorDB()\n"
+        "start = time.perf_counter()\ndb.warm_up(background=False)"
+    ),
+}
+
+# Absolute slack in seconds, so that tiny measurements do not flag noise as regressions
+MIN_SLACK_SECONDS = 0.05
+
+
+def time_statement(statement: str) -> float:
+    """
+    Runs the statement in a fresh interpreter and returns its duration in seconds.
+    The statement may reset 'start' itself to exclude its setup from the measurement.
+    """
+    code = f"import time\nstart = time.perf_counter()\n{statement}\nprint(time.perf_counter() - start)"
+    env = dict(os.environ, CHROMA_COLLECTION_NAME="startup_benchmark", ANONYMIZED_TELEMETRY="False")
+    completed = subprocess.run(
+        [sys.executable, "-c", code], cwd=PROJECT_DIR, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else "failed")
+    return float(completed.stdout.strip().splitlines()[-1])
+
+
+def top_imports(module: str, limit: int = 10) -> List[Dict]:
+    """Returns the slowest imports (cumulative) of a module, using python -X importtime."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_DIR, capture_output=True, text=True,
+    )
+    imports = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = [part.strip() for part in line.split(":", 1)[1].split("|")]
+        imports.append({"module": name, "cumulative_seconds": int(cumulative_us) / 1e6})
+    imports.sort(key=lambda item: item["cumulative_seconds"], reverse=True)
+    return imports[:limit]
+
+
+def run(repeat: int) -> Dict:
+    """Runs every measurement and returns the median durations."""
+    results = {"python": sys.version.split()[0], "repeat": repeat, "seconds": {}, "errors": {}}
+    for name, statement in MEASUREMENTS.items():
+        try:
+            durations = [time_statement(statement) for _ in range(repeat)]
+            results["seconds"][name] = round(statistics.median(durations), 4)
+            print(f"{name}: {results['seconds'][name]:.3f}s")
+        except RuntimeError as e:
+            results["errors"][name] = str(e)
+            print(f"{name}: skipped ({e})")
+    results["top_imports_src_app"] = top_imports("src.app")
+    return results
+
+
+def find_regressions(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Returns a description of every measurement slower than the baseline by more than the tolerance."""
+    regressions = []
+    for name, seconds in results["seconds"].items():
+        previous = baseline.get("seconds", {}).get(name)
+        if previous is None:
+            continue
+        limit = previous * (1 + tolerance) + MIN_SLACK_SECONDS
+        if seconds > limit:
+            regressions.append(f"{name}: {seconds:.3f}s (baseline {previous:.3f}s, limit {limit:.3f}s)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and startup-time benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (the median is reported)")
+    parser.add_argument("--output", default="", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", default="", help="JSON results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown against the baseline")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        if regressions:
+            print("Startup regressions detected:")
+            for regression in regressions:
+                print(f"- {regression}")
+            sys.exit(1)
+        print("No startup regressions")
+
+
+if __name__ == "__main__":
+    main()
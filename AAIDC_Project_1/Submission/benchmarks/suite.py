@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+import numpy as np
+from benchmarks.corpus import generate_corpus
+from benchmarks.fakellm import FakeChatModel
+from benchmarks.vectorstores import percentile_ms
+
+"""
+End-to-End Benchmark Suite
+--------------------------
+Measures every stage of the RAG assistant on a synthetic corpus, offline and without
+API keys (the LLM is the deterministic local stand-in of benchmarks.fakellm):
+
+- loader: DocumentLoader.load_documents throughput
+- chunking: VectorDB.chunk_text throughput
+- ingestion: VectorDB.add_documents rate into an empty collection
+- search: VectorDB.search latency percentiles and recall@k against brute-force search
+  over the stored embeddings
+- invoke: RAGAssistant.invoke latency percentiles and the overhead on top of the LLM
+
+The vector database and the embedding cache are created in a temporary directory, the
+configured collection is not touched. Results are written as JSON; with --baseline, the
+exit code is 1 if a metric regressed by more than the tolerance.
+
+Usage (from the project directory):
+    python -m benchmarks.suite --size-mb 5 --output suite.json
+    python -m benchmarks.suite --size-mb 5 --baseline suite.json --tolerance 0.2
+    python -m benchmarks.suite --corpus-dir ./bench_corpus --queries 500 --llm-latency-ms 300
+"""
+
+# Metrics compared against the baseline; True if higher values are better
+COMPARED_METRICS = {
+    ("loader", "mb_per_second"): True,
+    ("chunking", "mb_per_second"): True,
+    ("ingestion", "chunks_per_second"): True,
+    ("search", "p50_ms"): False,
+    ("search", "p95_ms"): False,
+    ("search", "recall_at_k"): True,
+    ("invoke", "overhead_p50_ms"): False,
+}
+
+
+def sample_queries(documents: List[str], count: int, seed: int, words: int = 8) -> List[str]:
+    """Returns queries made of random word windows of random stored chunks."""
+    rng = random.Random(seed)
+    queries = []
+    while len(queries) < count:
+        tokens = rng.choice(documents).split()
+        if len(tokens) < words:
+            continue
+        start = rng.randint(0, len(tokens) - words)
+        queries.append(" ".join(tokens[start:start + words]))
+    return queries
+
+
+def stored_embeddings(vector_db, page_size: int = 5000):
+    """Returns the IDs, documents and normalized embeddings of every stored chunk."""
+    ids, documents, embeddings = [], [], []
+    offset = 0
+    while True:
+        page = vector_db.store.get(include=["documents", "metadatas", "embeddings"], limit=page_size, offset=offset)
+        if not len(page["ids"]):
+            break
+        ids.extend(page["ids"])
+        documents.extend(vector_db.resolve_documents(page["documents"], page["metadatas"]))
+        embeddings.extend(np.asarray(embedding, dtype=np.float32) for embedding in page["embeddings"])
+        offset += len(page["ids"])
+    matrix = np.stack(embeddings)
+    return ids, documents, matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def run(args, work_dir: str) -> Dict:
+    """Runs every stage and returns the results."""
+    # Set before the application modules read their configuration
+    os.environ["VECTOR_DB_PATH"] = os.path.join(work_dir, "vector_db")
+    os.environ["EMBEDDING_CACHE_DIR"] = os.path.join(work_dir, "embedding_cache")
+    os.environ["CHROMA_COLLECTION_NAME"] = "benchmark_suite"
+    os.environ["QUERY_CACHE_SIZE"] = "0"
+    os.environ.pop("ANSWER_CACHE_THRESHOLD", None)
+    from src.app import RAGAssistant
+    from src.documentloader import DocumentLoader
+
+    corpus_dir = args.corpus_dir
+    if not corpus_dir:
+        corpus_dir = os.path.join(work_dir, "corpus")
+        generate_corpus(corpus_dir, args.size_mb, seed=args.seed)
+
+    llm = FakeChatModel(latency_seconds=args.llm_latency_ms / 1000)
+    assistant = RAGAssistant(llm=llm)
+    vector_db = assistant.vector_db
+    vector_db.warm_up(background=False)
+    results = {
+        "config": {
+            "corpus_dir": args.corpus_dir or f"synthetic {args.size_mb} MB",
+            "backend": vector_db.backend,
+            "embedding_model": vector_db.embedding_model_name,
+            "queries": args.queries,
+            "k": args.k,
+            "llm_latency_ms": args.llm_latency_ms,
+            "python": sys.version.split()[0],
+        }
+    }
+
+    # Loader
+    started = time.perf_counter()
+    documents = DocumentLoader(corpus_dir).load_documents()
+    seconds = time.perf_counter() - started
+    megabytes = sum(len(doc["content"].encode("utf-8")) for doc in documents) / (1024 * 1024)
+    results["loader"] = {
+        "documents": len(documents),
+        "megabytes": round(megabytes, 2),
+        "seconds": round(seconds, 3),
+        "mb_per_second": round(megabytes / seconds, 2),
+    }
+    print(f"loader: {results['loader']}")
+
+    # Chunking
+    started = time.perf_counter()
+    chunks = sum(len(vector_db.chunk_text(doc["content"], chunk_size=vector_db.chunk_size)) for doc in documents)
+    seconds = time.perf_counter() - started
+    results["chunking"] = {
+        "chunks": chunks,
+        "seconds": round(seconds, 3),
+        "chunks_per_second": round(chunks / seconds, 1),
+        "mb_per_second": round(megabytes / seconds, 2),
+    }
+    print(f"chunking: {results['chunking']}")
+
+    # Ingestion
+    stats = vector_db.add_documents(documents)
+    results["ingestion"] = stats
+    print(f"ingestion: {stats}")
+
+    # Search latency and recall@k against brute force over the stored embeddings
+    ids, stored_documents, matrix = stored_embeddings(vector_db)
+    queries = sample_queries(stored_documents, args.queries, args.seed)
+    latencies = []
+    hits = 0
+    for query in queries:
+        started = time.perf_counter()
+        found = vector_db.search(query, n_results=args.k, mode="dense")
+        latencies.append(time.perf_counter() - started)
+        query_embedding = vector_db.embed_query(query)
+        query_embedding = query_embedding / np.linalg.norm(query_embedding)
+        truth = np.argpartition(-(matrix @ query_embedding), args.k - 1)[:args.k]
+        hits += len({ids[row] for row in truth}.intersection(found["ids"][0]))
+    results["search"] = {
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99),
+        "recall_at_k": round(hits / (len(queries) * args.k), 4),
+    }
+    print(f"search: {results['search']}")
+
+    # Full RAG invocation with the local LLM
+    latencies = []
+    for query in queries[:args.invoke_queries]:
+        started = time.perf_counter()
+        assistant.invoke(query, n_results=args.k)
+        latencies.append(time.perf_counter() - started)
+    results["invoke"] = {
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99),
+        "overhead_p50_ms": round(percentile_ms(latencies, 50) - args.llm_latency_ms, 3),
+    }
+    print(f"invoke: {results['invoke']}")
+
+    # Persist the cache now, its exit handler would run after the work directory is removed
+    vector_db.embedding_cache.flush()
+    return results
+
+
+def find_regressions(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Returns a description of every compared metric worse than the baseline by more than the tolerance."""
+    regressions = []
+    for (stage, metric), higher_is_better in COMPARED_METRICS.items():
+        value = results.get(stage, {}).get(metric)
+        previous = baseline.get(stage, {}).get(metric)
+        if value is None or previous is None:
+            continue
+        if higher_is_better and value < previous * (1 - tolerance):
+            regressions.append(f"{stage}.{metric}: {value} (baseline {previous})")
+        elif not higher_is_better and value > previous * (1 + tolerance):
+            regressions.append(f"{stage}.{metric}: {value} (baseline {previous})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the RAG assistant")
+    parser.add_argument("--size-mb", type=float, default=2, help="Size of the generated synthetic corpus in MB")
+    parser.add_argument("--corpus-dir", default="", help="Use the .md/.txt files of this directory instead of a synthetic corpus")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the corpus and the queries")
+    parser.add_argument("--queries", type=int, default=200, help="Number of timed search queries")
+    parser.add_argument("--invoke-queries", type=int, default=50, help="Number of timed RAGAssistant.invoke calls")
+    parser.add_argument("--k", type=int, default=3, help="Results per query")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated latency of the local LLM")
+    parser.add_argument("--output", default="", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", default="", help="JSON results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression against the baseline")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_suite_")
+    try:
+        results = run(args, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions detected:")
+            for regression in regressions:
+                print(f"- {regression}")
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+import numpy as np
+from src.vectorstore import create_vector_store
+
+"""
+Vector Store Backend Benchmark
+------------------------------
+Compares the ChromaDB backend and the memory-mapped NumPy flat backend on the same
+random embeddings: ingestion time, query latency percentiles and recall@k of each
+backend against exact brute-force search.
+
+Usage (from the project directory):
+    python -m benchmarks.vectorstores --chunks 50000 --dim 384 --queries 200 --output vectorstores.json
+"""
+
+
+def percentile_ms(latencies: List[float], percentile: float) -> float:
+    """Returns the percentile of the latencies (seconds) in milliseconds."""
+    return round(float(np.percentile(latencies, percentile)) * 1000, 3)
+
+
+def random_embeddings(count: int, dim: int, seed: int) -> np.ndarray:
+    """Returns normalized random embeddings."""
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def benchmark_backend(backend: str, embeddings: np.ndarray, queries: np.ndarray, k: int, batch_size: int, truth: np.ndarray) -> Dict:
+    """Ingests the embeddings into a fresh store of the backend and measures it."""
+    directory = tempfile.mkdtemp(prefix=f"bench_{backend}_")
+    try:
+        store = create_vector_store(backend, directory, "benchmark")
+        ids = [f"chunk_{idx}" for idx in range(len(embeddings))]
+
+        started = time.perf_counter()
+        for start in range(0, len(embeddings), batch_size):
+            end = start + batch_size
+            store.add(
+                ids[start:end],
+                embeddings[start:end].tolist(),
+                [f"document {idx}" for idx in range(start, min(end, len(embeddings)))],
+                [{"source": "benchmark"} for _ in range(start, min(end, len(embeddings)))],
+            )
+        store.flush()
+        ingest_seconds = time.perf_counter() - started
+
+        latencies = []
+        hits = 0
+        for row, query in enumerate(queries):
+            started = time.perf_counter()
+            results = store.query([query.tolist()], n_results=k)
+            latencies.append(time.perf_counter() - started)
+            found = {int(chunk_id.split("_")[1]) for chunk_id in results["ids"][0]}
+            hits += len(found.intersection(truth[row]))
+
+        return {
+            "ingest_seconds": round(ingest_seconds, 3),
+            "ingest_chunks_per_second": round(len(embeddings) / ingest_seconds, 1),
+            "query_p50_ms": percentile_ms(latencies, 50),
+            "query_p95_ms": percentile_ms(latencies, 95),
+            "query_p99_ms": percentile_ms(latencies, 99),
+            f"recall_at_{k}": round(hits / (len(queries) * k), 4),
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the vector store backends")
+    parser.add_argument("--chunks", type=int, default=20000, help="Number of stored embeddings")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension (all-MiniLM-L6-v2: 384)")
+    parser.add_argument("--queries", type=int, default=200, help="Number of timed queries")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Chunks added per call")
+    parser.add_argument("--backends", default="chroma,flat", help="Comma-separated backends to compare")
+    parser.add_argument("--output", default="", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    embeddings = random_embeddings(args.chunks, args.dim, seed=0)
+    queries = random_embeddings(args.queries, args.dim, seed=1)
+    truth = np.argsort(-(queries @ embeddings.T), axis=1)[:, :args.k]
+
+    results = {"chunks": args.chunks, "dim": args.dim, "queries": args.queries, "k": args.k, "backends": {}}
+    for backend in args.backends.split(","):
+        results["backends"][backend] = benchmark_backend(backend, embeddings, queries, args.k, args.batch_size, truth)
+        print(f"{backend}: {results['backends'][backend]}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
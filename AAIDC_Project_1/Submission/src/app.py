@@ -1,18 +1,20 @@
+import asyncio
 import os
-from typing import List
+import time
+import numpy as np
+from typing import List, Dict, Any, Iterable, AsyncIterator, Optional
 from dotenv import load_dotenv
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
 from .vectordb import VectorDB
-from langchain_openai import ChatOpenAI
-from langchain_groq import ChatGroq
-from langchain_google_genai import ChatGoogleGenerativeAI
-
-from langchain_community.document_loaders import TextLoader
+from .partitioning import filter_key, normalize_filters
 from .logmanager import LogManager
 import logging
 from .promptmanager import PromptManager
+from .querycache import SemanticAnswerCache
+from .contextassembler import ContextAssembler
+from .metrics import SIZE_BUCKETS, get_metrics
 
 class RAGAssistant:
     """
@@ -20,12 +22,20 @@ class RAGAssistant:
     Supports OpenAI, Groq, and Google Gemini APIs.
     """
 
-    def __init__(self):
-        """Initialize the RAG assistant."""
+    def __init__(self, llm=None):
+        """
+        Initialize the RAG assistant.
+
+        Args:
+            llm: LangChain chat model to use instead of the provider selected by the API keys
+                 (e.g. a local stand-in for benchmarks and offline runs)
+        """
         # Initialize LLM - check for available API keys in order of preference
         self.log = LogManager()
         self.log.add_logfile("ragassistant")
-        self.llm = self._initialize_llm()
+        self.metrics = get_metrics()
+        self.model_name = ""
+        self.llm = llm if llm is not None else self._initialize_llm()
         if not self.llm:
             raise ValueError(
                 "No valid API key found. Please set one of: "
@@ -44,75 +54,387 @@ class RAGAssistant:
 
         self.prompt_template = ChatPromptTemplate.from_template(self.prompt_prompt)
         
-        # Create the chain
+        # Create the chain, and its LLM part for the requests that format the prompt separately
         self.chain = self.prompt_template | self.llm | StrOutputParser()
+        self.answer_chain = self.llm | StrOutputParser()
 
         self.log.write_log("ragassistant", logging.INFO, "RAG chain created")
 
+        # Optional semantic answer cache, enabled by setting a similarity threshold
+        self.answer_cache = None
+        answer_cache_threshold = os.getenv("ANSWER_CACHE_THRESHOLD", "")
+        if answer_cache_threshold:
+            self.answer_cache = SemanticAnswerCache(
+                threshold=float(answer_cache_threshold),
+                max_size=int(os.getenv("ANSWER_CACHE_SIZE", "1024")),
+            )
+            self.log.write_log("ragassistant", logging.INFO, f"Semantic answer cache enabled with threshold {answer_cache_threshold}")
+
+        # Context assembly: MMR over more candidates than used, overlap removal and a token budget
+        self.context_candidate_factor = int(os.getenv("CONTEXT_CANDIDATE_FACTOR", "2"))
+        self.context_assembler = ContextAssembler(
+            token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000")),
+            mmr_lambda=float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7")),
+            duplicate_threshold=float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.95")),
+            model_name=self.model_name,
+        )
+
         self.log.write_log("ragassistant", logging.INFO, "RAG Assistant initialized successfully")
 
     def _initialize_llm(self):
         """
-        Initialize the LLM by checking for available API keys.
-        Tries OpenAI, Groq, and Google Gemini in that order.
+        Initialize the LLM of every provider with an API key: OpenAI, Groq and Google Gemini,
+        in the order of LLM_PROVIDERS (default: openai,groq,google).
+        With several providers, the LLMRouter hedges and fails over requests between them.
+        Provider modules are imported only when they are selected, to keep startup fast.
+        """
+        provider_names = [name.strip() for name in os.getenv("LLM_PROVIDERS", "openai,groq,google").split(",") if name.strip()]
+        providers = []
+        for provider_name in provider_names:
+            llm = self._create_llm(provider_name)
+            if llm is not None:
+                providers.append((provider_name, llm))
+
+        if not providers:
+            raise ValueError(
+                "No valid API key found. Please set one of: OPENAI_API_KEY, GROQ_API_KEY, or GOOGLE_API_KEY in your .env file"
+            )
+        if len(providers) == 1:
+            return providers[0][1]
+
+        from .llmrouter import LLMRouter
+        return LLMRouter(providers)
+
+    def _create_llm(self, provider_name: str):
+        """
+        Create the chat model of one provider, or return None if its API key is not set.
+        The model of the first created provider is the assistant's model_name.
         """
         # Check for OpenAI API key
-        if os.getenv("OPENAI_API_KEY"):
+        if provider_name == "openai" and os.getenv("OPENAI_API_KEY"):
             model_name = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+            self.model_name = self.model_name or model_name
             self.log.write_log("ragassistant", logging.INFO, f"Using OpenAI model: {model_name}")
+            import openai
+            from langchain_openai import ChatOpenAI
             return ChatOpenAI(
-                api_key=os.getenv("OPENAI_API_KEY"), model=model_name, temperature=0.0
+                api_key=os.getenv("OPENAI_API_KEY"), model=model_name, temperature=0.0,
+                **self._http_client_kwargs(
+                    ChatOpenAI, openai.OpenAI, openai.AsyncOpenAI,
+                    api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_API_BASE") or None,
+                ),
             )
 
-        elif os.getenv("GROQ_API_KEY"):
+        elif provider_name == "groq" and os.getenv("GROQ_API_KEY"):
             model_name = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+            self.model_name = self.model_name or model_name
             self.log.write_log("ragassistant", logging.INFO, f"Using Groq model: {model_name}")
+            import groq
+            from langchain_groq import ChatGroq
             return ChatGroq(
-                api_key=os.getenv("GROQ_API_KEY"), model=model_name, temperature=0.0
+                api_key=os.getenv("GROQ_API_KEY"), model=model_name, temperature=0.0,
+                **self._http_client_kwargs(
+                    ChatGroq, groq.Groq, groq.AsyncGroq,
+                    api_key=os.getenv("GROQ_API_KEY"), base_url=os.getenv("GROQ_API_BASE") or None,
+                ),
             )
 
-        elif os.getenv("GOOGLE_API_KEY"):
+        elif provider_name == "google" and os.getenv("GOOGLE_API_KEY"):
             model_name = os.getenv("GOOGLE_MODEL", "gemini-2.0-flash")
+            self.model_name = self.model_name or model_name
             self.log.write_log("ragassistant", logging.INFO, f"Using Google Gemini model: {model_name}")
+            from langchain_google_genai import ChatGoogleGenerativeAI
             return ChatGoogleGenerativeAI(
                 google_api_key=os.getenv("GOOGLE_API_KEY"),
                 model=model_name,
                 temperature=0.0,
             )
 
-        else:
-            raise ValueError(
-                "No valid API key found. Please set one of: OPENAI_API_KEY, GROQ_API_KEY, or GOOGLE_API_KEY in your .env file"
-            )
+        elif provider_name not in ("openai", "groq", "google"):
+            self.log.write_log("ragassistant", logging.ERROR, f"Unknown LLM provider: {provider_name}")
+        return None
+
+    def _http_client_kwargs(self, chat_model_class, sdk_client_class, sdk_async_client_class, **client_params) -> Dict[str, Any]:
+        """
+        Returns chat model arguments that make it use pooled httpx clients, so concurrent requests
+        share kept-alive connections to the provider. The pool is sized with LLM_MAX_CONNECTIONS
+        (default: 100) and LLM_MAX_KEEPALIVE_CONNECTIONS (default: 20).
 
-    def add_documents(self, documents: List) -> None:
+        Chat models with an 'http_async_client' field get the httpx clients. The pinned versions
+        (langchain-openai 0.0.5, langchain-groq 0.0.1) pass their one 'http_client' to both the
+        sync and the async SDK client, which needs an httpx.AsyncClient, so for them the SDK
+        clients are created here (with client_params) and passed as 'client' and 'async_client'.
+        """
+        import httpx
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        )
+        # Same timeouts as the provider SDK defaults
+        timeout = httpx.Timeout(600.0, connect=5.0)
+        http_client = httpx.Client(limits=limits, timeout=timeout)
+        http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        fields = getattr(chat_model_class, "model_fields", None) or getattr(chat_model_class, "__fields__", {})
+        if "http_async_client" in fields:
+            return {"http_client": http_client, "http_async_client": http_async_client}
+        return {
+            "client": sdk_client_class(http_client=http_client, **client_params).chat.completions,
+            "async_client": sdk_async_client_class(http_client=http_async_client, **client_params).chat.completions,
+        }
+
+    def add_documents(self, documents: Iterable, prune: bool = False, keep_sources: Optional[Iterable[str]] = None) -> Dict[str, Any]:
         """
         Add documents to the knowledge base.
 
         Args:
-            documents: List of documents
+            documents: List or generator of documents
+            prune: If True, remove previously ingested sources that are not in documents
+            keep_sources: Sources never removed by prune, e.g. the files the loader failed to read
+
+        Returns:
+            Dictionary with ingestion statistics
         """
-        self.log.write_log("ragassistant", logging.INFO, f"Adding {len(documents)} documents to VectorDB")
-        self.vector_db.add_documents(documents)
+        self.log.write_log("ragassistant", logging.INFO, "Adding documents to VectorDB")
+        return self.vector_db.add_documents(documents, prune=prune, keep_sources=keep_sources)
 
-    def invoke(self, input: str, n_results: int = 3) -> str:
+    def invoke(self, input: str, n_results: int = 3, filters: Optional[Dict[str, Any]] = None) -> str:
         """
         Query the RAG assistant.
 
         Args:
             input: User's input
             n_results: Number of relevant chunks to retrieve
+            filters: Only retrieve chunks of matching documents, e.g. {"tenant": "acme"}
+                     (see VectorDB.search)
 
         Returns:
-            Dictionary containing the answer and retrieved context
+            The answer of the LLM
         """
         llm_answer = ""
 
-        # Your implementation here
-        results = self.vector_db.search(input, n_results=n_results)
-        # results['documents'] is a list of lists, flatten it
-        documents = results.get('documents', [[]])[0] if results.get('documents') else []
-        context = "\n\n".join(documents)
-        llm_answer = self.chain.invoke({"context": context, "question": input})
+        with self.metrics.span("rag_invoke"):
+            retrieval = self._retrieve(input, n_results, filters=filters)
+            if retrieval["cached_answer"] is not None:
+                return retrieval["cached_answer"]
+
+            prompt = self._format_prompt(input, retrieval["context"])
+            with self.metrics.span("rag_llm"):
+                llm_answer = self.answer_chain.invoke(prompt)
+            self._cache_answer(retrieval, llm_answer)
         return llm_answer
 
+    async def ainvoke(
+        self,
+        input: str,
+        n_results: int = 3,
+        query_embedding: Optional[np.ndarray] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """
+        Query the RAG assistant asynchronously. Retrieval runs in an executor, so it
+        does not block the event loop.
+
+        Args:
+            input: User's input
+            n_results: Number of relevant chunks to retrieve
+            query_embedding: Already computed embedding of the input, if available
+            filters: Only retrieve chunks of matching documents (see VectorDB.search)
+
+        Returns:
+            The answer of the LLM
+        """
+        loop = asyncio.get_running_loop()
+        with self.metrics.span("rag_invoke"):
+            retrieval = await loop.run_in_executor(None, self._retrieve, input, n_results, query_embedding, filters)
+            if retrieval["cached_answer"] is not None:
+                return retrieval["cached_answer"]
+
+            prompt = self._format_prompt(input, retrieval["context"])
+            with self.metrics.span("rag_llm"):
+                llm_answer = await self.answer_chain.ainvoke(prompt)
+            self._cache_answer(retrieval, llm_answer)
+        return llm_answer
+
+    async def astream(
+        self,
+        input: str,
+        n_results: int = 3,
+        query_embedding: Optional[np.ndarray] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Query the RAG assistant and stream the answer tokens as the LLM generates them.
+
+        Args:
+            input: User's input
+            n_results: Number of relevant chunks to retrieve
+            query_embedding: Already computed embedding of the input, if available
+            filters: Only retrieve chunks of matching documents (see VectorDB.search)
+
+        Yields:
+            Parts of the answer of the LLM
+        """
+        loop = asyncio.get_running_loop()
+        retrieval = await loop.run_in_executor(None, self._retrieve, input, n_results, query_embedding, filters)
+        if retrieval["cached_answer"] is not None:
+            yield retrieval["cached_answer"]
+            return
+
+        prompt = self._format_prompt(input, retrieval["context"])
+        tokens = []
+        started = time.perf_counter()
+        async for token in self.answer_chain.astream(prompt):
+            if not tokens:
+                self.metrics.observe("rag_llm_time_to_first_token_seconds", time.perf_counter() - started)
+            tokens.append(token)
+            yield token
+        self.metrics.observe("rag_llm_seconds", time.perf_counter() - started)
+        self._cache_answer(retrieval, "".join(tokens))
+
+    def _retrieve(
+        self,
+        input: str,
+        n_results: int,
+        query_embedding: Optional[np.ndarray] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Embed the question and retrieve its context, or find its answer in the answer cache.
+
+        Args:
+            input: User's input
+            n_results: Number of relevant chunks to retrieve
+            query_embedding: Already computed embedding of the input, if available
+            filters: Only retrieve chunks of matching documents
+
+        Returns:
+            Dictionary with the 'query_embedding', the collection 'generation', the answer
+            cache 'scope', the 'cached_answer' (or None) and the 'context' for the prompt
+        """
+        filters = normalize_filters(filters)
+        if query_embedding is None:
+            with self.metrics.span("rag_query_embedding"):
+                query_embedding = self.vector_db.embed_query(input)
+        retrieval = {
+            "query_embedding": query_embedding,
+            "generation": self.vector_db.generation,
+            "scope": self._answer_scope(n_results, filters),
+            "cached_answer": None,
+            "context": "",
+        }
+        if self.answer_cache is not None:
+            retrieval["cached_answer"] = self.answer_cache.get(query_embedding, retrieval["scope"], retrieval["generation"])
+            if retrieval["cached_answer"] is not None:
+                self.log.write_log("ragassistant", logging.INFO, "Answer served from semantic answer cache")
+                self.metrics.inc("rag_answer_cache_hits_total")
+                return retrieval
+
+        with self.metrics.span("rag_retrieval"):
+            results = self.vector_db.search(
+                input,
+                n_results=n_results * self.context_candidate_factor,
+                query_embedding=query_embedding,
+                include_embeddings=True,
+                filters=filters,
+            )
+        with self.metrics.span("rag_context_assembly"):
+            retrieval["context"] = self._build_context(results, query_embedding, n_results)
+        return retrieval
+
+    def _format_prompt(self, input: str, context: str):
+        """
+        Format the prompt of one question and record its size.
+
+        Args:
+            input: User's input
+            context: Assembled context of the question
+
+        Returns:
+            The prompt value passed to the LLM
+        """
+        with self.metrics.span("rag_prompt_format"):
+            prompt = self.prompt_template.invoke({"context": context, "question": input})
+        if self.metrics.enabled:
+            text = prompt.to_string()
+            self.metrics.observe("rag_prompt_chars", len(text), SIZE_BUCKETS)
+            self.metrics.observe("rag_prompt_tokens", self.context_assembler.count_tokens(text), SIZE_BUCKETS)
+        return prompt
+
+    def _cache_answer(self, retrieval: Dict[str, Any], llm_answer: str) -> None:
+        """Stores an LLM answer in the semantic answer cache, if it is enabled."""
+        if self.answer_cache is not None:
+            self.answer_cache.put(retrieval["query_embedding"], retrieval["scope"], llm_answer, retrieval["generation"])
+
+    @staticmethod
+    def _answer_scope(n_results: int, filters: Optional[Dict[str, Any]]):
+        """Key under which answers are cached: answers of filtered questions are only reused for the same filters."""
+        return (n_results, filter_key(filters)) if filters else n_results
+
+    def batch(
+        self,
+        questions: List[str],
+        n_results: int = 3,
+        max_concurrency: int = 0,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[str]:
+        """
+        Answer many questions at once. All questions are embedded in one forward pass and
+        retrieved with one vector database query, then the LLM chain runs for all of them
+        with a bounded number of concurrent requests.
+
+        Args:
+            questions: User questions
+            n_results: Number of relevant chunks to retrieve per question
+            max_concurrency: Maximum number of concurrent LLM requests (default: LLM_MAX_CONCURRENCY or 8)
+            filters: Only retrieve chunks of matching documents, for every question (see VectorDB.search)
+
+        Returns:
+            List of answers, in the order of the questions
+        """
+        max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.log.write_log("ragassistant", logging.INFO, f"Answering {len(questions)} questions in batch (max concurrency: {max_concurrency})")
+        self.metrics.inc("rag_batch_questions_total", len(questions))
+
+        filters = normalize_filters(filters)
+        scope = self._answer_scope(n_results, filters)
+        query_embeddings = self.vector_db.embed_queries(questions)
+        generation = self.vector_db.generation
+        answers = [None] * len(questions)
+        if self.answer_cache is not None:
+            for idx, query_embedding in enumerate(query_embeddings):
+                answers[idx] = self.answer_cache.get(query_embedding, scope, generation)
+
+        pending = [idx for idx, answer in enumerate(answers) if answer is None]
+        if pending:
+            all_results = self.vector_db.search_many(
+                [questions[idx] for idx in pending],
+                n_results=n_results * self.context_candidate_factor,
+                query_embeddings=[query_embeddings[idx] for idx in pending],
+                include_embeddings=True,
+                filters=filters,
+            )
+            prompts = [
+                self._format_prompt(questions[idx], self._build_context(results, query_embeddings[idx], n_results))
+                for idx, results in zip(pending, all_results)
+            ]
+            with self.metrics.span("rag_llm_batch"):
+                llm_answers = self.answer_chain.batch(prompts, config={"max_concurrency": max_concurrency})
+            for idx, llm_answer in zip(pending, llm_answers):
+                answers[idx] = llm_answer
+                if self.answer_cache is not None:
+                    self.answer_cache.put(query_embeddings[idx], scope, llm_answer, generation)
+        return answers
+
+    def _build_context(self, results: Dict[str, Any], query_embedding: np.ndarray, n_results: int) -> str:
+        """
+        Assemble the retrieved documents of one query into the context of the prompt.
+
+        Args:
+            results: Search results of the vector database, with the chunk embeddings
+            query_embedding: Embedding of the query
+            n_results: Maximum number of chunks in the context
+
+        Returns:
+            The context as a string
+        """
+        return self.context_assembler.assemble(results, query_embedding, max_chunks=n_results)
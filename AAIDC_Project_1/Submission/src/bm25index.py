@@ -0,0 +1,171 @@
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+from .logmanager import LogManager
+
+"""
+BM25 Index Module
+-----------------
+In-process inverted index for lexical (keyword) retrieval with Okapi BM25 scoring.
+It is updated incrementally together with the vector database, so exact-term queries
+(identifiers, acronyms, error codes) can be matched even when dense retrieval misses them.
+
+Usage:
+    index = BM25Index("./chroma_db/bm25_rag_documents.json")
+    index.add(["chunk_1"], ["Error E1234 in module foo.bar"])
+    index.search("E1234", k=5)
+    index.save()
+"""
+
+# Words, numbers and compound identifiers such as foo.bar, ERR_42 or x-ray
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_]+(?:[.\-][A-Za-z0-9_]+)*")
+SUBTOKEN_PATTERN = re.compile(r"[.\-_]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into lowercase terms. Compound identifiers are indexed both as a whole
+    and by their parts, so 'ERR_42' matches the queries 'ERR_42', 'err' and '42'.
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        terms.append(token)
+        parts = [part for part in SUBTOKEN_PATTERN.split(token) if part]
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+class BM25Index:
+    """
+    Incrementally updatable BM25 inverted index persisted as JSON.
+    """
+
+    def __init__(self, index_path: str, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize the index and load it from disk if it exists.
+
+        Args:
+            index_path: Path of the JSON index file
+            k1: Term frequency saturation parameter
+            b: Document length normalization parameter
+        """
+        self.log = LogManager()
+        self.log.add_logfile("vectordb")
+        self.index_path = index_path
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.doc_terms: Dict[str, List[str]] = {}
+        self.total_length = 0
+        self.dirty = False
+        self._lock = threading.Lock()
+        if os.path.exists(index_path):
+            self.load()
+
+    def add(self, ids: List[str], texts: List[str]) -> None:
+        """Indexes the texts under the given IDs, replacing previously indexed versions."""
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                if doc_id in self.doc_lengths:
+                    self._remove(doc_id)
+                terms = tokenize(text)
+                frequencies = Counter(terms)
+                for term, frequency in frequencies.items():
+                    self.postings.setdefault(term, {})[doc_id] = frequency
+                self.doc_terms[doc_id] = list(frequencies)
+                self.doc_lengths[doc_id] = len(terms)
+                self.total_length += len(terms)
+            self.dirty = True
+
+    def remove(self, ids: List[str]) -> None:
+        """Removes the given IDs from the index."""
+        with self._lock:
+            for doc_id in ids:
+                if doc_id in self.doc_lengths:
+                    self._remove(doc_id)
+            self.dirty = True
+
+    def clear(self) -> None:
+        """Removes every document from the index."""
+        with self._lock:
+            self.postings = {}
+            self.doc_lengths = {}
+            self.doc_terms = {}
+            self.total_length = 0
+            self.dirty = True
+
+    def search(self, query: str, k: int = 10, allowed: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Returns the k best matching IDs with their BM25 scores, best first.
+
+        Args:
+            query: Search query
+            k: Number of results
+            allowed: If set, only these IDs are scored
+        """
+        with self._lock:
+            doc_count = len(self.doc_lengths)
+            if not doc_count:
+                return []
+            average_length = self.total_length / doc_count
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    if allowed is not None and doc_id not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self) -> None:
+        """Writes the index to disk atomically, if it changed."""
+        if not self.dirty:
+            return
+        with self._lock:
+            directory = os.path.dirname(self.index_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump({"k1": self.k1, "b": self.b, "postings": self.postings, "doc_lengths": self.doc_lengths}, file)
+            os.replace(tmp_path, self.index_path)
+            self.dirty = False
+
+    def load(self) -> None:
+        """Loads the index from disk."""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            self.log.write_log("vectordb", logging.ERROR, f"Error loading BM25 index: {str(e)}")
+            return
+        self.postings = data.get("postings", {})
+        self.doc_lengths = data.get("doc_lengths", {})
+        self.total_length = sum(self.doc_lengths.values())
+        self.doc_terms = {}
+        for term, postings in self.postings.items():
+            for doc_id in postings:
+                self.doc_terms.setdefault(doc_id, []).append(term)
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def _remove(self, doc_id: str) -> None:
+        for term in self.doc_terms.pop(doc_id, []):
+            postings = self.postings.get(term, {})
+            postings.pop(doc_id, None)
+            if not postings:
+                self.postings.pop(term, None)
+        self.total_length -= self.doc_lengths.pop(doc_id)
@@ -0,0 +1,221 @@
+import collections
+import mmap
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+"""
+Chunking Module
+---------------
+Text splitting shared by the vector database and the document loader workers, so that
+chunks created in a worker process are identical to the chunks VectorDB would create.
+
+Chunks can also be described by compact ChunkRecords: the source file and the byte
+offsets of the chunk in it. With CHUNK_STORAGE=offsets the vector store keeps only these
+offsets, and ChunkTextResolver reads the text of the returned hits from the memory-mapped
+source files. Offsets are only used for a file whose bytes are exactly the ingested text,
+and every record carries the size and modification time of the file at ingestion, so a
+file that changed since is never read as the text of its chunks.
+
+Usage:
+    chunks = split_text(text, chunk_size=250, chunk_overlap=100)
+    stamp = source_stamp(source, text)
+    if stamp is not None:
+        records = chunk_records(text, source, chunks, stamp)
+        texts = ChunkTextResolver().resolve(records)
+"""
+
+# Tried in order: paragraphs, lines, sentences, words, characters
+SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+
+
+@lru_cache(maxsize=8)
+def create_text_splitter(chunk_size: int, chunk_overlap: int):
+    """
+    Returns LangChain's RecursiveCharacterTextSplitter for the parameters. Splitters are
+    stateless and reused across calls.
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=SEPARATORS,
+        length_function=len,
+    )
+
+
+def split_text(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """
+    Splits text into overlapping chunks.
+
+    Args:
+        text: Input text
+        chunk_size: Approximate number of characters per chunk
+        chunk_overlap: Number of characters shared by consecutive chunks
+
+    Returns:
+        List of text chunks
+    """
+    return create_text_splitter(chunk_size, chunk_overlap).split_text(text)
+
+
+class ChunkRecord:
+    """
+    Location of a chunk: its source file, the start and end byte offsets in the file and
+    the (size, mtime_ns) stamp of the file when the chunk was ingested.
+    """
+
+    __slots__ = ("source", "start", "end", "stamp")
+
+    def __init__(self, source: str, start: int, end: int, stamp: Optional[Tuple[int, int]] = None):
+        self.source = source
+        self.start = start
+        self.end = end
+        self.stamp = stamp
+
+    def to_metadata(self) -> Dict[str, int]:
+        """Returns the offsets and the file stamp as chunk metadata."""
+        metadata = {"chunk_start": self.start, "chunk_end": self.end}
+        if self.stamp is not None:
+            metadata["chunk_source_size"], metadata["chunk_source_mtime_ns"] = self.stamp
+        return metadata
+
+    @classmethod
+    def from_metadata(cls, metadata: Optional[Dict]) -> Optional["ChunkRecord"]:
+        """Returns the record stored in the chunk metadata, or None for chunks stored inline."""
+        if not metadata or "chunk_start" not in metadata:
+            return None
+        stamp = None
+        if "chunk_source_size" in metadata:
+            stamp = (int(metadata["chunk_source_size"]), int(metadata["chunk_source_mtime_ns"]))
+        return cls(metadata.get("source", ""), int(metadata["chunk_start"]), int(metadata["chunk_end"]), stamp)
+
+
+# Chunk metadata keys of a ChunkRecord, and their version: collections of older records are
+# ingested again
+RECORD_METADATA_KEYS = ("chunk_start", "chunk_end", "chunk_source_size", "chunk_source_mtime_ns")
+CHUNK_RECORD_VERSION = 2
+
+
+def source_stamp(source: str, text: str) -> Optional[Tuple[int, int]]:
+    """
+    Returns the (size, mtime_ns) stamp of the source file if its bytes are exactly the
+    utf-8 encoded text, else None (missing or other file, or changed while being read).
+    """
+    data = text.encode("utf-8")
+    try:
+        before = os.stat(source)
+        if before.st_size != len(data):
+            return None
+        with open(source, "rb") as file:
+            matches = file.read() == data
+        after = os.stat(source)
+    except OSError:
+        return None
+    stamp = (after.st_size, after.st_mtime_ns)
+    if not matches or (before.st_size, before.st_mtime_ns) != stamp:
+        return None
+    return stamp
+
+
+def chunk_records(text: str, source: str, chunks: List[str], stamp: Optional[Tuple[int, int]] = None) -> List[ChunkRecord]:
+    """
+    Locates the chunks of a text, in order, and returns their utf-8 byte offsets.
+
+    Args:
+        text: The text the chunks were split from (the content of the source file)
+        source: Path of the source file
+        chunks: Chunks of split_text(text, ...)
+        stamp: (size, mtime_ns) of the source file, see source_stamp()
+
+    Returns:
+        One ChunkRecord per chunk
+    """
+    ascii_only = text.isascii()
+    records = []
+    search_from = 0
+    # Character offset -> byte offset, advanced incrementally for non-ASCII text
+    char_pos = byte_pos = 0
+    for chunk in chunks:
+        start = text.find(chunk, search_from)
+        if start < 0:
+            raise ValueError(f"Chunk not found in the text of {source}")
+        search_from = start + 1
+        end = start + len(chunk)
+        if ascii_only:
+            records.append(ChunkRecord(source, start, end, stamp))
+            continue
+        byte_pos += len(text[char_pos:start].encode("utf-8"))
+        char_pos = start
+        records.append(ChunkRecord(source, byte_pos, byte_pos + len(chunk.encode("utf-8")), stamp))
+    return records
+
+
+class ChunkTextResolver:
+    """
+    Reads chunk texts from memory-mapped source files. The most recently used files stay
+    mapped; the OS page cache keeps their hot pages in memory.
+    """
+
+    def __init__(self, max_open_files: int = 64):
+        """
+        Initialize the resolver.
+
+        Args:
+            max_open_files: Number of source files kept mapped
+        """
+        self.max_open_files = max_open_files
+        self._maps = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, records: List[ChunkRecord]) -> List[Optional[str]]:
+        """
+        Returns the texts of the chunk records. The text of a record whose source file is
+        missing, too short for its offsets, or changed since the chunk was ingested (its
+        size and modification time differ from the record's stamp) is None.
+        """
+        texts = []
+        with self._lock:
+            for record in records:
+                mapped, stamp = self._map(record.source)
+                if mapped is None or record.stamp is None or tuple(record.stamp) != stamp or record.end > len(mapped):
+                    texts.append(None)
+                    continue
+                texts.append(mapped[record.start:record.end].decode("utf-8", errors="replace"))
+        return texts
+
+    def close(self) -> None:
+        """Unmaps every source file."""
+        with self._lock:
+            for _, mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+
+    def _map(self, source: str) -> Tuple[Optional[mmap.mmap], Optional[Tuple[int, int]]]:
+        """
+        Returns the memory map of the source file and its (size, mtime_ns) stamp, remapping
+        the file if it changed.
+        """
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return None, None
+        stamp = (stat.st_size, stat.st_mtime_ns)
+        entry = self._maps.get(source)
+        if entry is not None:
+            if entry[0] == stamp:
+                self._maps.move_to_end(source)
+                return entry[1], stamp
+            self._maps.pop(source)
+            entry[1].close()
+        if stat.st_size == 0:
+            return None, stamp
+        with open(source, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[source] = (stamp, mapped)
+        if len(self._maps) > self.max_open_files:
+            _, (_, oldest) = self._maps.popitem(last=False)
+            oldest.close()
+        return mapped, stamp
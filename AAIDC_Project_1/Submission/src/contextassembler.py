@@ -0,0 +1,184 @@
+import logging
+import math
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from .logmanager import LogManager
+
+"""
+Context Assembler Module
+------------------------
+Turns the retrieved chunks of one query into the context of the prompt, with as few
+prompt tokens as possible:
+
+- near-duplicate chunks are suppressed with maximal marginal relevance (MMR) on the
+  chunk embeddings returned by the vector database
+- the selected chunks are packed into a token budget, most relevant first
+- adjacent chunks of the same source (by 'chunk_index') are merged and the text they
+  share through the chunk overlap is kept only once
+
+Tokens are counted with tiktoken when it is installed, otherwise estimated as
+4 characters per token.
+
+Usage:
+    assembler = ContextAssembler(token_budget=1500, model_name="gpt-4o-mini")
+    context = assembler.assemble(results, query_embedding, max_chunks=3)
+"""
+
+# Shortest suffix/prefix match treated as chunk overlap rather than a coincidence
+MIN_OVERLAP_CHARS = 20
+
+
+def get_token_counter(model_name: str = "") -> Callable[[str], int]:
+    """
+    Returns a function counting the tokens of a text for the model.
+
+    Args:
+        model_name: Name of the LLM, used to select the tiktoken encoding
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return lambda text: math.ceil(len(text) / 4)
+    try:
+        encoding = tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def merge_overlapping(first: str, second: str) -> str:
+    """Concatenates two consecutive chunks, keeping the text they overlap on only once."""
+    for length in range(min(len(first), len(second)), MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:length]):
+            return first + second[length:]
+    return f"{first} {second}"
+
+
+class ContextAssembler:
+    """
+    Token-budgeted context assembly with MMR, near-duplicate suppression and overlap removal.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 2000,
+        mmr_lambda: float = 0.7,
+        duplicate_threshold: float = 0.95,
+        model_name: str = "",
+    ):
+        """
+        Initialize the assembler.
+
+        Args:
+            token_budget: Maximum number of context tokens, 0 for no limit
+            mmr_lambda: Weight of relevance against diversity in MMR (1.0: relevance only)
+            duplicate_threshold: Cosine similarity above which a chunk counts as a near-duplicate
+                                 of an already selected chunk and is dropped
+            model_name: Name of the LLM, used to count tokens
+        """
+        self.log = LogManager()
+        self.log.add_logfile("ragassistant")
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+        self.count_tokens = get_token_counter(model_name)
+
+    def assemble(self, results: Dict[str, Any], query_embedding: Optional[np.ndarray] = None, max_chunks: int = 0) -> str:
+        """
+        Builds the context of one query from its search results.
+
+        Args:
+            results: Search results of one query, best first (optionally with 'embeddings')
+            query_embedding: Embedding of the query, used by MMR
+            max_chunks: Maximum number of selected chunks, 0 for no limit
+
+        Returns:
+            The context as a string
+        """
+        documents = results.get("documents", [[]])[0] if results.get("documents") else []
+        if not documents:
+            return ""
+        metadatas = results.get("metadatas", [[]])[0] if results.get("metadatas") else []
+        metadatas = metadatas or [{} for _ in documents]
+        embeddings = results.get("embeddings", [[]])[0] if results.get("embeddings") is not None else None
+
+        order = self._select(documents, embeddings, query_embedding)
+        if max_chunks:
+            order = order[:max_chunks]
+
+        # Pack the chunks into the budget, most relevant first
+        selected: List[int] = []
+        for idx in order:
+            if self.token_budget and self.count_tokens(self._join(documents, metadatas, selected + [idx])) > self.token_budget:
+                continue
+            selected.append(idx)
+
+        context = self._join(documents, metadatas, selected)
+        if self.log.is_enabled("ragassistant", logging.INFO):
+            self.log.write_log(
+                "ragassistant",
+                logging.INFO,
+                "Context assembled from %d of %d chunks: %d tokens (raw: %d)",
+                len(selected), len(documents), self.count_tokens(context), self.count_tokens("\n\n".join(documents)),
+            )
+        return context
+
+    def _select(self, documents: List[str], embeddings, query_embedding) -> List[int]:
+        """Orders the chunks by MMR and drops near-duplicates."""
+        if embeddings is None or len(embeddings) != len(documents) or query_embedding is None:
+            # Without embeddings, keep the ranking and drop exact duplicates
+            seen = set()
+            order = []
+            for idx, document in enumerate(documents):
+                if document not in seen:
+                    seen.add(document)
+                    order.append(idx)
+            return order
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        relevance = vectors @ query
+        similarity = vectors @ vectors.T
+
+        order = []
+        remaining = list(range(len(documents)))
+        while remaining:
+            if order:
+                redundancy = similarity[np.ix_(remaining, order)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining), dtype=np.float32)
+            scores = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+            best = int(np.argmax(scores))
+            idx = remaining.pop(best)
+            if redundancy[best] >= self.duplicate_threshold:
+                continue
+            order.append(idx)
+        return order
+
+    @staticmethod
+    def _join(documents: List[str], metadatas: List[Dict], selected: List[int]) -> str:
+        """
+        Merges adjacent chunks of the same source and joins the merged passages,
+        in the order of their most relevant chunk.
+        """
+        positioned = []
+        passages = []
+        for rank, idx in enumerate(selected):
+            metadata = metadatas[idx] or {}
+            try:
+                positioned.append((str(metadata["source"]), int(metadata["chunk_index"]), rank, idx))
+            except (KeyError, TypeError, ValueError):
+                passages.append({"rank": rank, "text": documents[idx]})
+
+        previous = None
+        for source, chunk_index, rank, idx in sorted(positioned):
+            if previous and previous["source"] == source and previous["end"] == chunk_index - 1:
+                previous["text"] = merge_overlapping(previous["text"], documents[idx])
+                previous["end"] = chunk_index
+                previous["rank"] = min(previous["rank"], rank)
+            else:
+                previous = {"source": source, "end": chunk_index, "rank": rank, "text": documents[idx]}
+                passages.append(previous)
+        return "\n\n".join(passage["text"] for passage in sorted(passages, key=lambda passage: passage["rank"]))
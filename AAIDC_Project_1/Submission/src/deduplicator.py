@@ -0,0 +1,300 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from .logmanager import LogManager
+
+"""
+Deduplication Module
+--------------------
+Detects exact and near-duplicate chunks at ingestion time, so repeated boilerplate,
+headers and copied documents are embedded and stored only once.
+
+Every stored ("canonical") chunk is indexed by the hash of its normalized text and by
+a MinHash signature of its word bigrams. A new chunk whose normalized text is identical
+to a canonical chunk ('exact' mode), or whose estimated Jaccard similarity to one is at
+least the threshold ('near' mode), is not embedded: it is linked to the canonical chunk,
+which lists the sources of its duplicates in its 'duplicate_sources' metadata and its own
+ID in its 'canonical_id' metadata, so search filters on a duplicate's source can match it.
+
+Near-duplicate candidates are found with locality-sensitive hashing: the signature is
+split into bands, and only canonical chunks that agree with the new chunk on a whole
+band are compared. With 16 bands of 4 hashes, a pair with a Jaccard similarity of 0.7
+shares a band with a probability of 99%.
+
+Chunks are only compared within the same scope (tenant and partition), so duplicates
+never link chunks of different tenants. The index is persisted as a JSON file next to
+the collection.
+
+Usage:
+    deduplicator = ChunkDeduplicator("./chroma_db/dedup_index_rag_documents.json", "near")
+    canonical_id = deduplicator.deduplicate(chunk_id, text, scope, source)
+    if canonical_id is None:
+        ...  # new canonical chunk: embed and store it
+    deduplicator.save()
+"""
+
+DEDUPLICATION_MODES = ("none", "exact", "near")
+# Version 2: canonical chunks carry their 'canonical_id' metadata
+DEDUP_INDEX_VERSION = 2
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+
+_WORD_PATTERN = re.compile(r"\w+")
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_HASH_MASK = np.uint64(0xFFFFFFFF)
+# Fixed random permutations (a * x + b) mod p, so signatures are comparable across runs
+_PERMUTATIONS = np.random.RandomState(1).randint(1, 1 << 32, size=(2, MINHASH_PERMUTATIONS), dtype=np.uint64)
+
+
+def normalize_text(text: str) -> str:
+    """Returns the text in lower case with collapsed whitespace."""
+    return " ".join(text.lower().split())
+
+
+def text_hash(text: str) -> str:
+    """Returns the hash of the normalized text, identical for exact duplicates."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()[:32]
+
+
+def minhash(text: str, shingle_size: int = 2) -> np.ndarray:
+    """
+    Returns the MinHash signature of the word shingles of a text. The fraction of equal
+    values of two signatures estimates the Jaccard similarity of their shingle sets.
+
+    Args:
+        text: Text to hash
+        shingle_size: Number of consecutive words per shingle
+
+    Returns:
+        1D uint32 array of MINHASH_PERMUTATIONS values
+    """
+    words = _WORD_PATTERN.findall(text.lower())
+    shingles = {" ".join(words[idx:idx + shingle_size]) for idx in range(max(1, len(words) - shingle_size + 1))}
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little") for shingle in shingles],
+        dtype=np.uint64,
+    )
+    permuted = (hashes[:, None] * _PERMUTATIONS[0] + _PERMUTATIONS[1]) % _MERSENNE_PRIME & _HASH_MASK
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def _encode_signature(signature: np.ndarray) -> str:
+    return base64.b64encode(signature.astype("<u4").tobytes()).decode("ascii")
+
+
+def _decode_signature(encoded: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(encoded), dtype="<u4").astype(np.uint32)
+
+
+class ChunkDeduplicator:
+    """
+    Persistent index of canonical chunks and the duplicates linked to them.
+    """
+
+    def __init__(self, index_path: str, mode: str = "near", threshold: float = 0.7):
+        """
+        Initialize the deduplication index and load it from disk if it exists.
+
+        Args:
+            index_path: Path of the JSON index file
+            mode: 'exact' to link identical chunks (ignoring case and whitespace),
+                  'near' to also link chunks with a similar set of word bigrams
+            threshold: Minimum estimated Jaccard similarity of near-duplicates (0 to 1)
+        """
+        if mode not in DEDUPLICATION_MODES[1:]:
+            raise ValueError(f"Unknown deduplication mode: {mode}. Use 'exact' or 'near'")
+        if not 0 < threshold <= 1:
+            raise ValueError(f"Invalid deduplication threshold: {threshold}. Use a value in (0, 1]")
+        self.log = LogManager()
+        self.log.add_logfile("vectordb")
+        self.index_path = index_path
+        self.mode = mode
+        self.threshold = threshold
+        # Canonical chunk ID -> {"hash", "scope", "duplicates": {duplicate ID: source}} (and "minhash" in near mode)
+        self.canonicals: Dict[str, Dict] = {}
+        self.links: Dict[str, str] = {}
+        self._exact: Dict[str, str] = {}
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: Dict[Tuple[str, int, bytes], List[str]] = {}
+        self._dirty: Set[str] = set()
+        self.exists = os.path.exists(index_path)
+        if self.exists:
+            self.load()
+
+    def __len__(self) -> int:
+        """Returns the number of linked duplicates."""
+        return len(self.links)
+
+    def _bucket_keys(self, scope: str, signature: np.ndarray) -> List[Tuple[str, int, bytes]]:
+        rows = MINHASH_PERMUTATIONS // LSH_BANDS
+        return [(scope, band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+
+    def _index(self, chunk_id: str, entry: Dict) -> None:
+        self._exact[f"{entry['scope']}|{entry['hash']}"] = chunk_id
+        if self.mode == "near":
+            signature = _decode_signature(entry["minhash"])
+            self._signatures[chunk_id] = signature
+            for key in self._bucket_keys(entry["scope"], signature):
+                self._buckets.setdefault(key, []).append(chunk_id)
+
+    def _unindex(self, chunk_id: str, entry: Dict) -> None:
+        exact_key = f"{entry['scope']}|{entry['hash']}"
+        if self._exact.get(exact_key) == chunk_id:
+            del self._exact[exact_key]
+        signature = self._signatures.pop(chunk_id, None)
+        if signature is not None:
+            for key in self._bucket_keys(entry["scope"], signature):
+                bucket = self._buckets.get(key, [])
+                if chunk_id in bucket:
+                    bucket.remove(chunk_id)
+                if not bucket:
+                    self._buckets.pop(key, None)
+
+    def _most_similar(self, scope: str, signature: np.ndarray) -> Optional[str]:
+        """Returns the canonical chunk with the highest estimated similarity at or above the threshold."""
+        best_id, best_similarity = None, self.threshold
+        seen = set()
+        for key in self._bucket_keys(scope, signature):
+            for candidate in self._buckets.get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                similarity = float(np.mean(self._signatures[candidate] == signature))
+                if similarity >= best_similarity:
+                    best_id, best_similarity = candidate, similarity
+        return best_id
+
+    def deduplicate(self, chunk_id: str, text: str, scope: str = "", source: str = "") -> Optional[str]:
+        """
+        Links the chunk to the canonical chunk it duplicates, or registers it as a new canonical chunk.
+
+        Args:
+            chunk_id: ID of the chunk
+            text: Text of the chunk
+            scope: Scope of the chunk (tenant and partition)
+            source: Source of the chunk's document
+
+        Returns:
+            The ID of the canonical chunk if the chunk is a duplicate, None if it has to be stored
+        """
+        if chunk_id in self.canonicals:
+            return None
+        if chunk_id in self.links:
+            return self.links[chunk_id]
+        digest = text_hash(text)
+        canonical_id = self._exact.get(f"{scope}|{digest}")
+        signature = None
+        if canonical_id is None and self.mode == "near":
+            signature = minhash(text)
+            canonical_id = self._most_similar(scope, signature)
+        if canonical_id is not None:
+            self.canonicals[canonical_id]["duplicates"][chunk_id] = source
+            self.links[chunk_id] = canonical_id
+            self._dirty.add(canonical_id)
+            return canonical_id
+
+        entry = {"hash": digest, "scope": scope, "duplicates": {}}
+        if signature is not None:
+            entry["minhash"] = _encode_signature(signature)
+        self.canonicals[chunk_id] = entry
+        self._index(chunk_id, entry)
+        return None
+
+    def is_duplicate(self, chunk_id: str) -> bool:
+        """Returns True if the chunk is linked to a canonical chunk instead of being stored."""
+        return chunk_id in self.links
+
+    def canonical_of(self, chunk_id: str) -> Optional[str]:
+        """Returns the canonical chunk a duplicate is linked to, or None if the chunk is not a duplicate."""
+        return self.links.get(chunk_id)
+
+    def duplicate_sources(self, canonical_id: str) -> List[str]:
+        """Returns the sources of the duplicates of a canonical chunk."""
+        entry = self.canonicals.get(canonical_id)
+        return sorted(set(entry["duplicates"].values())) if entry else []
+
+    def remove(self, chunk_ids: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Removes deleted chunks from the index. Deleting a duplicate unlinks it; deleting a
+        canonical chunk orphans its duplicates, which have to be ingested again.
+
+        Args:
+            chunk_ids: IDs of the deleted chunks
+
+        Returns:
+            The IDs of the orphaned duplicates, grouped by their source
+        """
+        orphans: Dict[str, List[str]] = {}
+        for chunk_id in chunk_ids:
+            canonical_id = self.links.pop(chunk_id, None)
+            if canonical_id is not None:
+                self.canonicals[canonical_id]["duplicates"].pop(chunk_id, None)
+                self._dirty.add(canonical_id)
+                continue
+            entry = self.canonicals.pop(chunk_id, None)
+            if entry is None:
+                continue
+            self._unindex(chunk_id, entry)
+            self._dirty.discard(chunk_id)
+            for duplicate_id, source in entry["duplicates"].items():
+                del self.links[duplicate_id]
+                orphans.setdefault(source, []).append(duplicate_id)
+        return orphans
+
+    def take_dirty(self) -> List[str]:
+        """Returns the canonical chunks whose duplicates changed since the last call."""
+        dirty = [chunk_id for chunk_id in self._dirty if chunk_id in self.canonicals]
+        self._dirty = set()
+        return dirty
+
+    def clear(self) -> None:
+        """Removes every chunk from the index."""
+        self.canonicals = {}
+        self.links = {}
+        self._exact = {}
+        self._signatures = {}
+        self._buckets = {}
+        self._dirty = set()
+
+    def restore(self, canonicals: Dict[str, Dict]) -> None:
+        """Replaces the index with the given canonical chunks and their duplicates (see self.canonicals)."""
+        self.clear()
+        for chunk_id, entry in canonicals.items():
+            self.canonicals[chunk_id] = entry
+            self._index(chunk_id, entry)
+            for duplicate_id in entry["duplicates"]:
+                self.links[duplicate_id] = chunk_id
+
+    def load(self) -> None:
+        """Loads the index from disk."""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            self.log.write_log("vectordb", logging.ERROR, f"Error loading deduplication index: {str(e)}")
+            self.exists = False
+            return
+        if data.get("version") != DEDUP_INDEX_VERSION or data.get("mode") != self.mode or data.get("threshold") != self.threshold:
+            self.log.write_log("vectordb", logging.INFO, "Deduplication settings changed, the deduplication index is discarded")
+            self.exists = False
+            return
+        self.restore(data.get("chunks", {}))
+
+    def save(self) -> None:
+        """Writes the index to disk atomically."""
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"version": DEDUP_INDEX_VERSION, "mode": self.mode, "threshold": self.threshold, "chunks": self.canonicals},
+                file,
+            )
+        os.replace(tmp_path, self.index_path)
+        self.exists = True
@@ -1,54 +1,191 @@
-from typing import List
+from typing import Dict, Iterator, List, Optional
+import collections
+import fnmatch
+import itertools
+import multiprocessing
 import os
-from langchain_community.document_loaders import TextLoader
+from concurrent.futures import ProcessPoolExecutor
 from .logmanager import LogManager
+from .chunking import split_text
+from .ingestionmanifest import content_hash
 import logging
 
 """
 Document Loader Module
 ----------------------
-This module provides functionality to load documents from the ./data/ folder. It supports loading text files (.txt) and markdown files (.md).
+This module provides functionality to load documents from the ./data/ folder and its
+subfolders. By default it loads text files (.txt) and markdown files (.md); other files
+can be selected with include and exclude glob patterns.
+
+Files are read (and optionally chunked) in a pool of worker processes, and documents are
+yielded as they are ready, with their file path ('source'), 'size' and 'mtime' as metadata.
+Given the content hashes of the ingested files, the workers skip chunking the unchanged ones.
+A missing root folder raises a ValueError, and the paths of the files that could not be
+read are collected in failed_paths, so a pruning ingestion keeps their chunks.
+
+Usage:
+    loader = DocumentLoader("./data/", exclude=["drafts/*"], chunk_size=250, chunk_overlap=100,
+                            known_hashes=vector_db.manifest.hashes())
+    for document in loader.iter_documents():
+        ...
+    vector_db.add_documents(loader.iter_documents(), prune=True, keep_sources=loader.failed_paths)
+    documents = loader.load_documents()
 """
+
+# Files per worker task, and tasks in flight per worker
+TASK_FILES = 16
+TASKS_PER_WORKER = 4
+
+
+def _read_files(paths: List[str], chunk_params: Optional[List[int]], known_hashes: Dict[str, str]) -> List[Dict]:
+    """
+    Worker function: reads (and chunks) a group of files. Files whose content hash is the
+    known hash of their path are not chunked. Errors are returned, not raised.
+    """
+    results = []
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                content = file.read()
+            stat = os.stat(path)
+        except (OSError, UnicodeDecodeError) as e:
+            results.append({"error": f"Error loading {path}: {str(e)}", "source": path})
+            continue
+        document = {
+            "content": content,
+            "metadata": {"source": path, "size": stat.st_size, "mtime": stat.st_mtime},
+        }
+        if chunk_params:
+            document["content_hash"] = content_hash(content)
+            if known_hashes.get(path) != document["content_hash"]:
+                document["chunks"] = split_text(content, chunk_params[0], chunk_params[1])
+                document["chunk_params"] = list(chunk_params)
+        results.append(document)
+    return results
+
+
 class DocumentLoader:
     """
-    A simple document loader to load documents from the ./data/ folder.
-    Supports .txt and .md files.
+    A parallel, recursive document loader for the ./data/ folder.
+    Supports .txt and .md files by default.
     """
 
-    def __init__(self, document_path: str = "./data/"):
-        """Initialize the DocumentLoader."""
+    def __init__(
+        self,
+        document_path: str = "./data/",
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        workers: int = 0,
+        chunk_size: int = 0,
+        chunk_overlap: int = 0,
+        known_hashes: Optional[Dict[str, str]] = None,
+    ):
+        """
+        Initialize the DocumentLoader.
+
+        Args:
+            document_path: Root folder of the documents
+            include: Glob patterns of the loaded files, matched against the path relative to
+                     document_path and the file name (default: DOCUMENT_INCLUDE or *.md,*.txt)
+            exclude: Glob patterns of skipped files and folders (default: DOCUMENT_EXCLUDE or none)
+            workers: Number of worker processes (default: DOCUMENT_LOADER_WORKERS or the CPU count),
+                     1 reads in the calling process
+            chunk_size: If set, documents are also chunked in the workers (use the VectorDB chunk_size)
+            chunk_overlap: Chunk overlap used together with chunk_size
+            known_hashes: Content hashes of the already ingested files (IngestionManifest.hashes());
+                          unchanged files are not chunked
+        """
         self.log = LogManager()
         self.log.add_logfile("documentloader")
         self.log.write_log("documentloader", logging.INFO, "DocumentLoader initialized")
         self.document_path = document_path
+        self.include = include or self._patterns("DOCUMENT_INCLUDE", "*.md,*.txt")
+        self.exclude = exclude if exclude is not None else self._patterns("DOCUMENT_EXCLUDE", "")
+        self.workers = workers or int(os.getenv("DOCUMENT_LOADER_WORKERS", "0")) or os.cpu_count() or 1
+        self.chunk_params = [chunk_size, chunk_overlap] if chunk_size else None
+        self.known_hashes = known_hashes or {}
+        # Paths of the files that could not be read by the last iter_documents()
+        self.failed_paths: List[str] = []
 
-    def load_documents(self) -> List[str]:
+    def load_documents(self) -> List[dict]:
         """
-        Load documents from the ./data/ folder. (.txt and .md files)    
+        Load every document of the folder tree.
         Returns:
-            List of sample documents
+            List of documents as dicts with 'content' and 'metadata' ('source' file path, 'size' and 'mtime')
         """
-        results = []
-
-        # List to store all documents
-        documents = []
-
-        # Load each .txt file in the documents folder
-        for file in os.listdir(self.document_path):
-            if file.endswith(".md") or file.endswith(".txt"):
-                file_path = os.path.join(self.document_path, file)
-                try:
-                    loader = TextLoader(file_path)
-                    loaded_docs = loader.load()
-                    documents.extend(loaded_docs)
-                    self.log.write_log("documentloader", logging.INFO, f"Successfully loaded: {file}")
-                except Exception as e:
-                    self.log.write_log("documentloader", logging.ERROR, f"Error loading {file}: {str(e)}")
-        
+        documents = list(self.iter_documents())
         self.log.write_log("documentloader", logging.INFO, f"Total documents loaded: {len(documents)}")
-        
-        # Extract content as strings and return
-        results = []
-        for doc in documents:
-            results.append(doc.page_content)
-        return results
\ No newline at end of file
+        return documents
+
+    def iter_documents(self) -> Iterator[dict]:
+        """
+        Yield the documents of the folder tree, in path order, while the next files are
+        read in the worker processes. Only a bounded number of files is in flight.
+        Files that cannot be read are logged and skipped, and their paths are added to
+        failed_paths (cleared in place when the iteration starts).
+
+        Raises:
+            ValueError: If the document folder does not exist
+
+        Yields:
+            Documents as dicts with 'content' and 'metadata', and the 'content_hash' and the
+            'chunks' of changed files if chunking is enabled
+        """
+        if not os.path.isdir(self.document_path):
+            raise ValueError(f"Document folder not found: {self.document_path}")
+        self.failed_paths.clear()
+        paths = list(self.iter_paths())
+        groups = [paths[start:start + TASK_FILES] for start in range(0, len(paths), TASK_FILES)]
+        workers = min(self.workers, len(groups))
+
+        if workers <= 1:
+            for group in groups:
+                yield from self._unpack(_read_files(group, self.chunk_params, self._group_hashes(group)))
+            return
+
+        self.log.write_log("documentloader", logging.INFO, f"Loading {len(paths)} files with {workers} worker processes")
+        # Spawned workers do not inherit the locks of the logging and ingestion threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            groups_iter = iter(groups)
+            pending = collections.deque(
+                executor.submit(_read_files, group, self.chunk_params, self._group_hashes(group))
+                for group in itertools.islice(groups_iter, workers * TASKS_PER_WORKER)
+            )
+            while pending:
+                results = pending.popleft().result()
+                for group in itertools.islice(groups_iter, 1):
+                    pending.append(executor.submit(_read_files, group, self.chunk_params, self._group_hashes(group)))
+                yield from self._unpack(results)
+
+    def iter_paths(self) -> Iterator[str]:
+        """Yield the paths of the included files, walking the folder tree in sorted order."""
+        for root, dirs, files in os.walk(self.document_path):
+            relative_root = os.path.relpath(root, self.document_path)
+            relative_root = "" if relative_root == "." else relative_root.replace(os.sep, "/") + "/"
+            dirs[:] = sorted(name for name in dirs if not self._matches(f"{relative_root}{name}", name, self.exclude))
+            for name in sorted(files):
+                relative_path = f"{relative_root}{name}"
+                if self._matches(relative_path, name, self.include) and not self._matches(relative_path, name, self.exclude):
+                    yield os.path.join(root, name)
+
+    def _group_hashes(self, group: List[str]) -> Dict[str, str]:
+        """Returns the known hashes of a group of files, sent to the worker with the group."""
+        return {path: self.known_hashes[path] for path in group if path in self.known_hashes}
+
+    def _unpack(self, results: List[Dict]) -> Iterator[dict]:
+        """Logs the errors of one worker task and yields its documents."""
+        for document in results:
+            if "error" in document:
+                self.log.write_log("documentloader", logging.ERROR, document["error"])
+                self.failed_paths.append(document["source"])
+                continue
+            self.log.write_log("documentloader", logging.INFO, "Successfully loaded: %s", document["metadata"]["source"])
+            yield document
+
+    @staticmethod
+    def _matches(relative_path: str, name: str, patterns: List[str]) -> bool:
+        return any(fnmatch.fnmatch(relative_path, pattern) or fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+    @staticmethod
+    def _patterns(variable: str, default: str) -> List[str]:
+        return [pattern.strip() for pattern in os.getenv(variable, default).split(",") if pattern.strip()]
@@ -0,0 +1,250 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, List
+import numpy as np
+from .logmanager import LogManager
+
+"""
+Embedding Cache Module
+----------------------
+Persistent on-disk cache of embeddings, keyed by the embedding model and the hash of the
+normalized text. Re-encoding a chunk that was seen before (after a collection rebuild, a
+collection rename or re-chunking) becomes a disk read instead of model inference.
+
+Storage layout (one directory per embedding model):
+    vectors.npy  memory-mapped (capacity x dim) float16 matrix of embeddings
+    keys.npy     memory-mapped uint64 fingerprint of the text stored in each slot
+    used.npy     memory-mapped uint64 logical time of the last use of each slot (0: empty)
+    index.json   model and settings of the cache
+
+Hits and new entries only write their slot of the memory-mapped arrays, so persisting the
+cache never rewrites the whole index; the fingerprint -> slot lookup and the LRU order are
+rebuilt from keys.npy and used.npy when the cache is opened.
+
+Usage:
+    cache = EmbeddingCache("sentence-transformers/all-MiniLM-L6-v2")
+    embeddings = cache.encode(texts, model.encode)
+"""
+
+
+def normalize_text(text: str) -> str:
+    """Collapses whitespace so formatting-only differences share one cache entry."""
+    return " ".join(text.split())
+
+
+def text_hash(text: str) -> str:
+    """Returns the SHA-256 hex digest of the normalized text."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+INDEX_VERSION = 2
+
+
+class EmbeddingCache:
+    """
+    Size-limited LRU cache of embeddings backed by memory-mapped NumPy files.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: str = "",
+        max_entries: int = -1,
+        dtype: str = "float16",
+        flush_every: int = 1000,
+    ):
+        """
+        Initialize the embedding cache.
+
+        Args:
+            model_name: Name of the embedding model, part of the cache key
+            cache_dir: Root directory of the cache (default: EMBEDDING_CACHE_DIR or ./embedding_cache)
+            max_entries: Maximum number of cached embeddings (default: EMBEDDING_CACHE_MAX_ENTRIES or 200000)
+            dtype: Storage data type of the embeddings (float16 or float32)
+            flush_every: Number of new entries and hits after which the arrays are flushed to disk
+        """
+        self.log = LogManager()
+        self.log.add_logfile("embeddingcache")
+        self.model_name = model_name
+        root = cache_dir or os.getenv("EMBEDDING_CACHE_DIR", "./embedding_cache")
+        if max_entries < 0:
+            max_entries = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+        self.capacity = max_entries
+        self.enabled = max_entries > 0
+        self.dtype = np.dtype(dtype)
+        self.flush_every = flush_every
+
+        model_slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.cache_path = os.path.join(root, f"{model_slug}_{hashlib.sha256(model_name.encode('utf-8')).hexdigest()[:8]}")
+        self.index_path = os.path.join(self.cache_path, "index.json")
+        self.vectors_path = os.path.join(self.cache_path, "vectors.npy")
+        self.keys_path = os.path.join(self.cache_path, "keys.npy")
+        self.used_path = os.path.join(self.cache_path, "used.npy")
+
+        self._lock = threading.RLock()
+        # Fingerprint -> slot, in least-recently-used order
+        self._entries: "OrderedDict[int, int]" = OrderedDict()
+        self._next_slot = 0
+        self._clock = 0
+        self._vectors = None
+        self._keys = None
+        self._used = None
+        self._dirty = 0
+        self.hits = 0
+        self.misses = 0
+
+        if self.enabled:
+            self._load()
+            atexit.register(self.flush)
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Returns the embeddings of the texts, encoding only the ones that are not cached.
+
+        Args:
+            texts: Texts to embed
+            encode_fn: Function that encodes a list of texts into a 2D array
+
+        Returns:
+            2D float32 array of embeddings, in the order of texts
+        """
+        if not self.enabled:
+            return np.asarray(encode_fn(texts), dtype=np.float32)
+        if not texts:
+            return np.zeros((0, self._vectors.shape[1] if self._vectors is not None else 0), dtype=np.float32)
+
+        hashes = [text_hash(text) for text in texts]
+        found = {}
+        with self._lock:
+            for position, key in enumerate(hashes):
+                slot = self._lookup(key)
+                if slot is not None:
+                    # A copy: the slot may be reused by an eviction of this same call
+                    found[position] = np.array(self._vectors[slot], dtype=np.float32)
+
+        missing = [position for position in range(len(texts)) if position not in found]
+        self.hits += len(found)
+        self.misses += len(missing)
+
+        if missing:
+            new_embeddings = np.asarray(encode_fn([texts[position] for position in missing]), dtype=np.float32)
+            with self._lock:
+                for row, position in enumerate(missing):
+                    found[position] = new_embeddings[row]
+                    self._store(hashes[position], new_embeddings[row])
+        if self._dirty >= self.flush_every:
+            self.flush()
+
+        return np.stack([found[position] for position in range(len(texts))])
+
+    def flush(self) -> None:
+        """Writes the changed slots of the memory-mapped arrays to disk."""
+        if not self.enabled or self._vectors is None or not self._dirty:
+            return
+        with self._lock:
+            self._vectors.flush()
+            self._keys.flush()
+            self._used.flush()
+            self._dirty = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load(self) -> None:
+        """Opens an existing cache, or starts an empty one if it is missing or incompatible."""
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                index = json.load(file)
+            vectors = np.load(self.vectors_path, mmap_mode="r+")
+            keys = np.load(self.keys_path, mmap_mode="r+")
+            used = np.load(self.used_path, mmap_mode="r+") if index.get("version") == INDEX_VERSION else None
+        except (OSError, ValueError) as e:
+            self.log.write_log("embeddingcache", logging.ERROR, f"Error loading embedding cache, starting empty: {str(e)}")
+            return
+
+        if index.get("capacity") != self.capacity or index.get("dtype") != self.dtype.name:
+            self.log.write_log("embeddingcache", logging.INFO, "Embedding cache settings changed, starting empty")
+            return
+
+        self._vectors = vectors
+        self._keys = keys
+        if used is None:
+            # Cache of the previous format: its JSON index holds the entries in LRU order
+            used = np.lib.format.open_memmap(self.used_path, mode="w+", dtype=np.uint64, shape=(self.capacity,))
+            for position, (_, slot) in enumerate(index.get("entries", [])):
+                used[slot] = position + 1
+            used.flush()
+            self._write_index()
+        self._used = used
+        occupied = np.flatnonzero(used)
+        self._next_slot = int(occupied.max()) + 1 if len(occupied) else 0
+        self._clock = int(used.max()) if len(used) else 0
+        self._entries = OrderedDict(
+            (int(keys[slot]), int(slot)) for slot in occupied[np.argsort(used[occupied], kind="stable")]
+        )
+        self.log.write_log("embeddingcache", logging.INFO, f"Loaded embedding cache with {len(self._entries)} entries from {self.cache_path}")
+
+    def _allocate(self, dim: int) -> None:
+        """Creates the memory-mapped arrays once the embedding dimension is known."""
+        os.makedirs(self.cache_path, exist_ok=True)
+        self._vectors = np.lib.format.open_memmap(self.vectors_path, mode="w+", dtype=self.dtype, shape=(self.capacity, dim))
+        self._keys = np.lib.format.open_memmap(self.keys_path, mode="w+", dtype=np.uint64, shape=(self.capacity,))
+        self._used = np.lib.format.open_memmap(self.used_path, mode="w+", dtype=np.uint64, shape=(self.capacity,))
+        self._entries.clear()
+        self._next_slot = 0
+        self._clock = 0
+        self._write_index()
+
+    def _write_index(self) -> None:
+        """Writes the settings of the cache, read back to check that the arrays still fit them."""
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"version": INDEX_VERSION, "model": self.model_name, "capacity": self.capacity, "dtype": self.dtype.name}, file)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def _fingerprint(key: str) -> int:
+        return int(key[:16], 16)
+
+    def _touch(self, slot: int) -> None:
+        """Records the use of a slot in the memory-mapped recency array."""
+        self._clock += 1
+        self._used[slot] = self._clock
+        self._dirty += 1
+
+    def _lookup(self, key: str):
+        """Returns the slot of a cached key and marks it as recently used."""
+        fingerprint = self._fingerprint(key)
+        slot = self._entries.get(fingerprint)
+        if slot is None:
+            return None
+        self._entries.move_to_end(fingerprint)
+        self._touch(slot)
+        return slot
+
+    def _store(self, key: str, embedding: np.ndarray) -> None:
+        """Stores an embedding, evicting the least recently used entry when the cache is full."""
+        if self._vectors is None or self._vectors.shape[1] != embedding.shape[0]:
+            self._allocate(embedding.shape[0])
+        fingerprint = self._fingerprint(key)
+        if fingerprint in self._entries:
+            return
+
+        if self._next_slot < self.capacity:
+            slot = self._next_slot
+            self._next_slot += 1
+        else:
+            _, slot = self._entries.popitem(last=False)
+
+        self._vectors[slot] = embedding
+        self._keys[slot] = fingerprint
+        self._entries[fingerprint] = slot
+        self._touch(slot)
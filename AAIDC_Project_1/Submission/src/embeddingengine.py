@@ -0,0 +1,407 @@
+import atexit
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .logmanager import LogManager
+
+"""
+Embedding Engine Module
+-----------------------
+Runs the SentenceTransformer embedding model of the VectorDB. Two settings select how:
+
+EMBEDDING_ENGINE
+- inprocess: the model runs in the calling process (default)
+- multiprocess: a pool of EMBEDDING_WORKERS worker processes, each with its own model and a
+  share of the CPU cores, fed from one shared task queue. Texts are sorted by length before
+  they are cut into batches, so the texts of a batch need little padding.
+
+EMBEDDING_RUNTIME
+- torch: the PyTorch model (default)
+- onnx: the model exported to ONNX, run by ONNX Runtime
+- onnx-int8: the dynamically int8-quantized ONNX model (EMBEDDING_ONNX_FILE selects the
+  file of the model repository, default: onnx/model_quint8_avx2.onnx)
+
+The ONNX runtimes need the optional dependencies of sentence-transformers' ONNX backend
+(pip install "sentence-transformers[onnx]"). Their embeddings differ slightly from the
+PyTorch ones: validate_engine() compares an engine against the in-process PyTorch model,
+and the ONNX engines are validated before their first use (EMBEDDING_VALIDATION_MIN_COSINE).
+The PyTorch workers of the multiprocess engine run the same model as the in-process one and
+are not validated.
+
+Usage:
+    engine = create_embedding_engine("sentence-transformers/all-MiniLM-L6-v2")
+    embeddings = engine.encode(texts, batch_size=64)
+"""
+
+RUNTIMES = ("torch", "onnx", "onnx-int8")
+DEFAULT_INT8_ONNX_FILE = "onnx/model_quint8_avx2.onnx"
+
+# Texts of the validation probe: short, long, non-ASCII and repeated inputs
+VALIDATION_TEXTS = [
+    "What is retrieval-augmented generation?",
+    "Chunks are embedded and stored in a vector database.",
+    "Das Modell beantwortet Fragen über die Dokumente.",
+    "short",
+    " ".join(["A long passage about vector search, approximate nearest neighbours and recall."] * 12),
+    "What is retrieval-augmented generation?",
+]
+
+
+def load_model(model_name: str, runtime: str = "torch"):
+    """
+    Loads the SentenceTransformer model with the given runtime.
+
+    Args:
+        model_name: HuggingFace model name
+        runtime: 'torch', 'onnx' or 'onnx-int8'
+
+    Returns:
+        The SentenceTransformer model
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if runtime == "torch":
+        return SentenceTransformer(model_name)
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unknown embedding runtime: {runtime}. Use one of: {', '.join(RUNTIMES)}")
+    model_kwargs = {}
+    if runtime == "onnx-int8":
+        model_kwargs["file_name"] = os.getenv("EMBEDDING_ONNX_FILE", DEFAULT_INT8_ONNX_FILE)
+    try:
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs=model_kwargs)
+    except (ImportError, TypeError) as e:
+        raise ImportError(
+            f"The {runtime} embedding runtime needs sentence-transformers>=3.2 with its ONNX backend "
+            f'(pip install "sentence-transformers[onnx]"): {str(e)}'
+        ) from e
+
+
+def _limit_threads(threads: int) -> None:
+    """Limits the intra-op threads of the numeric libraries of this process."""
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _embedding_worker(model_name: str, runtime: str, threads: int, tasks, results) -> None:
+    """Worker process: encodes (job, part, texts, batch_size) tasks until it gets None."""
+    _limit_threads(threads)
+    try:
+        model = load_model(model_name, runtime)
+    except Exception as e:
+        results.put((None, None, f"Loading the embedding model failed: {str(e)}"))
+        return
+    results.put((None, None, None))
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        job, part, texts, batch_size = task
+        try:
+            embeddings = np.asarray(model.encode(texts, batch_size=batch_size, show_progress_bar=False), dtype=np.float32)
+            results.put((job, part, embeddings))
+        except Exception as e:
+            results.put((job, part, str(e)))
+
+
+class EmbeddingEngine:
+    """
+    Interface of an embedding engine. Engines with an ONNX runtime validate their embeddings
+    against the in-process PyTorch model before the first encode() returns.
+    """
+
+    name = ""
+
+    def __init__(self, model_name: str, runtime: str = "torch"):
+        self.model_name = model_name
+        self.runtime = runtime
+        self.validation: Optional[Dict[str, float]] = None
+        self._validation_error: Optional[ValueError] = None
+        self._validation_lock = threading.Lock()
+
+    @property
+    def fingerprint(self) -> str:
+        """Identity of the produced embeddings, used as the key of stored and cached embeddings."""
+        return self.model_name if self.runtime == "torch" else f"{self.model_name}#{self.runtime}"
+
+    @property
+    def needs_validation(self) -> bool:
+        # PyTorch workers load the same model as the in-process engine; comparing them would
+        # only load another copy of the model in this process
+        return self.runtime != "torch"
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Returns the embeddings of the texts as a 2D float32 array."""
+        if self.needs_validation and self.validation is None:
+            self._validate_once()
+        return self._encode(texts, batch_size)
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def _validate_once(self) -> None:
+        with self._validation_lock:
+            if self._validation_error is not None:
+                raise self._validation_error
+            if self.validation is not None:
+                return
+            try:
+                self.validation = validate_engine(self, min_cosine=float(os.getenv("EMBEDDING_VALIDATION_MIN_COSINE", "0.98")))
+            except ValueError as e:
+                self._validation_error = e
+                raise
+            LogManager().write_log("vectordb", logging.INFO, f"Embedding engine {self.name}/{self.runtime} validated: {self.validation}")
+
+    def warm_up(self) -> None:
+        """Loads (and validates) the model(s) ahead of the first request."""
+        self._load()
+        if self.needs_validation and self.validation is None:
+            self._validate_once()
+
+    def _load(self) -> None:
+        pass
+
+    def close(self) -> None:
+        """Releases the model(s)."""
+
+
+class InProcessEngine(EmbeddingEngine):
+    """
+    Runs the model in the calling process, loaded on first use.
+    """
+
+    name = "inprocess"
+
+    def __init__(self, model_name: str, runtime: str = "torch"):
+        super().__init__(model_name, runtime)
+        self.log = LogManager()
+        self.log.add_logfile("vectordb")
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        """The SentenceTransformer model, loaded on first access."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self.log.write_log("vectordb", logging.INFO, f"Loading embedding model: {self.model_name} ({self.runtime})")
+                    self._model = load_model(self.model_name, self.runtime)
+                    self.log.write_log("vectordb", logging.INFO, "Embedding model loaded")
+        return self._model
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, batch_size=batch_size, show_progress_bar=False), dtype=np.float32)
+
+    def _load(self) -> None:
+        self.model
+
+    def close(self) -> None:
+        self._model = None
+
+
+class MultiProcessEngine(EmbeddingEngine):
+    """
+    Pool of worker processes fed from one shared task queue. Every encode() call sorts its
+    texts by length, cuts them into parts of about len(texts) / workers texts (at most
+    batch_size) and collects the results in the input order, so a single batch keeps every
+    worker busy and concurrent calls (ingestion and queries) share the workers.
+    """
+
+    name = "multiprocess"
+
+    def __init__(self, model_name: str, runtime: str = "torch", workers: int = 0, threads_per_worker: int = 0):
+        """
+        Initialize the engine; the workers start on first use.
+
+        Args:
+            model_name: HuggingFace model name
+            runtime: Runtime of the workers' models
+            workers: Number of worker processes (default: EMBEDDING_WORKERS or CPU count / 2)
+            threads_per_worker: Intra-op threads of each worker (default: CPU count / workers)
+        """
+        super().__init__(model_name, runtime)
+        self.log = LogManager()
+        self.log.add_logfile("vectordb")
+        cpus = os.cpu_count() or 1
+        self.workers = workers or int(os.getenv("EMBEDDING_WORKERS", "0")) or max(1, cpus // 2)
+        self.threads_per_worker = threads_per_worker or max(1, cpus // self.workers)
+        self._context = multiprocessing.get_context("spawn")
+        self._processes = []
+        self._tasks = None
+        self._results = None
+        self._collector = None
+        self._jobs: Dict[int, Tuple[List, threading.Event]] = {}
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._error: Optional[str] = None
+
+    def _load(self) -> None:
+        self._start()
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        self._start()
+        # Length-sorted parts: similar lengths pad to similar sizes. A call of one batch (as
+        # the ingestion pipeline makes) is still split, so every worker gets a share of it
+        order = sorted(range(len(texts)), key=lambda idx: len(texts[idx]))
+        part_size = max(1, min(batch_size, -(-len(texts) // self.workers)))
+        parts = [order[start:start + part_size] for start in range(0, len(order), part_size)]
+        results: List = [None] * len(parts)
+        done = threading.Event()
+        with self._lock:
+            job = next(self._job_ids)
+            self._jobs[job] = (results, done)
+        for part, rows in enumerate(parts):
+            self._tasks.put((job, part, [texts[idx] for idx in rows], batch_size))
+        while not done.wait(timeout=1.0):
+            if not all(process.is_alive() for process in self._processes):
+                with self._lock:
+                    self._jobs.pop(job, None)
+                raise RuntimeError("An embedding worker process died")
+        with self._lock:
+            self._jobs.pop(job, None)
+        errors = [result for result in results if isinstance(result, str)]
+        if errors:
+            raise RuntimeError(f"Embedding worker failed: {errors[0]}")
+
+        embeddings = np.empty((len(texts), results[0].shape[1]), dtype=np.float32)
+        for rows, part_embeddings in zip(parts, results):
+            embeddings[rows] = part_embeddings
+        return embeddings
+
+    def close(self) -> None:
+        """Stops the worker processes."""
+        with self._start_lock:
+            if not self._processes:
+                return
+            for _ in self._processes:
+                self._tasks.put(None)
+            for process in self._processes:
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.terminate()
+            self._processes = []
+            self._results.put((None, None, "closed"))
+            self._collector.join(timeout=10)
+
+    def _start(self) -> None:
+        """Starts the workers and waits until every worker has loaded the model."""
+        if self._processes:
+            return
+        with self._start_lock:
+            if self._processes:
+                return
+            self.log.write_log("vectordb", logging.INFO, f"Starting {self.workers} embedding workers with {self.threads_per_worker} threads each ({self.runtime})")
+            self._tasks = self._context.Queue()
+            self._results = self._context.Queue()
+            processes = [
+                self._context.Process(
+                    target=_embedding_worker,
+                    args=(self.model_name, self.runtime, self.threads_per_worker, self._tasks, self._results),
+                    name=f"embedding-worker-{idx}",
+                    daemon=True,
+                )
+                for idx in range(self.workers)
+            ]
+            for process in processes:
+                process.start()
+            for _ in processes:
+                _, _, error = self._results.get()
+                if error:
+                    for process in processes:
+                        process.terminate()
+                    raise RuntimeError(error)
+            self._collector = threading.Thread(target=self._collect, name="embedding-collector", daemon=True)
+            self._collector.start()
+            self._processes = processes
+            atexit.register(self.close)
+            self.log.write_log("vectordb", logging.INFO, "Embedding workers ready")
+
+    def _collect(self) -> None:
+        """Routes the results of the workers to the waiting encode() calls."""
+        while True:
+            job, part, result = self._results.get()
+            if job is None:
+                break
+            with self._lock:
+                entry = self._jobs.get(job)
+            if entry is None:
+                continue
+            results, done = entry
+            results[part] = result
+            if all(item is not None for item in results):
+                done.set()
+
+
+def validate_engine(
+    engine: EmbeddingEngine,
+    reference: Optional[EmbeddingEngine] = None,
+    texts: Optional[List[str]] = None,
+    min_cosine: float = 0.99,
+) -> Dict[str, float]:
+    """
+    Compares the embeddings of an engine with the in-process PyTorch model.
+
+    Args:
+        engine: Engine to validate
+        reference: Reference engine (default: in-process PyTorch model of the same model name)
+        texts: Probe texts (default: VALIDATION_TEXTS)
+        min_cosine: Minimum cosine similarity of every probe embedding
+
+    Returns:
+        Dictionary with the 'min_cosine', 'mean_cosine' and 'max_abs_diff' of the probes
+
+    Raises:
+        ValueError: If an embedding is below min_cosine or the shapes differ
+    """
+    texts = texts or VALIDATION_TEXTS
+    reference = reference or InProcessEngine(engine.model_name, "torch")
+    expected = reference.encode(texts)
+    actual = engine._encode(texts, 32)
+    if actual.shape != expected.shape:
+        raise ValueError(f"Embedding engine {engine.name}/{engine.runtime} returned shape {actual.shape}, expected {expected.shape}")
+    cosines = np.sum(actual * expected, axis=1) / (
+        np.linalg.norm(actual, axis=1) * np.linalg.norm(expected, axis=1) + 1e-12
+    )
+    report = {
+        "min_cosine": round(float(cosines.min()), 6),
+        "mean_cosine": round(float(cosines.mean()), 6),
+        "max_abs_diff": round(float(np.abs(actual - expected).max()), 6),
+    }
+    if report["min_cosine"] < min_cosine:
+        raise ValueError(f"Embedding engine {engine.name}/{engine.runtime} failed validation: {report}")
+    return report
+
+
+def create_embedding_engine(model_name: str, engine: str = "", runtime: str = "") -> EmbeddingEngine:
+    """
+    Creates the configured embedding engine.
+
+    Args:
+        model_name: HuggingFace model name
+        engine: 'inprocess' or 'multiprocess' (default: EMBEDDING_ENGINE or inprocess)
+        runtime: 'torch', 'onnx' or 'onnx-int8' (default: EMBEDDING_RUNTIME or torch)
+
+    Returns:
+        The embedding engine
+    """
+    engine = engine or os.getenv("EMBEDDING_ENGINE", "inprocess")
+    runtime = runtime or os.getenv("EMBEDDING_RUNTIME", "torch")
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unknown embedding runtime: {runtime}. Use one of: {', '.join(RUNTIMES)}")
+    if engine == "inprocess":
+        return InProcessEngine(model_name, runtime)
+    if engine == "multiprocess":
+        return MultiProcessEngine(model_name, runtime)
+    raise ValueError(f"Unknown embedding engine: {engine}. Use 'inprocess' or 'multiprocess'")
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Optional
+from .logmanager import LogManager
+
+"""
+Ingestion Manifest Module
+-------------------------
+Keeps track of which source files were already embedded into the vector database.
+For every source it stores a content hash and the IDs of the chunks created from it,
+so a restart only needs to embed new or changed files.
+
+Usage:
+    manifest = IngestionManifest("./chroma_db/ingestion_manifest.json", config)
+    if not manifest.is_current(source, file_hash):
+        ...
+        manifest.update(source, file_hash, chunk_ids)
+    manifest.save()
+"""
+
+MANIFEST_VERSION = 1
+
+
+def content_hash(text: str) -> str:
+    """Returns the SHA-256 hex digest of the given text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_chunk_id(source: str, chunk: str, occurrence: int = 0) -> str:
+    """
+    Creates a stable, content-derived ID for a chunk.
+
+    Args:
+        source: Source identifier of the document (e.g. its file path)
+        chunk: Text of the chunk
+        occurrence: How many times the same chunk text appeared earlier in the same source
+
+    Returns:
+        The chunk ID
+    """
+    chunk_id = f"chunk_{content_hash(source)[:12]}_{content_hash(chunk)[:20]}"
+    if occurrence:
+        chunk_id = f"{chunk_id}_{occurrence}"
+    return chunk_id
+
+
+class IngestionManifest:
+    """
+    Persistent record of the ingested source files and their chunks.
+    """
+
+    def __init__(self, manifest_path: str, config: Optional[Dict] = None):
+        """
+        Initialize the manifest and load it from disk if it exists.
+
+        Args:
+            manifest_path: Path of the JSON manifest file
+            config: Settings that affect the stored chunks (embedding model, chunking parameters).
+                    If they differ from the stored ones, every file is treated as changed.
+        """
+        self.log = LogManager()
+        self.log.add_logfile("vectordb")
+        self.manifest_path = manifest_path
+        self.config = config or {}
+        self.files: Dict[str, Dict] = {}
+        self.exists = os.path.exists(manifest_path)
+        self.config_changed = False
+        if self.exists:
+            self.load()
+
+    def load(self) -> None:
+        """Loads the manifest from disk."""
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            self.log.write_log("vectordb", logging.ERROR, f"Error loading ingestion manifest: {str(e)}")
+            return
+
+        self.files = data.get("files", {})
+        if data.get("version") != MANIFEST_VERSION or data.get("config", {}) != self.config:
+            self.config_changed = True
+            self.log.write_log("vectordb", logging.INFO, "Ingestion settings changed, all files will be re-embedded")
+
+    def save(self) -> None:
+        """Writes the manifest to disk atomically."""
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"version": MANIFEST_VERSION, "config": self.config, "files": self.files},
+                file,
+            )
+        os.replace(tmp_path, self.manifest_path)
+        self.exists = True
+        self.config_changed = False
+
+    def is_current(self, source: str, file_hash: str) -> bool:
+        """Returns True if the source was already ingested with the same content and settings."""
+        if self.config_changed:
+            return False
+        entry = self.files.get(source)
+        return entry is not None and entry.get("hash") == file_hash
+
+    def chunk_ids(self, source: str) -> List[str]:
+        """Returns the chunk IDs stored for the given source."""
+        return list(self.files.get(source, {}).get("chunks", []))
+
+    def update(self, source: str, file_hash: str, chunk_ids: List[str]) -> None:
+        """Records the hash and chunk IDs of an ingested source."""
+        self.files[source] = {"hash": file_hash, "chunks": list(chunk_ids)}
+
+    def invalidate(self, source: str, chunk_ids: Iterable[str]) -> None:
+        """Marks a source as changed and forgets the given chunks of it, so they are ingested again."""
+        entry = self.files.get(source)
+        if entry is not None:
+            forgotten = set(chunk_ids)
+            entry["hash"] = None
+            entry["chunks"] = [chunk_id for chunk_id in entry["chunks"] if chunk_id not in forgotten]
+
+    def remove(self, source: str) -> List[str]:
+        """Removes a source from the manifest and returns its chunk IDs."""
+        entry = self.files.pop(source, None)
+        return list(entry.get("chunks", [])) if entry else []
+
+    def hashes(self) -> Dict[str, str]:
+        """Returns the content hash of every source that is current (none if the settings changed)."""
+        if self.config_changed:
+            return {}
+        return {source: entry["hash"] for source, entry in self.files.items() if entry.get("hash")}
+
+    def sources(self) -> List[str]:
+        """Returns all sources recorded in the manifest."""
+        return list(self.files.keys())
+
+    def missing_sources(self, seen_sources: Iterable[str]) -> List[str]:
+        """Returns the recorded sources that are not part of the given set of sources."""
+        seen = set(seen_sources)
+        return [source for source in self.files if source not in seen]
@@ -0,0 +1,267 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from .logmanager import LogManager
+from .metrics import SIZE_BUCKETS, get_metrics
+
+"""
+Ingestion Pipeline Module
+-------------------------
+Streams documents into the vector database with bounded memory.
+
+The pipeline runs three stages in separate threads, connected by bounded queues:
+
+1. Reading and chunking: consumes the (possibly lazy) iterable of documents and groups
+   the new chunks into batches of a fixed size.
+   With DEDUPLICATION set, duplicate chunks are linked to their canonical chunk here
+   and never reach the encoder.
+2. Encoding: creates the embeddings of one batch at a time.
+3. Writing: stores the batches in the vector database and reports progress. A document
+   is recorded in the ingestion manifest only after all of its chunks are written, so a
+   failed ingestion leaves the documents it did not store to be ingested again.
+
+Only a few batches are in flight at any time, so peak memory does not depend on the
+size of the corpus.
+
+Usage:
+    pipeline = IngestionPipeline(vector_db, batch_size=64)
+    stats = pipeline.run(document_generator)
+"""
+
+# Marks the end of a stream between two stages
+_END = object()
+
+
+class IngestionPipeline:
+    """
+    Three-stage, bounded-memory ingestion pipeline for VectorDB.
+    """
+
+    def __init__(
+        self,
+        vector_db,
+        batch_size: int = 64,
+        queue_size: int = 4,
+        progress_interval: float = 5.0,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        """
+        Initialize the ingestion pipeline.
+
+        Args:
+            vector_db: The VectorDB instance to ingest into
+            batch_size: Number of chunks encoded and written together
+            queue_size: Maximum number of batches waiting between two stages
+            progress_interval: Seconds between two progress reports
+            progress_callback: Optional function called with the current statistics on every progress report
+        """
+        self.log = LogManager()
+        self.log.add_logfile("vectordb")
+        self.metrics = get_metrics()
+        self.vector_db = vector_db
+        self.batch_size = max(1, batch_size)
+        self.queue_size = max(1, queue_size)
+        self.progress_interval = progress_interval
+        self.progress_callback = progress_callback
+
+    def run(
+        self,
+        documents: Iterable,
+        prune: bool = False,
+        keep_sources: Optional[Iterable[str]] = None,
+        allow_empty_prune: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Ingest the documents.
+
+        Args:
+            documents: Iterable (list or generator) of documents
+            prune: If True, documents is the complete corpus and chunks of sources
+                   that are not part of it are deleted
+            keep_sources: Sources never pruned, e.g. the files the loader failed to read (read
+                          once documents is exhausted, so the loader's list can be passed)
+            allow_empty_prune: If True, prune every source when documents is empty instead
+                               of raising a ValueError
+
+        Returns:
+            Dictionary with ingestion statistics
+        """
+        self._encode_queue = queue.Queue(maxsize=self.queue_size)
+        self._write_queue = queue.Queue(maxsize=self.queue_size)
+        self._errors: List[BaseException] = []
+        self._started = time.perf_counter()
+        self._last_report = self._started
+        self.stats = {
+            "documents": 0,
+            "skipped_documents": 0,
+            "chunks_embedded": 0,
+            "chunks_deleted": 0,
+            "chunks_deduplicated": 0,
+            "batches": 0,
+            "seconds": 0.0,
+            "chunks_per_second": 0.0,
+        }
+
+        chunker = threading.Thread(target=self._chunk_stage, args=(documents, prune, keep_sources, allow_empty_prune), name="ingest-chunker", daemon=True)
+        encoder = threading.Thread(target=self._encode_stage, name="ingest-encoder", daemon=True)
+        chunker.start()
+        encoder.start()
+        self._write_stage()
+        chunker.join()
+        encoder.join()
+
+        if self._errors:
+            raise self._errors[0]
+
+        self.vector_db.update_duplicate_metadata()
+        self.vector_db.store.flush()
+        self.vector_db.manifest.save()
+        self.vector_db.metadata_index.save()
+        if self.vector_db.deduplicator is not None:
+            self.vector_db.deduplicator.save()
+        self.vector_db.embedding_cache.flush()
+        self.vector_db.lexical_index.save()
+        self._report_progress(final=True)
+        return self.stats
+
+    def _chunk_stage(self, documents: Iterable, prune: bool, keep_sources: Optional[Iterable[str]], allow_empty_prune: bool) -> None:
+        """Reads and chunks the documents and emits batches of new chunks."""
+        batch = []
+        # Manifest entries of the documents whose chunks are not all queued for encoding yet
+        entries = []
+        seen_sources = set()
+        try:
+            for doc_idx, doc in enumerate(documents):
+                if self._errors:
+                    break
+                self.stats["documents"] += 1
+                with self.metrics.span("ingest_chunking"):
+                    prepared = self.vector_db.prepare_document(doc_idx, doc)
+                seen_sources.add(prepared["source"])
+                if prepared["unchanged"]:
+                    self.stats["skipped_documents"] += 1
+                    continue
+                if prepared["duplicate_ids"]:
+                    self.stats["chunks_deduplicated"] += len(prepared["duplicate_ids"])
+                    self.metrics.inc("ingest_chunks_deduplicated_total", len(prepared["duplicate_ids"]))
+                if prepared["stale_ids"]:
+                    self._write_queue.put(("delete", prepared["stale_ids"]))
+                if prepared["moved_ids"]:
+                    self._write_queue.put(("update", prepared["moved_ids"], prepared["moved_metadatas"]))
+                for chunk in prepared["chunks"]:
+                    batch.append(chunk)
+                    if len(batch) >= self.batch_size:
+                        self._encode_queue.put(batch)
+                        batch = []
+                        if entries:
+                            self._encode_queue.put(("commit", entries, []))
+                            entries = []
+                # Committed after the batch holding the last chunk of the document
+                entries.append(prepared["entry"])
+                if not batch:
+                    self._encode_queue.put(("commit", entries, []))
+                    entries = []
+            if batch and not self._errors:
+                self._encode_queue.put(batch)
+            if entries and not self._errors:
+                self._encode_queue.put(("commit", entries, []))
+
+            if prune and not self._errors:
+                if not seen_sources and self.vector_db.manifest.files and not allow_empty_prune:
+                    raise ValueError("Refusing to prune every ingested source: no documents were loaded")
+                seen_sources.update(keep_sources or [])
+                stale_ids = []
+                removed_sources = self.vector_db.manifest.missing_sources(seen_sources)
+                for source in removed_sources:
+                    stale_ids.extend(self.vector_db.forget_chunks(self.vector_db.manifest.chunk_ids(source)))
+                    self.log.write_log("vectordb", logging.INFO, f"Removing chunks of deleted source: {source}")
+                if stale_ids:
+                    self._write_queue.put(("delete", stale_ids))
+                if removed_sources:
+                    self._write_queue.put(("commit", [], removed_sources))
+        except BaseException as e:
+            self._errors.append(e)
+        finally:
+            self._encode_queue.put(_END)
+
+    def _encode_stage(self) -> None:
+        """Creates the embeddings of each batch."""
+        while True:
+            batch = self._encode_queue.get()
+            if batch is _END:
+                break
+            if self._errors:
+                # Drain the queue so the upstream stage never blocks
+                continue
+            if isinstance(batch, tuple):
+                # Manifest commit, kept in order behind the batches it follows
+                self._write_queue.put(batch)
+                continue
+            try:
+                ids = [chunk_id for chunk_id, _, _ in batch]
+                texts = [text for _, text, _ in batch]
+                metadatas = [metadata for _, _, metadata in batch]
+                self.metrics.observe("ingest_batch_size", len(batch), SIZE_BUCKETS)
+                with self.metrics.span("ingest_encode"):
+                    embeddings = self.vector_db.encode(texts, batch_size=self.batch_size)
+                self._write_queue.put(("add", ids, texts, metadatas, embeddings.tolist()))
+            except BaseException as e:
+                self._errors.append(e)
+        self._write_queue.put(_END)
+
+    def _write_stage(self) -> None:
+        """Writes deletions, metadata updates and new chunks to the vector store and the BM25 index."""
+        store = self.vector_db.store
+        while True:
+            message = self._write_queue.get()
+            if message is _END:
+                break
+            if self._errors:
+                continue
+            try:
+                if message[0] == "delete":
+                    store.delete(message[1])
+                    self.vector_db.lexical_index.remove(message[1])
+                    self.stats["chunks_deleted"] += len(message[1])
+                    self.metrics.inc("ingest_chunks_deleted_total", len(message[1]))
+                elif message[0] == "update":
+                    store.update_metadata(message[1], message[2])
+                elif message[0] == "commit":
+                    for entry in message[1]:
+                        self.vector_db.commit_document(entry)
+                    for source in message[2]:
+                        self.vector_db.manifest.remove(source)
+                        self.vector_db.metadata_index.remove(source)
+                else:
+                    _, ids, texts, metadatas, embeddings = message
+                    with self.metrics.span("ingest_write"):
+                        store.add(ids, embeddings, self.vector_db.stored_documents(texts, metadatas), metadatas)
+                        self.vector_db.lexical_index.add(ids, texts)
+                    self.stats["chunks_embedded"] += len(ids)
+                    self.stats["batches"] += 1
+                    self.metrics.inc("ingest_chunks_embedded_total", len(ids))
+                if time.perf_counter() - self._last_report >= self.progress_interval:
+                    self._report_progress()
+            except BaseException as e:
+                self._errors.append(e)
+
+    def _report_progress(self, final: bool = False) -> None:
+        """Updates the throughput statistics and reports them."""
+        now = time.perf_counter()
+        self._last_report = now
+        elapsed = now - self._started
+        self.stats["seconds"] = round(elapsed, 3)
+        self.stats["chunks_per_second"] = round(self.stats["chunks_embedded"] / elapsed, 1) if elapsed > 0 else 0.0
+        prefix = "Ingestion finished" if final else "Ingestion progress"
+        self.log.write_log(
+            "vectordb",
+            logging.INFO,
+            f"{prefix}: {self.stats['documents']} documents ({self.stats['skipped_documents']} unchanged), "
+            f"{self.stats['chunks_embedded']} chunks embedded, {self.stats['chunks_deduplicated']} deduplicated, "
+            f"{self.stats['chunks_deleted']} deleted, "
+            f"{self.stats['chunks_per_second']} chunks/s",
+        )
+        if self.progress_callback:
+            self.progress_callback(dict(self.stats))
@@ -0,0 +1,372 @@
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+from langchain_core.runnables import Runnable, RunnableConfig
+from .logmanager import LogManager
+from .metrics import get_metrics
+
+"""
+LLM Router Module
+-----------------
+Routes the LLM requests of the RAG chain across every configured provider (OpenAI, Groq,
+Google Gemini, or local stand-ins) to cut tail latency and survive provider outages:
+
+- Latency-aware ordering: providers are tried by their rolling median latency (of full
+  answers, or of the first token for streaming requests); providers without latency
+  samples yet follow the measured ones, in their configured order.
+- Hedging: if the first provider has not answered after the hedge delay, the same request
+  is sent to the next provider and the first successful answer wins. The delay is
+  LLM_HEDGE_AFTER_MS, or by default the rolling p95 latency of the first provider.
+- Failover: a failed request is retried on the next provider right away.
+- Circuit breaker: when at least LLM_CIRCUIT_ERROR_RATE of a provider's recent requests
+  failed (over at least LLM_CIRCUIT_MIN_REQUESTS requests), it is skipped for
+  LLM_CIRCUIT_RESET_SECONDS, then one trial request decides whether it is used again.
+
+Streaming requests are hedged on the first token; once a provider streams, it finishes
+the answer.
+
+The router is a LangChain Runnable, so it replaces a single chat model in a chain.
+
+Usage:
+    router = LLMRouter([("openai", ChatOpenAI(...)), ("groq", ChatGroq(...))])
+    chain = prompt_template | router | StrOutputParser()
+"""
+
+# Rolling windows of every provider's latencies and request outcomes
+STATS_WINDOW = 100
+OUTCOME_WINDOW = 20
+# Latency samples needed before the hedge delay follows the rolling p95
+MIN_HEDGE_SAMPLES = 20
+
+
+class ProviderStats:
+    """
+    Rolling latency and error rate of one provider, and its circuit breaker state.
+    """
+
+    def __init__(self, window: int = STATS_WINDOW, outcome_window: int = OUTCOME_WINDOW):
+        self.latencies: Dict[str, Deque[float]] = {
+            "invoke": collections.deque(maxlen=window),
+            "stream": collections.deque(maxlen=window),
+        }
+        self.outcomes: Deque[bool] = collections.deque(maxlen=outcome_window)
+        self.open_until = 0.0
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    def record_success(self, seconds: float, kind: str) -> None:
+        """Records a successful request; kind is 'invoke' (full answer) or 'stream' (first token)."""
+        with self._lock:
+            self.latencies[kind].append(seconds)
+            if self.open_until:
+                # Successful trial request: close the circuit with a clean history
+                self.outcomes.clear()
+                self.open_until = 0.0
+            self.outcomes.append(True)
+            self.trial_running = False
+
+    def record_latency(self, seconds: float, kind: str) -> None:
+        """Records the latency of a request that was cancelled after losing a hedge, as a lower bound."""
+        with self._lock:
+            self.latencies[kind].append(seconds)
+            self.trial_running = False
+
+    def record_failure(self, error_rate: float, min_requests: int, reset_seconds: float) -> bool:
+        """
+        Records a failed request. Opens the circuit if at least error_rate of the recent
+        requests (and at least min_requests of them) failed, or if a trial request failed.
+
+        Returns:
+            True if the circuit breaker opened
+        """
+        with self._lock:
+            self.outcomes.append(False)
+            trial, self.trial_running = self.trial_running, False
+            failures = self.outcomes.count(False)
+            if trial or (len(self.outcomes) >= min_requests and failures >= error_rate * len(self.outcomes)):
+                self.open_until = time.monotonic() + reset_seconds
+                return True
+            return False
+
+    def available(self) -> bool:
+        """Returns True if the circuit is closed or a trial request may be sent."""
+        with self._lock:
+            return self.open_until == 0.0 or (time.monotonic() >= self.open_until and not self.trial_running)
+
+    def acquire(self) -> bool:
+        """Claims a request: always granted while closed, once per reset period while open."""
+        with self._lock:
+            if self.open_until == 0.0:
+                return True
+            if time.monotonic() < self.open_until or self.trial_running:
+                return False
+            self.trial_running = True
+            return True
+
+    def percentile(self, kind: str, q: float) -> Optional[float]:
+        """Returns the q-th percentile latency in seconds, or None without samples."""
+        with self._lock:
+            samples = sorted(self.latencies[kind])
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))]
+
+    def error_rate(self) -> float:
+        with self._lock:
+            return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "p50_ms": _ms(self.percentile("invoke", 50)),
+            "p95_ms": _ms(self.percentile("invoke", 95)),
+            "first_token_p50_ms": _ms(self.percentile("stream", 50)),
+            "error_rate": round(self.error_rate(), 4),
+            "circuit_open": self.open_until > time.monotonic(),
+        }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+
+class LLMRouter(Runnable):
+    """
+    Runnable that hedges and fails over LLM requests across several chat models.
+    """
+
+    def __init__(
+        self,
+        providers: List[Tuple[str, Runnable]],
+        hedge_after_ms: float = -1,
+        max_parallel: int = 0,
+        error_rate: float = 0,
+        min_requests: int = 0,
+        reset_seconds: float = -1,
+        default_hedge_ms: float = 2000.0,
+    ):
+        """
+        Initialize the router.
+
+        Args:
+            providers: (name, chat model) pairs in order of preference
+            hedge_after_ms: Fixed hedge delay; 0 follows the rolling p95 of the first provider
+                            (default: LLM_HEDGE_AFTER_MS or 0)
+            max_parallel: Maximum requests in flight for one call, 1 disables hedging
+                          (default: LLM_HEDGE_MAX_PARALLEL or 2)
+            error_rate: Share of failed recent requests that opens a provider's circuit (default: LLM_CIRCUIT_ERROR_RATE or 0.5)
+            min_requests: Recent requests needed before the error rate counts (default: LLM_CIRCUIT_MIN_REQUESTS or 10)
+            reset_seconds: Seconds a circuit stays open (default: LLM_CIRCUIT_RESET_SECONDS or 30)
+            default_hedge_ms: Hedge delay while the rolling p95 has too few samples
+        """
+        if not providers:
+            raise ValueError("LLMRouter needs at least one provider")
+        self.log = LogManager()
+        self.log.add_logfile("llmrouter")
+        self.metrics = get_metrics()
+        self.providers = list(providers)
+        self.stats = {name: ProviderStats() for name, _ in self.providers}
+        self.hedge_after_ms = hedge_after_ms if hedge_after_ms >= 0 else float(os.getenv("LLM_HEDGE_AFTER_MS", "0"))
+        self.max_parallel = max_parallel or int(os.getenv("LLM_HEDGE_MAX_PARALLEL", "2"))
+        self.error_rate = error_rate or float(os.getenv("LLM_CIRCUIT_ERROR_RATE", "0.5"))
+        self.min_requests = min_requests or int(os.getenv("LLM_CIRCUIT_MIN_REQUESTS", "10"))
+        self.reset_seconds = reset_seconds if reset_seconds >= 0 else float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+        self.default_hedge_ms = default_hedge_ms
+        self.hedged_requests = 0
+        # Threads of the synchronous requests; losing hedged requests finish in the background
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(4, len(self.providers) * int(os.getenv("LLM_MAX_CONCURRENCY", "8"))),
+            thread_name_prefix="llm-router",
+        )
+        self.log.write_log("llmrouter", logging.INFO, f"LLM router with providers: {', '.join(name for name, _ in self.providers)}")
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        candidates = self._candidates()
+        in_flight: Dict[concurrent.futures.Future, str] = {}
+        next_idx = 0
+        launch = True
+        last_error = None
+        while True:
+            if launch and len(in_flight) < self.max_parallel:
+                name, next_idx = self._acquire_next(candidates, next_idx)
+                if name is not None:
+                    llm = candidates[next_idx - 1][1]
+                    in_flight[self._executor.submit(self._timed_invoke, name, llm, input, config, kwargs)] = name
+                launch = False
+            if not in_flight:
+                break
+            can_hedge = next_idx < len(candidates) and len(in_flight) < self.max_parallel
+            timeout = self._hedge_delay(candidates[0][0], "invoke") if can_hedge else None
+            done, _ = concurrent.futures.wait(in_flight, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                self._hedge(candidates, next_idx)
+                launch = True
+                continue
+            for future in done:
+                in_flight.pop(future)
+                if future.exception() is None:
+                    # Losing requests finish in the background and only update the statistics
+                    return future.result()
+                last_error = future.exception()
+                launch = True
+        raise self._exhausted(last_error) from last_error
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        async def attempt(name, llm):
+            started = time.perf_counter()
+            result = await llm.ainvoke(input, config, **kwargs)
+            self._record_success(name, time.perf_counter() - started, "invoke")
+            return result
+
+        result, _ = await self._race(attempt, "invoke")
+        return result
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        async def attempt(name, llm):
+            started = time.perf_counter()
+            stream = llm.astream(input, config, **kwargs)
+            try:
+                first = await stream.__anext__()
+            except BaseException:
+                await stream.aclose()
+                raise
+            self._record_success(name, time.perf_counter() - started, "stream")
+            return first, stream
+
+        (first, stream), name = await self._race(attempt, "stream", cleanup=lambda result: result[1].aclose())
+        try:
+            yield first
+            async for chunk in stream:
+                yield chunk
+        except Exception as e:
+            # The answer is already partly sent, it cannot move to another provider
+            self._record_failure(name, e)
+            raise
+        finally:
+            await stream.aclose()
+
+    def provider_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the rolling statistics of every provider."""
+        return {name: stats.to_dict() for name, stats in self.stats.items()}
+
+    async def _race(self, attempt: Callable, kind: str, cleanup: Optional[Callable] = None) -> Tuple[Any, str]:
+        """
+        Runs attempt(name, llm) on the providers with hedging and failover, and returns the
+        first successful result with the provider name. Results of losing attempts that
+        finished anyway are passed to cleanup.
+        """
+        candidates = self._candidates(kind)
+        in_flight: Dict[asyncio.Task, str] = {}
+        started: Dict[asyncio.Task, float] = {}
+        next_idx = 0
+        launch = True
+        last_error = None
+        try:
+            while True:
+                if launch and len(in_flight) < self.max_parallel:
+                    name, next_idx = self._acquire_next(candidates, next_idx)
+                    if name is not None:
+                        task = asyncio.ensure_future(attempt(name, candidates[next_idx - 1][1]))
+                        in_flight[task] = name
+                        started[task] = time.perf_counter()
+                    launch = False
+                if not in_flight:
+                    break
+                can_hedge = next_idx < len(candidates) and len(in_flight) < self.max_parallel
+                timeout = self._hedge_delay(candidates[0][0], kind) if can_hedge else None
+                done, _ = await asyncio.wait(in_flight, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self._hedge(candidates, next_idx)
+                    launch = True
+                    continue
+                winner = None
+                for task in done:
+                    name = in_flight.pop(task)
+                    if task.exception() is None:
+                        if winner is None:
+                            winner = (task.result(), name)
+                        elif cleanup is not None:
+                            await cleanup(task.result())
+                    else:
+                        last_error = task.exception()
+                        self._record_failure(name, last_error)
+                        launch = True
+                if winner is not None:
+                    return winner
+        finally:
+            for task, name in in_flight.items():
+                task.cancel()
+                self.stats[name].record_latency(time.perf_counter() - started[task], kind)
+        raise self._exhausted(last_error) from last_error
+
+    def _timed_invoke(self, name: str, llm: Runnable, input: Any, config: Optional[RunnableConfig], kwargs: Dict) -> Any:
+        started = time.perf_counter()
+        try:
+            result = llm.invoke(input, config, **kwargs)
+        except Exception as e:
+            self._record_failure(name, e)
+            raise
+        self._record_success(name, time.perf_counter() - started, "invoke")
+        return result
+
+    def _acquire_next(self, candidates: List[Tuple[str, Runnable]], next_idx: int) -> Tuple[Optional[str], int]:
+        """Claims the next candidate that still accepts a request; returns its name (or None) and the new index."""
+        while next_idx < len(candidates):
+            name = candidates[next_idx][0]
+            next_idx += 1
+            if self.stats[name].acquire():
+                return name, next_idx
+        return None, next_idx
+
+    def _candidates(self, kind: str = "invoke") -> List[Tuple[str, Runnable]]:
+        """
+        Returns the providers whose circuit is closed or due for a trial, fastest first by
+        the latency of the request kind ('invoke' or 'stream'). Unmeasured providers follow
+        the measured ones in their configured order.
+        """
+        def rank(item):
+            position, (name, _) = item
+            median = self.stats[name].percentile(kind, 50)
+            if median is None:
+                return (1, 0.0, position)
+            return (0, median, position)
+
+        ordered = [provider for _, provider in sorted(enumerate(self.providers), key=rank)]
+        candidates = [(name, llm) for name, llm in ordered if self.stats[name].available()]
+        if not candidates:
+            raise RuntimeError("All LLM providers are unavailable (circuit breakers open)")
+        return candidates
+
+    def _hedge_delay(self, name: str, kind: str) -> Optional[float]:
+        """Seconds to wait for the first provider before hedging."""
+        if self.max_parallel < 2:
+            return None
+        if self.hedge_after_ms > 0:
+            return self.hedge_after_ms / 1000
+        stats = self.stats[name]
+        if len(stats.latencies[kind]) < MIN_HEDGE_SAMPLES:
+            return self.default_hedge_ms / 1000
+        return stats.percentile(kind, 95)
+
+    def _hedge(self, candidates: List[Tuple[str, Runnable]], next_idx: int) -> None:
+        self.hedged_requests += 1
+        self.metrics.inc("llm_hedged_requests_total")
+        self.log.write_log("llmrouter", logging.DEBUG, "Hedging request to %s", candidates[next_idx][0])
+
+    def _record_success(self, name: str, seconds: float, kind: str) -> None:
+        self.stats[name].record_success(seconds, kind)
+        self.metrics.observe(f"llm_{name}_{kind}_seconds", seconds)
+
+    def _record_failure(self, name: str, error: BaseException) -> None:
+        self.metrics.inc(f"llm_{name}_errors_total")
+        if self.stats[name].record_failure(self.error_rate, self.min_requests, self.reset_seconds):
+            self.log.write_log("llmrouter", logging.WARNING, f"Circuit opened for {name} for {self.reset_seconds}s after: {str(error)}")
+        else:
+            self.log.write_log("llmrouter", logging.WARNING, f"Request to {name} failed: {str(error)}")
+
+    def _exhausted(self, error: Optional[BaseException] = None) -> Exception:
+        return RuntimeError(f"Every LLM provider failed, last error: {error}")
@@ -1,44 +1,170 @@
-import logging
+import atexit
 import datetime
+import logging
+import logging.handlers
+import os
+import queue
+import threading
 
 """
 LogManager handles logging functionalities for the AI assistant.
 
+Log records are put on an in-memory queue by the calling thread and written to the log
+files by one background thread shared by the whole process, so logging adds no file I/O
+to the request path. Every named log goes to ./logs/<name>_<YYYY-MM-DD>.log, and a new
+file is started when the date changes.
+
+Each logger gets its queue handler once, no matter how many LogManager instances register
+it. Levels are set per logger with LOG_LEVEL_<NAME> (e.g. LOG_LEVEL_VECTORDB=WARNING),
+falling back to LOG_LEVEL (default: INFO). Messages below the level are dropped before
+any formatting; pass arguments separately to defer the formatting of enabled messages to
+the writer thread as well.
+
 Usage:
     log_manager = LogManager()
     log_manager.add_logfile("assistant")
     log_manager.write_log("assistant", logging.INFO, "Assistant started.")
+    log_manager.write_log("assistant", logging.DEBUG, "Retrieved %d chunks", len(chunks))
 
 """
 
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class DailyFileHandler(logging.Handler):
+    """
+    Writes records to <directory>/<name>_<YYYY-MM-DD>.log, switching files at midnight.
+    """
+
+    def __init__(self, directory: str, log_name: str):
+        super().__init__()
+        self.directory = directory
+        self.log_name = log_name
+        self.date_str = ""
+        self.stream = None
+        self.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            date_str = datetime.datetime.fromtimestamp(record.created).strftime("%Y-%m-%d")
+            if date_str != self.date_str or self.stream is None:
+                self._open(date_str)
+            self.stream.write(self.format(record) + "\n")
+            self.stream.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        super().close()
+
+    def _open(self, date_str: str):
+        if self.stream is not None:
+            self.stream.close()
+        os.makedirs(self.directory, exist_ok=True)
+        self.stream = open(os.path.join(self.directory, f"{self.log_name}_{date_str}.log"), "a", encoding="utf-8")
+        self.date_str = date_str
+
+
+class LogFileRouter(logging.Handler):
+    """
+    Handler of the background writer thread: routes each record to the daily file of its logger.
+    """
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.directory = directory
+        self.file_handlers = {}
+
+    def emit(self, record: logging.LogRecord):
+        handler = self.file_handlers.get(record.name)
+        if handler is None:
+            handler = self.file_handlers[record.name] = DailyFileHandler(self.directory, record.name)
+        handler.handle(record)
+
+    def close(self):
+        for handler in self.file_handlers.values():
+            handler.close()
+        super().close()
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves the formatting to the writer thread. The standard
+    QueueHandler formats the message in the calling thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
 class LogManager:
+    _lock = threading.Lock()
+    _queue = None
+    _listener = None
+    _queue_handler = None
+    log_files_path = "./logs/"
+
     def __init__(self):
         """Initialize the LogManager."""
         self.logfiles = {}
-        self.today_str = datetime.datetime.now().strftime("%Y-%m-%d")
-        self.log_files_path = "./logs/"
+        self._start_writer()
 
     def add_logfile(self, name: str):
-        """Adds a logfile for the given name."""
-        logfile_path = f"{self.log_files_path}{name}_{self.today_str}.log"
+        """Adds a logfile for the given name. Registering the same name again has no effect."""
         logger = self.setup_logger(name)
-        file_handler = logging.FileHandler(logfile_path)
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        with LogManager._lock:
+            if LogManager._queue_handler not in logger.handlers:
+                logger.addHandler(LogManager._queue_handler)
         self.logfiles[name] = logger
 
-    def write_log(self, name: str, level: int, message: str):
-        """Writes a log message to the specified logfile."""
-        if name not in self.logfiles:
+    def write_log(self, name: str, level: int, message: str, *args):
+        """
+        Writes a log message to the specified logfile. Optional args are merged into
+        the message with %-formatting, only if the message is written.
+        """
+        logger = self.logfiles.get(name)
+        if logger is None:
             self.add_logfile(name)
-        logger = self.logfiles[name]
-        logger.log(level, message)
+            logger = self.logfiles[name]
+        if logger.isEnabledFor(level):
+            logger.log(level, message, *args)
+
+    def is_enabled(self, name: str, level: int) -> bool:
+        """Returns True if messages of the level are written to the logfile, to skip building expensive messages."""
+        return logging.getLogger(name).isEnabledFor(level)
 
     def setup_logger(self, name: str) -> logging.Logger:
-        """Sets up a logger with the specified name."""
+        """Sets up a logger with the specified name and its configured level."""
         logger = logging.getLogger(name)
-        logger.setLevel(logging.DEBUG)
-        return logger
\ No newline at end of file
+        level_name = os.getenv(f"LOG_LEVEL_{name.upper()}", os.getenv("LOG_LEVEL", "INFO"))
+        level = logging.getLevelName(level_name.upper())
+        logger.setLevel(level if isinstance(level, int) else logging.INFO)
+        return logger
+
+    @classmethod
+    def _start_writer(cls):
+        """Starts the background writer thread of the process, if it is not running."""
+        if cls._listener is not None:
+            return
+        with cls._lock:
+            if cls._listener is not None:
+                return
+            if cls._queue is None:
+                cls._queue = queue.SimpleQueue()
+                cls._queue_handler = DeferredQueueHandler(cls._queue)
+                atexit.register(cls.shutdown)
+            cls._listener = logging.handlers.QueueListener(cls._queue, LogFileRouter(cls.log_files_path))
+            cls._listener.start()
+
+    @classmethod
+    def shutdown(cls):
+        """Writes the queued records and stops the writer thread."""
+        with cls._lock:
+            listener, cls._listener = cls._listener, None
+        if listener is not None:
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
@@ -6,6 +6,8 @@ import datetime
 from .documentloader import DocumentLoader
 import os
 import warnings
+import asyncio
+from typing import Iterable
 
 """
 The main applications entry point for the RAG-based AI assistant. 
@@ -38,6 +40,41 @@ load_dotenv()
 log = LogManager()
 log.add_logfile("app")
 
+async def chat_loop(assistant: RAGAssistant, sample_docs: Iterable, failed_paths: Iterable[str] = ()):
+    """
+    Interactive loop that prints the answer tokens as they arrive.
+    Questions are accepted right away, while the documents are ingested in the background.
+    """
+    loop = asyncio.get_running_loop()
+
+    # Only new or changed documents are embedded, deleted ones are removed (files that
+    # failed to load are kept)
+    ingestion = loop.run_in_executor(None, assistant.add_documents, sample_docs, True, failed_paths)
+    knowledge_base_ready = False
+
+    while True:
+        # input() blocks, keep it off the event loop
+        question = await loop.run_in_executor(None, input, "You: ")
+        if question.lower() == "quit" or question.lower() == "exit":
+            print("Goodbye!")
+            break
+
+        if not knowledge_base_ready:
+            if not ingestion.done():
+                print("(Waiting for the knowledge base to finish loading...)")
+            stats = await ingestion
+            print(f"Loaded {stats['documents']} documents, embedded {stats['chunks_embedded']} new chunks ({stats['skipped_documents']} unchanged documents skipped)")
+            knowledge_base_ready = True
+
+        # Stream the assistant response
+        print("Assistant: ", end="", flush=True)
+        async for token in assistant.astream(question):
+            print(token, end="", flush=True)
+        print()
+
+    # Do not leave a half-finished ingestion behind
+    await ingestion
+
 def main():
     """
     Main function to run the RAG assistant.
@@ -48,27 +85,21 @@ def main():
         print("Initializing RAG Assistant...")
         assistant = RAGAssistant()
 
-        # Load sample documents
-        print("\nLoading documents...")
-        document_loader = DocumentLoader()
-        sample_docs = document_loader.load_documents()
-        print(f"Loaded {len(sample_docs)} sample documents")
-
-        assistant.add_documents(sample_docs)
+        # Load the embedding model in the background while the documents are read
+        assistant.vector_db.warm_up()
 
-        done = False
+        # Documents are read and chunked in worker processes while they are ingested
+        print("\nLoading documents...")
+        document_loader = DocumentLoader(
+            chunk_size=assistant.vector_db.chunk_size,
+            chunk_overlap=assistant.vector_db.chunk_overlap,
+            known_hashes=assistant.vector_db.manifest.hashes(),
+        )
+        sample_docs = document_loader.iter_documents()
 
         # Example interaction loop
         print("Welcome to the RAG-based AI Assistant! Type 'exit' to quit.")
-        while True:
-            question = input("You: ")
-            if question.lower() == "quit" or question.lower() == "exit":
-                print("Goodbye!")
-                break
-
-            # Get assistant response
-            response = assistant.invoke(question)
-            print(f"Assistant: {response}")
+        asyncio.run(chat_loop(assistant, sample_docs, document_loader.failed_paths))
     except Exception as e:
         print(f"Error running RAG assistant: {e}")
         print("Make sure you have set up your .env file with at least one API key:")
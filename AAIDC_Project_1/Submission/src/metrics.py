@@ -0,0 +1,256 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Sequence
+from .logmanager import LogManager
+
+"""
+Metrics Module
+--------------
+Counters, histograms and timing spans of the RAG request path and the ingestion, with
+pluggable exporters:
+
+- prometheus: text exposition format served over HTTP at http://METRICS_HOST:METRICS_PORT/metrics
+  (loopback only by default)
+- json: periodic dumps of all metrics to METRICS_JSON_PATH
+
+Metrics are enabled by selecting one or more exporters with METRICS_EXPORTER (comma-separated).
+When no exporter is selected, span() returns a shared no-op context manager and inc() and
+observe() return immediately, so the instrumentation costs one attribute check per call.
+
+Usage:
+    metrics = get_metrics()
+    with metrics.span("rag_llm"):
+        answer = llm.invoke(prompt)
+    metrics.inc("ingest_chunks_embedded_total", len(chunks))
+    metrics.observe("ingest_batch_size", len(chunks), SIZE_BUCKETS)
+"""
+
+# Upper bounds of the histogram buckets of durations (seconds) and sizes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = tuple(float(2 ** power) for power in range(17))
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus model.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+                break
+
+    def to_dict(self) -> Dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[repr(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "buckets": buckets,
+        }
+
+
+class _NoopSpan:
+    """Context manager returned by span() when metrics are disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    """Times a block of code and records its duration in the '<name>_seconds' histogram."""
+
+    __slots__ = ("registry", "name", "started")
+
+    def __init__(self, registry: "MetricsRegistry", name: str):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(f"{self.name}_seconds", time.perf_counter() - self.started)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of counters and histograms.
+    """
+
+    def __init__(self, enabled: bool = True):
+        """
+        Initialize the registry.
+
+        Args:
+            enabled: If False, every recording call is a no-op
+        """
+        self.enabled = enabled
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.exporters = []
+        self._lock = threading.Lock()
+
+    def span(self, name: str):
+        """Returns a context manager recording the duration of its block as '<name>_seconds'."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name)
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """Increments a counter."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        """Records a value in a histogram; the buckets are fixed by the first observation."""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def to_dict(self) -> Dict:
+        """Returns a snapshot of all metrics."""
+        with self._lock:
+            return {
+                "timestamp": time.time(),
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            }
+
+    def render_prometheus(self) -> str:
+        """Returns all metrics in the Prometheus text exposition format."""
+        snapshot = self.to_dict()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+        for name, histogram in sorted(snapshot["histograms"].items()):
+            lines.append(f"# TYPE {name} histogram")
+            for bound, count in histogram["buckets"].items():
+                lines.append(f'{name}_bucket{{le="{bound}"}} {count}')
+            lines.append(f"{name}_sum {histogram['sum']}")
+            lines.append(f"{name}_count {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+class PrometheusExporter:
+    """
+    Serves the metrics at /metrics from a background HTTP server thread.
+    """
+
+    def __init__(self, registry: MetricsRegistry, port: int = 9464, host: str = "127.0.0.1"):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes are not worth a log line each
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-prometheus", daemon=True)
+        self.thread.start()
+
+
+class JsonFileExporter:
+    """
+    Writes the metrics to a JSON file every interval seconds and at exit.
+    """
+
+    def __init__(self, registry: MetricsRegistry, path: str, interval: float = 60.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="metrics-json", daemon=True)
+        self.thread.start()
+        atexit.register(self.dump)
+
+    def dump(self) -> None:
+        """Writes the current metrics atomically."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.registry.to_dict(), file, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.dump()
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """
+    Returns the process-wide metrics registry. The first call creates it and starts the
+    exporters selected with METRICS_EXPORTER (none, prometheus, json, or both comma-separated).
+    """
+    global _registry
+    if _registry is not None:
+        return _registry
+    with _registry_lock:
+        if _registry is None:
+            exporters = [name.strip() for name in os.getenv("METRICS_EXPORTER", "none").split(",") if name.strip() not in ("", "none")]
+            registry = MetricsRegistry(enabled=bool(exporters))
+            log = LogManager()
+            log.add_logfile("metrics")
+            for name in exporters:
+                if name == "prometheus":
+                    host = os.getenv("METRICS_HOST", "127.0.0.1")
+                    port = int(os.getenv("METRICS_PORT", "9464"))
+                    registry.exporters.append(PrometheusExporter(registry, port=port, host=host))
+                    log.write_log("metrics", logging.INFO, f"Prometheus metrics served on http://{host}:{port}/metrics")
+                elif name == "json":
+                    path = os.getenv("METRICS_JSON_PATH", "./logs/metrics.json")
+                    registry.exporters.append(JsonFileExporter(registry, path, float(os.getenv("METRICS_JSON_INTERVAL", "60"))))
+                    log.write_log("metrics", logging.INFO, f"Metrics written to {path}")
+                else:
+                    log.write_log("metrics", logging.ERROR, f"Unknown metrics exporter: {name}")
+            _registry = registry
+    return _registry
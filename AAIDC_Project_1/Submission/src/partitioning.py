@@ -0,0 +1,505 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+import numpy as np
+from .logmanager import LogManager
+from .vectorstore import VectorStore, merge_query_results
+
+"""
+Partitioning Module
+-------------------
+Metadata filters and partitioned storage for the VectorDB.
+
+Search filters are dictionaries with any of these keys. A chunk matches if its
+document matches every given condition:
+- source: a source (file path) or a list of sources
+- path_prefix: prefix of the normalized source path (end it with '/' to match a folder)
+- tags: a tag or a list of tags, all of which the document must have ('tags' metadata)
+- tenant: tenant of the document ('tenant' metadata)
+- modified_after / modified_before: range of the document's 'mtime', as epoch seconds,
+  datetime or ISO 8601 string (after is inclusive, before is exclusive)
+
+Every condition is on document-level metadata, so the MetadataIndex resolves a filter
+to the matching sources and their partitions without touching the vector store.
+
+With PARTITION_BY set to 'tenant', 'directory' or 'source', the chunks of every tenant,
+source folder or source are stored in a sub-collection of their own, and a filtered
+query only searches the partitions of the matching sources.
+
+Usage:
+    index = MetadataIndex("./chroma_db/metadata_index_rag_documents.json")
+    index.update(source, metadata, partition_of(metadata, "tenant"))
+    scope = index.resolve({"tenant": "acme", "tags": ["finance"]})
+"""
+
+PARTITION_MODES = ("none", "tenant", "directory", "source")
+FILTER_KEYS = ("source", "path_prefix", "tags", "tenant", "modified_after", "modified_before")
+
+# Partition of documents without a tenant (or directory) in a partitioned collection
+DEFAULT_PARTITION = "default"
+
+
+def _timestamp(value: Any) -> float:
+    """Converts epoch seconds, a datetime or an ISO 8601 string to epoch seconds."""
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid date: {value!r}")
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    raise ValueError(f"Invalid date: {value!r}")
+
+
+def _as_list(value: Any) -> List[str]:
+    if isinstance(value, str):
+        return [value]
+    return [str(item) for item in value]
+
+
+def _normalize_path(path: str) -> str:
+    normalized = os.path.normpath(path).replace(os.sep, "/")
+    return normalized + "/" if path.endswith(("/", os.sep)) and normalized != "/" else normalized
+
+
+def document_tags(metadata: Dict[str, Any]) -> List[str]:
+    """Returns the tags of a document: a list or a comma-separated string in the 'tags' metadata."""
+    tags = metadata.get("tags")
+    if not tags:
+        return []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return sorted({str(tag).strip() for tag in tags if str(tag).strip()})
+
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Validates search filters and converts them to their canonical form.
+
+    Args:
+        filters: Search filters (see the module documentation), or None
+
+    Returns:
+        The normalized filters, or None if there are no conditions
+
+    Raises:
+        ValueError: For unknown keys or invalid values
+    """
+    if not filters:
+        return None
+    unknown = set(filters).difference(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown filter keys: {', '.join(sorted(unknown))}. Use: {', '.join(FILTER_KEYS)}")
+    normalized = {}
+    for key, value in filters.items():
+        if value is None:
+            continue
+        if key == "source":
+            normalized[key] = sorted(set(_as_list(value)))
+        elif key == "tags":
+            normalized[key] = sorted(set(_as_list(value)))
+        elif key in ("modified_after", "modified_before"):
+            normalized[key] = _timestamp(value)
+        elif key == "path_prefix":
+            normalized[key] = _normalize_path(str(value))
+        else:
+            normalized[key] = str(value)
+    return normalized or None
+
+
+def filter_key(filters: Optional[Dict[str, Any]]) -> str:
+    """Returns a hashable key of normalized filters, used by the query caches."""
+    return json.dumps(filters, sort_keys=True) if filters else ""
+
+
+def partition_of(metadata: Dict[str, Any], partition_by: str) -> str:
+    """
+    Returns the partition of a document.
+
+    Args:
+        metadata: Metadata of the document
+        partition_by: 'none', 'tenant', 'directory' or 'source'
+
+    Returns:
+        The partition name ('' if the collection is not partitioned)
+    """
+    if partition_by == "none":
+        return ""
+    if partition_by == "tenant":
+        return str(metadata.get("tenant") or DEFAULT_PARTITION)
+    source = str(metadata.get("source", ""))
+    if partition_by == "directory":
+        return os.path.dirname(_normalize_path(source)) or DEFAULT_PARTITION
+    if partition_by == "source":
+        return source or DEFAULT_PARTITION
+    raise ValueError(f"Unknown partitioning: {partition_by}. Use one of: {', '.join(PARTITION_MODES)}")
+
+
+def partition_slug(partition: str) -> str:
+    """Returns a name for the sub-collection of a partition that is valid for every backend."""
+    readable = re.sub(r"[^A-Za-z0-9_-]+", "_", partition).strip("_-")[:40]
+    return f"p_{readable}_{hashlib.sha1(partition.encode('utf-8')).hexdigest()[:8]}"
+
+
+class MetadataIndex:
+    """
+    Persistent index of the document-level metadata of every source: its partition,
+    tenant, tags and modification time.
+    """
+
+    def __init__(self, index_path: str):
+        """
+        Initialize the index and load it from disk if it exists.
+
+        Args:
+            index_path: Path of the JSON index file
+        """
+        self.log = LogManager()
+        self.log.add_logfile("vectordb")
+        self.index_path = index_path
+        self.sources: Dict[str, Dict[str, Any]] = {}
+        self.partitions: Dict[str, Set[str]] = {}
+        self.dirty = False
+        self._lock = threading.RLock()
+        self.exists = os.path.exists(index_path)
+        if self.exists:
+            self.load()
+
+    def update(self, source: str, metadata: Dict[str, Any], partition: str) -> None:
+        """Records the metadata of an ingested source."""
+        entry = {"partition": partition}
+        if metadata.get("tenant"):
+            entry["tenant"] = str(metadata["tenant"])
+        tags = document_tags(metadata)
+        if tags:
+            entry["tags"] = tags
+        if isinstance(metadata.get("mtime"), (int, float)):
+            entry["mtime"] = float(metadata["mtime"])
+        with self._lock:
+            if self.sources.get(source) == entry:
+                return
+            self._remove(source)
+            self.sources[source] = entry
+            self.partitions.setdefault(partition, set()).add(source)
+            self.dirty = True
+
+    def remove(self, source: str) -> None:
+        """Removes a source from the index."""
+        with self._lock:
+            if self._remove(source):
+                self.dirty = True
+
+    def clear(self) -> None:
+        """Removes every source."""
+        with self._lock:
+            self.sources = {}
+            self.partitions = {}
+            self.dirty = True
+
+    def partition_sources(self, partition: str) -> List[str]:
+        """Returns the sources of a partition."""
+        with self._lock:
+            return list(self.partitions.get(partition, ()))
+
+    def resolve(self, filters: Dict[str, Any]) -> Dict[str, Optional[List[str]]]:
+        """
+        Resolves normalized filters to the matching sources, grouped by partition.
+
+        Args:
+            filters: Normalized search filters
+
+        Returns:
+            Dictionary of partition -> matching sources, or None if every source of the
+            partition matches. Partitions without a matching source are left out.
+        """
+        with self._lock:
+            if "source" in filters:
+                candidates: Iterable[str] = [source for source in filters["source"] if source in self.sources]
+            else:
+                candidates = self.sources
+            matches: Dict[str, List[str]] = {}
+            for source in candidates:
+                entry = self.sources[source]
+                if self._matches(source, entry, filters):
+                    matches.setdefault(entry["partition"], []).append(source)
+            return {
+                partition: None if len(sources) == len(self.partitions[partition]) else sources
+                for partition, sources in matches.items()
+            }
+
+    def save(self) -> None:
+        """Writes the index to disk atomically, if it changed."""
+        with self._lock:
+            if not self.dirty and self.exists:
+                return
+            directory = os.path.dirname(self.index_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump({"sources": self.sources}, file)
+            os.replace(tmp_path, self.index_path)
+            self.exists = True
+            self.dirty = False
+
+    def load(self) -> None:
+        """Loads the index from disk."""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            self.log.write_log("vectordb", logging.ERROR, f"Error loading metadata index: {str(e)}")
+            self.exists = False
+            return
+        with self._lock:
+            self.sources = data.get("sources", {})
+            self.partitions = {}
+            for source, entry in self.sources.items():
+                self.partitions.setdefault(entry["partition"], set()).add(source)
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def _remove(self, source: str) -> bool:
+        entry = self.sources.pop(source, None)
+        if entry is None:
+            return False
+        sources = self.partitions.get(entry["partition"])
+        if sources is not None:
+            sources.discard(source)
+            if not sources:
+                del self.partitions[entry["partition"]]
+        return True
+
+    @staticmethod
+    def _matches(source: str, entry: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+        if "tenant" in filters and entry.get("tenant") != filters["tenant"]:
+            return False
+        if "path_prefix" in filters and not _normalize_path(source).startswith(filters["path_prefix"]):
+            return False
+        if "tags" in filters and not set(filters["tags"]).issubset(entry.get("tags", ())):
+            return False
+        if "modified_after" in filters or "modified_before" in filters:
+            mtime = entry.get("mtime")
+            if mtime is None:
+                return False
+            if mtime < filters.get("modified_after", mtime):
+                return False
+            if "modified_before" in filters and mtime >= filters["modified_before"]:
+                return False
+        return True
+
+
+class PartitionedVectorStore(VectorStore):
+    """
+    Vector store made of one sub-store per partition. Chunks are routed by the partition
+    of their metadata; queries search the given partitions and merge their hits by distance.
+    Sub-stores are opened on first use.
+    """
+
+    def __init__(self, store_factory: Callable[[str], VectorStore], partitions_path: str, partition_by: str):
+        """
+        Initialize the store and load its list of partitions.
+
+        Args:
+            store_factory: Creates the sub-store of a partition from its slug
+            partitions_path: Path of the JSON file with the partition names
+            partition_by: 'tenant', 'directory' or 'source'
+        """
+        self.log = LogManager()
+        self.log.add_logfile("vectordb")
+        self.store_factory = store_factory
+        self.partitions_path = partitions_path
+        self.partition_by = partition_by
+        self.partitions: Dict[str, str] = {}
+        self.stores: Dict[str, VectorStore] = {}
+        self._partition_of_id: Optional[Dict[str, str]] = None
+        self._lock = threading.RLock()
+        if os.path.exists(partitions_path):
+            with open(partitions_path, "r", encoding="utf-8") as file:
+                self.partitions = json.load(file).get("partitions", {})
+
+    @property
+    def max_batch_size(self) -> Optional[int]:
+        sizes = [store.max_batch_size for store in self.stores.values() if store.max_batch_size]
+        return min(sizes) if sizes else None
+
+    def store(self, partition: str, create: bool = False) -> Optional[VectorStore]:
+        """Returns the sub-store of a partition, or None if it does not exist and create is False."""
+        with self._lock:
+            store = self.stores.get(partition)
+            if store is not None:
+                return store
+            if partition not in self.partitions:
+                if not create:
+                    return None
+                self.partitions[partition] = partition_slug(partition)
+                self._save_partitions()
+                self.log.write_log("vectordb", logging.INFO, f"Created partition: {partition}")
+            store = self.store_factory(self.partitions[partition])
+            self.stores[partition] = store
+            return store
+
+    def add(self, ids, embeddings, documents, metadatas) -> None:
+        with self._lock:
+            located = self._id_map()
+            groups: Dict[str, List[int]] = {}
+            moved = []
+            for row, (chunk_id, metadata) in enumerate(zip(ids, metadatas)):
+                partition = partition_of(metadata, self.partition_by)
+                groups.setdefault(partition, []).append(row)
+                if located.get(chunk_id, partition) != partition:
+                    # The chunk moved to another partition: remove it from its old one
+                    moved.append(chunk_id)
+            if moved:
+                self.delete(moved)
+            for partition, rows in groups.items():
+                self.store(partition, create=True).add(
+                    [ids[row] for row in rows],
+                    [embeddings[row] for row in rows],
+                    [documents[row] for row in rows],
+                    [metadatas[row] for row in rows],
+                )
+                for row in rows:
+                    located[ids[row]] = partition
+
+    def delete(self, ids) -> None:
+        with self._lock:
+            located = self._id_map()
+            for partition, partition_ids in self._group(ids).items():
+                self.store(partition).delete(partition_ids)
+                for chunk_id in partition_ids:
+                    located.pop(chunk_id, None)
+
+    def update_metadata(self, ids, metadatas) -> None:
+        with self._lock:
+            located = self._id_map()
+            updates: Dict[str, List[int]] = {}
+            moves: Dict[str, List[int]] = {}
+            for row, (chunk_id, metadata) in enumerate(zip(ids, metadatas)):
+                current = located.get(chunk_id)
+                if current is None:
+                    continue
+                (updates if current == partition_of(metadata, self.partition_by) else moves).setdefault(current, []).append(row)
+            for partition, rows in updates.items():
+                self.store(partition).update_metadata([ids[row] for row in rows], [metadatas[row] for row in rows])
+            for partition, rows in moves.items():
+                # The partition of the chunks changed: copy them over with their embeddings
+                moved = self.store(partition).get(ids=[ids[row] for row in rows], include=["documents", "embeddings"])
+                new_metadata = {ids[row]: metadatas[row] for row in rows}
+                self.add(
+                    moved["ids"],
+                    [np.asarray(embedding, dtype=np.float32).tolist() for embedding in moved["embeddings"]],
+                    moved["documents"],
+                    [new_metadata[chunk_id] for chunk_id in moved["ids"]],
+                )
+
+    def query(self, query_embeddings, n_results=5, where=None, include_embeddings=False) -> Dict[str, List]:
+        return self.query_partitions(
+            query_embeddings, n_results, {partition: where for partition in self.partitions}, include_embeddings
+        )
+
+    def query_partitions(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int,
+        scopes: Dict[str, Optional[Dict]],
+        include_embeddings: bool = False,
+    ) -> Dict[str, List]:
+        """
+        Searches the given partitions and merges their nearest chunks by distance.
+
+        Args:
+            query_embeddings: Query embeddings
+            n_results: Number of results per query
+            scopes: Dictionary of partition -> metadata filter of the partition (or None)
+            include_embeddings: If True, also return the 'embeddings' of the found chunks
+
+        Returns:
+            Query results in the format of VectorStore.query()
+        """
+        partial = []
+        for partition, where in scopes.items():
+            store = self.store(partition)
+            if store is None or store.count() == 0:
+                continue
+            partial.append(store.query(query_embeddings, n_results=n_results, where=where, include_embeddings=include_embeddings))
+        return merge_query_results(partial, len(query_embeddings), n_results, include_embeddings)
+
+    def get(self, ids=None, include=None, limit=None, offset=0) -> Dict[str, List]:
+        include = ["documents", "metadatas"] if include is None else include
+        keys = ["ids"] + [key for key in ("documents", "metadatas", "embeddings") if key in include]
+        merged = {key: [] for key in keys}
+        with self._lock:
+            if ids is not None:
+                parts = [(self.store(partition), {"ids": partition_ids}) for partition, partition_ids in self._group(ids).items()]
+            else:
+                # Pages run over the partitions in name order
+                parts = []
+                remaining = None if limit is None else limit
+                for partition in sorted(self.partitions):
+                    if remaining is not None and remaining <= 0:
+                        break
+                    store = self.store(partition)
+                    count = store.count()
+                    if offset >= count:
+                        offset -= count
+                        continue
+                    parts.append((store, {"limit": remaining, "offset": offset}))
+                    if remaining is not None:
+                        remaining -= min(remaining, count - offset)
+                    offset = 0
+            for store, arguments in parts:
+                results = store.get(include=include, **arguments)
+                for key in keys:
+                    merged[key].extend(results[key])
+        return merged
+
+    def count(self) -> int:
+        return sum(self.store(partition).count() for partition in list(self.partitions))
+
+    def flush(self) -> None:
+        with self._lock:
+            for store in self.stores.values():
+                store.flush()
+
+    def clear(self) -> None:
+        with self._lock:
+            for partition in list(self.partitions):
+                self.store(partition).clear()
+            self._partition_of_id = {}
+
+    def _group(self, ids: Iterable[str]) -> Dict[str, List[str]]:
+        """Groups chunk IDs by their partition; unknown IDs are skipped."""
+        located = self._id_map()
+        groups: Dict[str, List[str]] = {}
+        for chunk_id in ids:
+            partition = located.get(chunk_id)
+            if partition is not None:
+                groups.setdefault(partition, []).append(chunk_id)
+        return groups
+
+    def _id_map(self) -> Dict[str, str]:
+        """Returns the partition of every stored chunk ID, read from the sub-stores on first use."""
+        if self._partition_of_id is None:
+            located = {}
+            for partition in list(self.partitions):
+                for chunk_id in self.store(partition).get(include=[])["ids"]:
+                    located[chunk_id] = partition
+            self._partition_of_id = located
+        return self._partition_of_id
+
+    def _save_partitions(self) -> None:
+        directory = os.path.dirname(self.partitions_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.partitions_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"partition_by": self.partition_by, "partitions": self.partitions}, file)
+        os.replace(tmp_path, self.partitions_path)
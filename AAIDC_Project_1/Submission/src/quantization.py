@@ -0,0 +1,104 @@
+from typing import Tuple
+import numpy as np
+
+"""
+Quantization Module
+-------------------
+Compact codes of normalized embeddings, used for a fast candidate search in RAM before
+the candidates are rescored with the full-precision embeddings.
+
+- Int8Quantizer: scalar quantization, one signed byte per dimension plus one float32
+  scale per vector (about 4x smaller than float32)
+- BinaryQuantizer: sign quantization, one bit per dimension (32x smaller than float32),
+  candidates are ranked by Hamming distance
+
+Usage:
+    quantizer = get_quantizer("int8")
+    codes, scales = quantizer.encode(embeddings)
+    scores = quantizer.scores(codes, scales, query_embedding)
+"""
+
+# Number of set bits of every byte value, used when np.bitwise_count is not available
+_POPCOUNT_TABLE = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+# Rows of int8 codes converted to float32 at a time
+SCORE_BLOCK_ROWS = 4096
+
+
+class Int8Quantizer:
+    """
+    Symmetric per-vector int8 scalar quantization.
+    """
+
+    name = "int8"
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Quantizes float vectors.
+
+        Args:
+            vectors: 2D float array
+
+        Returns:
+            Tuple of the int8 codes and the float32 scale of every vector
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, np.newaxis]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def scores(self, codes: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Returns the approximate dot product of every code with the query (higher is more similar)."""
+        query = np.asarray(query, dtype=np.float32)
+        scores = np.empty(len(codes), dtype=np.float32)
+        # NumPy has no BLAS kernel for int8, small float32 blocks stay in the CPU cache
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query
+        return scores * scales
+
+
+class BinaryQuantizer:
+    """
+    Sign (1 bit per dimension) quantization with Hamming-distance search.
+    """
+
+    name = "binary"
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Quantizes float vectors.
+
+        Args:
+            vectors: 2D float array
+
+        Returns:
+            Tuple of the packed sign bits (uint8) and unused unit scales
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return np.packbits(vectors > 0, axis=1), np.ones(len(vectors), dtype=np.float32)
+
+    def scores(self, codes: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Returns the negative Hamming distance of every code to the query (higher is more similar)."""
+        query_bits = np.packbits(np.asarray(query, dtype=np.float32) > 0)
+        different = np.bitwise_xor(codes, query_bits)
+        if hasattr(np, "bitwise_count"):
+            distances = np.bitwise_count(different).sum(axis=1, dtype=np.int32)
+        else:
+            distances = _POPCOUNT_TABLE[different].sum(axis=1, dtype=np.int32)
+        return -distances.astype(np.float32)
+
+
+def get_quantizer(name: str):
+    """
+    Returns the quantizer with the given name.
+
+    Args:
+        name: 'int8' or 'binary'
+    """
+    if name == "int8":
+        return Int8Quantizer()
+    if name == "binary":
+        return BinaryQuantizer()
+    raise ValueError(f"Unknown quantization: {name}. Use 'int8' or 'binary'")
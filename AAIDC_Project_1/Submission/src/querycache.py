@@ -0,0 +1,189 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+import numpy as np
+
+"""
+Query Cache Module
+------------------
+In-memory caches for the query path of the RAG assistant:
+
+- LRUCache: query embeddings (keyed by the query text) and retrieval results
+  (keyed by the query embedding and n_results)
+- SemanticAnswerCache: LLM answers, returned for a new question whose embedding is
+  within a similarity threshold of an already answered question
+
+Every cache is bound to a generation number of the vector database. When the collection
+changes, the generation changes and the cached entries are dropped on the next access.
+
+Usage:
+    cache = LRUCache(max_size=1024)
+    value = cache.get(key, generation)
+    if value is None:
+        value = compute()
+        cache.put(key, value, generation)
+"""
+
+
+def embedding_key(embedding: np.ndarray) -> str:
+    """Returns a hashable key for an embedding vector."""
+    return hashlib.sha1(np.ascontiguousarray(embedding, dtype=np.float32).tobytes()).hexdigest()
+
+
+class LRUCache:
+    """
+    Thread-safe, size-limited least-recently-used cache with generation-based invalidation.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of entries, 0 disables the cache
+        """
+        self.max_size = max_size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, generation: int = 0) -> Optional[Any]:
+        """Returns the cached value or None."""
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            if not self._sync(generation):
+                return None
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, generation: int = 0) -> None:
+        """Stores a value, evicting the least recently used entry when full."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if not self._sync(generation):
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _sync(self, generation: int) -> bool:
+        """Drops the entries of an older generation. Returns False for a request of an outdated generation."""
+        if generation < self.generation:
+            return False
+        if generation > self.generation:
+            self._entries.clear()
+            self.generation = generation
+        return True
+
+
+class SemanticAnswerCache:
+    """
+    Cache of LLM answers looked up by cosine similarity of the question embeddings.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_size: int = 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            threshold: Minimum cosine similarity between two questions to reuse an answer
+            max_size: Maximum number of cached answers
+        """
+        self.threshold = threshold
+        self.max_size = max_size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._embeddings = None
+        self._answers = []
+        self._n_results = []
+        self._last_used = []
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    def get(self, embedding: np.ndarray, n_results: int, generation: int = 0) -> Optional[str]:
+        """Returns the answer of the most similar cached question above the threshold, or None."""
+        with self._lock:
+            if not self._sync(generation) or self._embeddings is None or not self._answers:
+                self.misses += 1
+                return None
+            similarities = self._embeddings @ self._normalize(embedding)
+            for index in np.argsort(-similarities):
+                if similarities[index] < self.threshold:
+                    break
+                if self._n_results[index] == n_results:
+                    self._clock += 1
+                    self._last_used[index] = self._clock
+                    self.hits += 1
+                    return self._answers[index]
+            self.misses += 1
+            return None
+
+    def put(self, embedding: np.ndarray, n_results: int, answer: str, generation: int = 0) -> None:
+        """Stores the answer of a question, evicting the least recently used answer when full."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if not self._sync(generation):
+                return
+            vector = self._normalize(embedding)[np.newaxis, :]
+            self._clock += 1
+            if len(self._answers) >= self.max_size:
+                oldest = int(np.argmin(self._last_used))
+                self._embeddings[oldest] = vector[0]
+                self._answers[oldest] = answer
+                self._n_results[oldest] = n_results
+                self._last_used[oldest] = self._clock
+                return
+            self._embeddings = vector if self._embeddings is None else np.vstack([self._embeddings, vector])
+            self._answers.append(answer)
+            self._n_results.append(n_results)
+            self._last_used.append(self._clock)
+
+    def clear(self) -> None:
+        """Removes every answer."""
+        with self._lock:
+            self._reset()
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _sync(self, generation: int) -> bool:
+        """Drops the entries of an older generation. Returns False for a request of an outdated generation."""
+        if generation < self.generation:
+            return False
+        if generation > self.generation:
+            self._reset()
+            self.generation = generation
+        return True
+
+    def _reset(self) -> None:
+        self._embeddings = None
+        self._answers = []
+        self._n_results = []
+        self._last_used = []
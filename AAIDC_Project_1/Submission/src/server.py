@@ -0,0 +1,469 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import numpy as np
+from dotenv import load_dotenv
+from .app import RAGAssistant
+from .documentloader import DocumentLoader
+from .logmanager import LogManager
+from .metrics import SIZE_BUCKETS, get_metrics
+from .partitioning import normalize_filters
+
+"""
+RAG Server Module
+-----------------
+Local HTTP serving mode: one process loads the RAGAssistant (LLM client, embedding model,
+vector database) once and answers many concurrent users on an asyncio event loop.
+
+Endpoints (JSON bodies):
+- POST /ask     {"question": "...", "n_results": 3, "filters": {...}} -> {"answer": "..."}
+- POST /stream  {"question": "...", "n_results": 3, "filters": {...}} -> answer tokens as a chunked text/plain response
+- POST /ingest  {"documents": [{"content": "...", "metadata": {"source": "..."}}]} adds the
+                given documents; an empty body re-ingests the ./data/ folder
+- GET  /health  -> {"status": "ok", "in_flight": ..., "ingesting": ...}
+
+The query embeddings of concurrent questions are combined into micro-batches: questions
+arriving within SERVER_BATCH_WINDOW_MS of each other (or while the previous batch is being
+encoded) are embedded in one forward pass of the model. At most SERVER_MAX_CONCURRENCY
+questions are processed at a time and SERVER_MAX_QUEUE more may wait; further requests
+are rejected with 503 and a Retry-After header instead of queueing without bound.
+
+On startup the ./data/ folder is ingested in the background. With VECTOR_DB_SNAPSHOT set,
+the collection is imported from that snapshot file (see src/snapshot.py) instead, so a
+replica serves without embedding the corpus and without a ./data/ folder.
+
+Usage:
+    python -m src.server
+    curl -X POST localhost:8000/ask -d '{"question": "What is the real world dilemma?"}'
+"""
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    """Error answered with the given status code and message."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class EmbeddingMicroBatcher:
+    """
+    Combines the query embeddings of concurrent requests into batches. A batch is encoded
+    when the time window after its first query ends or it is full; while a batch is being
+    encoded, new queries collect into the next one.
+    """
+
+    def __init__(self, embed_batch: Callable[[List[str]], np.ndarray], window: float = 0.005, max_batch_size: int = 64):
+        """
+        Initialize the batcher.
+
+        Args:
+            embed_batch: Function returning the embeddings of a list of queries (runs in an executor)
+            window: Seconds to wait for more queries after the first query of a batch
+            max_batch_size: Maximum number of queries encoded together
+        """
+        self.embed_batch = embed_batch
+        self.window = window
+        self.max_batch_size = max(1, max_batch_size)
+        self.metrics = get_metrics()
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._encoding = False
+        self._tasks = set()
+
+    async def embed(self, query: str) -> np.ndarray:
+        """Returns the embedding of the query, encoded together with the concurrent queries."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None and not self._encoding:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """Starts encoding the pending queries, unless a batch is being encoded."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._encoding or not self._pending:
+            return
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+        self._encoding = True
+        task = asyncio.ensure_future(self._encode(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _encode(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        loop = asyncio.get_running_loop()
+        self.metrics.observe("server_embedding_batch_size", len(batch), SIZE_BUCKETS)
+        try:
+            embeddings = await loop.run_in_executor(None, self.embed_batch, [query for query, _ in batch])
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._encoding = False
+            # Queries that arrived during the encoding form the next batch right away
+            self._flush()
+
+
+class RAGServer:
+    """
+    asyncio HTTP/1.1 server exposing one RAGAssistant.
+    """
+
+    def __init__(
+        self,
+        assistant: RAGAssistant,
+        host: str = "",
+        port: int = 0,
+        max_concurrency: int = 0,
+        max_queue: int = -1,
+        batch_window_ms: float = -1,
+        max_batch_size: int = 0,
+        max_body_bytes: int = 10 * 1024 * 1024,
+        keep_alive_timeout: float = 15.0,
+    ):
+        """
+        Initialize the server.
+
+        Args:
+            assistant: The loaded RAG assistant
+            host: Interface to listen on (default: SERVER_HOST or 127.0.0.1)
+            port: Port to listen on (default: SERVER_PORT or 8000)
+            max_concurrency: Questions processed at a time (default: SERVER_MAX_CONCURRENCY or 64)
+            max_queue: Questions waiting for a slot before new ones are rejected (default: SERVER_MAX_QUEUE or 256)
+            batch_window_ms: Micro-batching window of the query embeddings (default: SERVER_BATCH_WINDOW_MS or 5)
+            max_batch_size: Maximum query embedding batch size (default: SERVER_MAX_BATCH_SIZE or 64)
+            max_body_bytes: Maximum size of a request body
+            keep_alive_timeout: Seconds an idle connection is kept open
+        """
+        self.log = LogManager()
+        self.log.add_logfile("server")
+        self.metrics = get_metrics()
+        self.assistant = assistant
+        self.host = host or os.getenv("SERVER_HOST", "127.0.0.1")
+        self.port = port or int(os.getenv("SERVER_PORT", "8000"))
+        self.max_concurrency = max_concurrency or int(os.getenv("SERVER_MAX_CONCURRENCY", "64"))
+        self.max_queue = max_queue if max_queue >= 0 else int(os.getenv("SERVER_MAX_QUEUE", "256"))
+        window = batch_window_ms if batch_window_ms >= 0 else float(os.getenv("SERVER_BATCH_WINDOW_MS", "5"))
+        self.batcher = EmbeddingMicroBatcher(
+            assistant.vector_db.embed_queries,
+            window=window / 1000,
+            max_batch_size=max_batch_size or int(os.getenv("SERVER_MAX_BATCH_SIZE", "64")),
+        )
+        self.max_body_bytes = max_body_bytes
+        self.keep_alive_timeout = keep_alive_timeout
+        self.in_flight = 0
+        self.ingestion: Optional[asyncio.Future] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> asyncio.AbstractServer:
+        """Starts listening; the returned server is already serving."""
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.log.write_log("server", logging.INFO, f"Serving on http://{self.host}:{self.port} (max concurrency: {self.max_concurrency}, max queue: {self.max_queue})")
+        return self._server
+
+    async def serve_forever(self) -> None:
+        """Starts the server and serves until cancelled."""
+        server = self._server or await self.start()
+        async with server:
+            await server.serve_forever()
+
+    def start_ingestion(self, documents=None, prune: bool = False) -> bool:
+        """
+        Starts ingesting documents in the background (the ./data/ folder if documents is None).
+        Pruning keeps the files of the folder that failed to load, and refuses to remove every
+        source when no documents were loaded.
+
+        Returns:
+            False if an ingestion is already running
+        """
+        if self.ingestion is not None and not self.ingestion.done():
+            return False
+        keep_sources = None
+        if documents is None:
+            vector_db = self.assistant.vector_db
+            loader = DocumentLoader(
+                chunk_size=vector_db.chunk_size, chunk_overlap=vector_db.chunk_overlap, known_hashes=vector_db.manifest.hashes()
+            )
+            documents = loader.iter_documents()
+            keep_sources = loader.failed_paths
+        loop = asyncio.get_running_loop()
+        self.ingestion = loop.run_in_executor(None, self.assistant.add_documents, documents, prune, keep_sources)
+        self.ingestion.add_done_callback(self._ingestion_done)
+        return True
+
+    def _ingestion_done(self, future: asyncio.Future) -> None:
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.log.write_log("server", logging.ERROR, f"Ingestion failed: {future.exception()}")
+        else:
+            self.log.write_log("server", logging.INFO, f"Ingestion finished: {future.result()}")
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serves the requests of one (keep-alive) connection."""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.keep_alive_timeout)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self.metrics.inc("server_requests_total")
+                try:
+                    await self._dispatch(writer, method, path, body, keep_alive)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": e.message}, keep_alive=keep_alive)
+                except (ConnectionError, asyncio.CancelledError):
+                    raise
+                except Exception as e:
+                    self.log.write_log("server", logging.ERROR, f"Error handling {method} {path}: {str(e)}")
+                    await self._send_json(writer, 500, {"error": str(e)}, keep_alive=keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Idle, dropped or shut down connection
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """Reads one request; returns None when the client closed the connection."""
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        parts = request_line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise HTTPError(400, "Malformed request line")
+        method, target, _ = parts
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        content_length = headers.get("content-length", "") or "0"
+        # Only plain digits: int() would also accept signs, underscores and surrounding spaces
+        if not (content_length.isascii() and content_length.isdigit()):
+            raise HTTPError(400, f"Invalid Content-Length: {content_length!r}")
+        length = int(content_length)
+        if length > self.max_body_bytes:
+            raise HTTPError(413, f"Request body larger than {self.max_body_bytes} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), urlsplit(target).path, headers, body
+
+    async def _dispatch(self, writer: asyncio.StreamWriter, method: str, path: str, body: bytes, keep_alive: bool) -> None:
+        routes = {
+            "/ask": ("POST", self._ask),
+            "/stream": ("POST", self._stream),
+            "/ingest": ("POST", self._ingest),
+            "/health": ("GET", self._health),
+        }
+        if path not in routes:
+            raise HTTPError(404, f"Unknown path: {path}")
+        route_method, handler = routes[path]
+        if method != route_method:
+            raise HTTPError(405, f"Use {route_method} for {path}")
+        payload = self._parse_json(body)
+        if path in ("/ask", "/stream"):
+            await self._admit(handler, writer, payload, keep_alive)
+        else:
+            await handler(writer, payload, keep_alive)
+
+    async def _admit(self, handler, writer: asyncio.StreamWriter, payload: Dict[str, Any], keep_alive: bool) -> None:
+        """Runs a question handler in a concurrency slot, or rejects it when the queue is full."""
+        if self.in_flight >= self.max_concurrency + self.max_queue:
+            self.metrics.inc("server_rejected_total")
+            await self._send_json(writer, 503, {"error": "Server overloaded, retry later"}, keep_alive, {"Retry-After": "1"})
+            return
+        self.in_flight += 1
+        try:
+            async with self._slots:
+                with self.metrics.span("server_question"):
+                    await handler(writer, payload, keep_alive)
+        finally:
+            self.in_flight -= 1
+
+    async def _ask(self, writer: asyncio.StreamWriter, payload: Dict[str, Any], keep_alive: bool) -> None:
+        question, n_results, filters = self._question(payload)
+        query_embedding = await self.batcher.embed(question)
+        answer = await self.assistant.ainvoke(question, n_results=n_results, query_embedding=query_embedding, filters=filters)
+        await self._send_json(writer, 200, {"answer": answer}, keep_alive)
+
+    async def _stream(self, writer: asyncio.StreamWriter, payload: Dict[str, Any], keep_alive: bool) -> None:
+        question, n_results, filters = self._question(payload)
+        query_embedding = await self.batcher.embed(question)
+        tokens = self.assistant.astream(question, n_results=n_results, query_embedding=query_embedding, filters=filters)
+        # Retrieve before the headers are sent, so errors can still get a status code
+        try:
+            first = await tokens.__anext__()
+        except StopAsyncIteration:
+            first = ""
+        self._write_head(writer, 200, {
+            "Content-Type": "text/plain; charset=utf-8",
+            "Transfer-Encoding": "chunked",
+            "Connection": "keep-alive" if keep_alive else "close",
+        })
+        try:
+            await self._write_chunk(writer, first)
+            async for token in tokens:
+                await self._write_chunk(writer, token)
+        finally:
+            await tokens.aclose()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _ingest(self, writer: asyncio.StreamWriter, payload: Dict[str, Any], keep_alive: bool) -> None:
+        documents = payload.get("documents")
+        if documents is not None and not isinstance(documents, list):
+            raise HTTPError(400, "'documents' must be a list")
+        if not self.start_ingestion(documents, prune=bool(payload.get("prune", False))):
+            raise HTTPError(409, "An ingestion is already running")
+        try:
+            stats = await asyncio.shield(self.ingestion)
+        except ValueError as e:
+            # E.g. a prune of every source with an empty document list
+            raise HTTPError(400, str(e))
+        await self._send_json(writer, 200, stats, keep_alive)
+
+    async def _health(self, writer: asyncio.StreamWriter, payload: Dict[str, Any], keep_alive: bool) -> None:
+        await self._send_json(writer, 200, {
+            "status": "ok",
+            "in_flight": self.in_flight,
+            "ingesting": self.ingestion is not None and not self.ingestion.done(),
+        }, keep_alive)
+
+    @staticmethod
+    def _parse_json(body: bytes) -> Dict[str, Any]:
+        if not body.strip():
+            return {}
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HTTPError(400, "Request body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        return payload
+
+    @staticmethod
+    def _question(payload: Dict[str, Any]) -> Tuple[str, int, Optional[Dict[str, Any]]]:
+        question = payload.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise HTTPError(400, "'question' is required")
+        try:
+            n_results = int(payload.get("n_results", 3))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "'n_results' must be an integer")
+        filters = payload.get("filters")
+        if filters is not None and not isinstance(filters, dict):
+            raise HTTPError(400, "'filters' must be an object")
+        try:
+            filters = normalize_filters(filters)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        return question, max(1, n_results), filters
+
+    @staticmethod
+    def _write_head(writer: asyncio.StreamWriter, status: int, headers: Dict[str, str]) -> None:
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+    async def _send_json(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        payload: Any,
+        keep_alive: bool,
+        extra_headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        headers = {
+            "Content-Type": "application/json",
+            "Content-Length": str(len(body)),
+            "Connection": "keep-alive" if keep_alive else "close",
+        }
+        headers.update(extra_headers or {})
+        self._write_head(writer, status, headers)
+        writer.write(body)
+        # Waits while the client reads slower than the server writes
+        await writer.drain()
+
+    @staticmethod
+    async def _write_chunk(writer: asyncio.StreamWriter, text: str) -> None:
+        data = text.encode("utf-8")
+        if not data:
+            return
+        writer.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+        await writer.drain()
+
+
+async def serve(assistant: RAGAssistant, ingest: bool = True) -> None:
+    """Ingests the ./data/ folder in the background (if ingest is True) and serves the assistant until cancelled."""
+    server = RAGServer(assistant)
+    await server.start()
+    print(f"Serving the RAG assistant on http://{server.host}:{server.port}")
+    if ingest:
+        # Only new or changed documents are embedded, deleted ones are removed
+        server.start_ingestion(prune=True)
+    await server.serve_forever()
+
+
+def main():
+    """
+    Load the RAG assistant once and serve it over HTTP.
+    """
+    os.environ['ANONYMIZED_TELEMETRY'] = 'False'
+    logging.getLogger('chromadb').setLevel(logging.ERROR)
+    load_dotenv()
+
+    print("Initializing RAG Assistant...")
+    assistant = RAGAssistant()
+    # Load the embedding model before the first request, while a snapshot is imported
+    warm_up = assistant.vector_db.warm_up()
+    # A replica starts from a snapshot of the collection instead of ingesting ./data/
+    snapshot = os.getenv("VECTOR_DB_SNAPSHOT", "")
+    if snapshot:
+        stats = assistant.vector_db.import_snapshot(snapshot)
+        print(f"Imported {stats['chunks']} chunks from {snapshot} in {stats['seconds']} s")
+    warm_up.join()
+    try:
+        asyncio.run(serve(assistant, ingest=not snapshot))
+    except KeyboardInterrupt:
+        print("Server stopped")
+
+
+if __name__ == "__main__":
+    main()
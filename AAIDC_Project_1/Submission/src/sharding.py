@@ -0,0 +1,394 @@
+import argparse
+import atexit
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from .logmanager import LogManager
+from .partitioning import PartitionedVectorStore
+from .vectorstore import VectorStore, create_vector_store, merge_query_results
+
+"""
+Sharding Module
+---------------
+Sharded storage for the VectorDB. With VECTOR_DB_SHARDS set above 1, the chunks of a
+collection are hash-partitioned by chunk ID across that many shards. Every shard is a
+worker process with its own store directory (and its own HNSW graph with the chroma
+backend), so writes and queries run on several cores:
+
+- add, delete and update_metadata send every shard only the chunks it owns
+- query sends the query embeddings to every shard in parallel and merges their top-k
+  results by distance with a heap (scatter-gather)
+
+The shard count of a collection is recorded in shards_<collection>.json next to it and
+only changes by rebalancing: the chunks are copied with their embeddings into a new set
+of shards, nothing is embedded again. Until then a different VECTOR_DB_SHARDS only logs
+a warning. Shards talk to the VectorDB through (method, arguments) messages, so other
+transports than local processes can implement the same protocol.
+
+Usage:
+    python -m src.sharding info
+    python -m src.sharding rebalance 8
+"""
+
+SHARD_LAYOUT_VERSION = 1
+
+
+def shard_of(chunk_id: str, shards: int) -> int:
+    """Returns the shard of a chunk: a stable hash of its ID modulo the shard count."""
+    digest = hashlib.blake2b(chunk_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % shards
+
+
+def shard_directory(persist_directory: str, collection_name: str, shard: int, shards: int) -> str:
+    """Returns the store directory of a shard; every shard count uses its own directories."""
+    return os.path.join(persist_directory, f"shards_{collection_name}", f"shard_{shard:03d}_of_{shards:03d}")
+
+
+def layout_path(persist_directory: str, collection_name: str) -> str:
+    """Returns the path of the file recording the shard count of a collection."""
+    return os.path.join(persist_directory, f"shards_{collection_name}.json")
+
+
+def read_shard_count(persist_directory: str, collection_name: str) -> Optional[int]:
+    """Returns the recorded shard count of a collection, or None if it was never sharded."""
+    path = layout_path(persist_directory, collection_name)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as file:
+        return int(json.load(file)["shards"])
+
+
+def write_shard_count(persist_directory: str, collection_name: str, shards: int) -> None:
+    """Records the shard count of a collection atomically; a count of 1 removes the record."""
+    path = layout_path(persist_directory, collection_name)
+    if shards <= 1:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    os.makedirs(persist_directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump({"version": SHARD_LAYOUT_VERSION, "shards": shards}, file)
+    os.replace(tmp_path, path)
+
+
+def create_store(backend: str, directory: str, collection_name: str, partition_by: str = "none") -> VectorStore:
+    """
+    Creates the vector store of an unsharded collection or of one shard.
+
+    Args:
+        backend: 'chroma' or 'flat'
+        directory: Directory of the store
+        collection_name: Name of the collection
+        partition_by: 'none', or the partitioning of the sub-collections (see PARTITION_MODES)
+
+    Returns:
+        The vector store
+    """
+    if partition_by == "none":
+        return create_vector_store(backend, directory, collection_name)
+    return PartitionedVectorStore(
+        lambda slug: create_vector_store(backend, directory, f"{collection_name}__{slug}"),
+        os.path.join(directory, f"partitions_{collection_name}.json"),
+        partition_by,
+    )
+
+
+def _shard_worker(shard: int, backend: str, directory: str, collection_name: str, partition_by: str, requests, results) -> None:
+    """Worker process: runs (job, method, args, kwargs) requests on the store of one shard until it gets None."""
+    logging.getLogger('chromadb').setLevel(logging.ERROR)
+    try:
+        store = create_store(backend, directory, collection_name, partition_by)
+    except Exception as e:
+        results.put((None, shard, False, f"Opening shard {shard} failed: {str(e)}"))
+        return
+    results.put((None, shard, True, None))
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        job, method, args, kwargs = request
+        try:
+            if method in ("query", "query_partitions") and store.count() == 0:
+                result = None
+            else:
+                attribute = getattr(store, method)
+                result = attribute(*args, **kwargs) if callable(attribute) else attribute
+            results.put((job, shard, True, result))
+        except Exception as e:
+            results.put((job, shard, False, f"{type(e).__name__}: {str(e)}"))
+    store.flush()
+
+
+class ShardedVectorStore(VectorStore):
+    """
+    Vector store made of shard worker processes. Chunks are routed by the hash of their ID;
+    queries are sent to every shard and their hits merged by distance. The workers start
+    on first use.
+    """
+
+    def __init__(self, backend: str, persist_directory: str, collection_name: str, shards: int, partition_by: str = "none"):
+        """
+        Initialize the store.
+
+        Args:
+            backend: Vector store backend of the shards ('chroma' or 'flat')
+            persist_directory: Root directory of the persistent data
+            collection_name: Name of the collection
+            shards: Number of shards
+            partition_by: Partitioning of the sub-collections within every shard
+        """
+        if shards < 2:
+            raise ValueError(f"A sharded store needs at least 2 shards, got {shards}")
+        self.log = LogManager()
+        self.log.add_logfile("vectordb")
+        self.backend = backend
+        self.collection_name = collection_name
+        self.shards = shards
+        self.partition_by = partition_by
+        self.directories = [shard_directory(persist_directory, collection_name, shard, shards) for shard in range(shards)]
+        self._context = multiprocessing.get_context("spawn")
+        self._processes = []
+        self._requests = []
+        self._results = None
+        self._collector = None
+        self._jobs: Dict[int, Tuple[Dict[int, Any], threading.Event, int]] = {}
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+
+    @property
+    def max_batch_size(self) -> Optional[int]:
+        sizes = [size for size in self._call_all("max_batch_size").values() if size]
+        return min(sizes) if sizes else None
+
+    def add(self, ids, embeddings, documents, metadatas) -> None:
+        self._call({
+            shard: ("add", ([ids[row] for row in rows], [embeddings[row] for row in rows], [documents[row] for row in rows], [metadatas[row] for row in rows]), {})
+            for shard, rows in self._route(ids).items()
+        })
+
+    def delete(self, ids) -> None:
+        self._call({shard: ("delete", ([ids[row] for row in rows],), {}) for shard, rows in self._route(ids).items()})
+
+    def update_metadata(self, ids, metadatas) -> None:
+        self._call({
+            shard: ("update_metadata", ([ids[row] for row in rows], [metadatas[row] for row in rows]), {})
+            for shard, rows in self._route(ids).items()
+        })
+
+    def query(self, query_embeddings, n_results=5, where=None, include_embeddings=False) -> Dict[str, List]:
+        partial = self._call_all(
+            "query", query_embeddings=query_embeddings, n_results=n_results, where=where, include_embeddings=include_embeddings
+        )
+        return merge_query_results(
+            [results for results in partial.values() if results is not None], len(query_embeddings), n_results, include_embeddings
+        )
+
+    def query_partitions(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int,
+        scopes: Dict[str, Optional[Dict]],
+        include_embeddings: bool = False,
+    ) -> Dict[str, List]:
+        """
+        Searches the given partitions of every shard and merges their nearest chunks by distance
+        (see PartitionedVectorStore.query_partitions).
+        """
+        partial = self._call_all("query_partitions", query_embeddings, n_results, scopes, include_embeddings=include_embeddings)
+        return merge_query_results(
+            [results for results in partial.values() if results is not None], len(query_embeddings), n_results, include_embeddings
+        )
+
+    def get(self, ids=None, include=None, limit=None, offset=0) -> Dict[str, List]:
+        include = ["documents", "metadatas"] if include is None else include
+        keys = ["ids"] + [key for key in ("documents", "metadatas", "embeddings") if key in include]
+        if ids is not None:
+            calls = {
+                shard: ("get", (), {"ids": [ids[row] for row in rows], "include": include})
+                for shard, rows in self._route(ids).items()
+            }
+        else:
+            # Pages run over the shards in order
+            calls = {}
+            remaining = limit
+            for shard, count in sorted(self._call_all("count").items()):
+                if remaining is not None and remaining <= 0:
+                    break
+                if offset >= count:
+                    offset -= count
+                    continue
+                calls[shard] = ("get", (), {"include": include, "limit": remaining, "offset": offset})
+                if remaining is not None:
+                    remaining -= min(remaining, count - offset)
+                offset = 0
+        merged = {key: [] for key in keys}
+        for _, results in sorted(self._call(calls).items()):
+            for key in keys:
+                merged[key].extend(results[key])
+        return merged
+
+    def count(self) -> int:
+        return sum(self._call_all("count").values())
+
+    def shard_counts(self) -> List[int]:
+        """Returns the number of chunks of every shard."""
+        counts = self._call_all("count")
+        return [counts[shard] for shard in range(self.shards)]
+
+    def flush(self) -> None:
+        self._call_all("flush")
+
+    def clear(self) -> None:
+        self._call_all("clear")
+
+    def close(self) -> None:
+        """Stops the shard workers; every shard flushes its store first."""
+        with self._start_lock:
+            if not self._processes:
+                return
+            for requests in self._requests:
+                requests.put(None)
+            for process in self._processes:
+                process.join(timeout=60)
+                if process.is_alive():
+                    process.terminate()
+            self._processes = []
+            self._results.put((None, None, False, "closed"))
+            self._collector.join(timeout=10)
+
+    def destroy(self) -> None:
+        """Stops the shard workers and deletes the directories of every shard."""
+        self.close()
+        for directory in self.directories:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _route(self, ids: List[str]) -> Dict[int, List[int]]:
+        """Groups the rows of the given chunk IDs by their shard."""
+        groups: Dict[int, List[int]] = {}
+        for row, chunk_id in enumerate(ids):
+            groups.setdefault(shard_of(chunk_id, self.shards), []).append(row)
+        return groups
+
+    def _call_all(self, method: str, *args, **kwargs) -> Dict[int, Any]:
+        """Runs a store method on every shard in parallel."""
+        return self._call({shard: (method, args, kwargs) for shard in range(self.shards)})
+
+    def _call(self, calls: Dict[int, Tuple[str, tuple, Dict[str, Any]]]) -> Dict[int, Any]:
+        """
+        Sends (method, args, kwargs) calls to their shards and waits for all of them.
+
+        Returns:
+            Dictionary of shard -> return value of its call
+        """
+        if not calls:
+            return {}
+        self._start()
+        results: Dict[int, Any] = {}
+        done = threading.Event()
+        with self._lock:
+            job = next(self._job_ids)
+            self._jobs[job] = (results, done, len(calls))
+        for shard, (method, args, kwargs) in calls.items():
+            self._requests[shard].put((job, method, args, kwargs))
+        while not done.wait(timeout=1.0):
+            if not all(process.is_alive() for process in self._processes):
+                with self._lock:
+                    self._jobs.pop(job, None)
+                raise RuntimeError("A shard worker process died")
+        with self._lock:
+            self._jobs.pop(job, None)
+        errors = [f"shard {shard}: {error}" for shard, (ok, error) in sorted(results.items()) if not ok]
+        if errors:
+            raise RuntimeError(f"Shard call {calls[next(iter(calls))][0]} failed: {'; '.join(errors)}")
+        return {shard: value for shard, (_, value) in results.items()}
+
+    def _start(self) -> None:
+        """Starts the shard workers and waits until every shard has opened its store."""
+        if self._processes:
+            return
+        with self._start_lock:
+            if self._processes:
+                return
+            self.log.write_log("vectordb", logging.INFO, f"Starting {self.shards} shard workers of {self.collection_name} ({self.backend} backend)")
+            self._results = self._context.Queue()
+            requests = [self._context.Queue() for _ in range(self.shards)]
+            processes = [
+                self._context.Process(
+                    target=_shard_worker,
+                    args=(shard, self.backend, self.directories[shard], self.collection_name, self.partition_by, requests[shard], self._results),
+                    name=f"shard-worker-{shard}",
+                    daemon=True,
+                )
+                for shard in range(self.shards)
+            ]
+            for process in processes:
+                process.start()
+            errors = []
+            for _ in processes:
+                _, _, ok, error = self._results.get()
+                if not ok:
+                    errors.append(error)
+            if errors:
+                for process in processes:
+                    process.terminate()
+                raise RuntimeError("; ".join(errors))
+            self._requests = requests
+            self._collector = threading.Thread(target=self._collect, name="shard-collector", daemon=True)
+            self._collector.start()
+            self._processes = processes
+            atexit.register(self.close)
+            self.log.write_log("vectordb", logging.INFO, "Shard workers ready")
+
+    def _collect(self) -> None:
+        """Routes the results of the shard workers to the waiting calls."""
+        while True:
+            job, shard, ok, result = self._results.get()
+            if job is None:
+                break
+            with self._lock:
+                entry = self._jobs.get(job)
+            if entry is None:
+                continue
+            results, done, expected = entry
+            results[shard] = (ok, result)
+            if len(results) == expected:
+                done.set()
+
+
+def main():
+    """
+    Show the shards of the configured collection, or rebalance it to another shard count.
+    """
+    from dotenv import load_dotenv
+    from .vectordb import VectorDB
+
+    parser = argparse.ArgumentParser(description="Show or change the sharding of the vector database")
+    parser.add_argument("command", choices=["info", "rebalance"], help="What to do")
+    parser.add_argument("shards", type=int, nargs="?", default=0, help="New shard count (rebalance)")
+    args = parser.parse_args()
+
+    os.environ['ANONYMIZED_TELEMETRY'] = 'False'
+    logging.getLogger('chromadb').setLevel(logging.ERROR)
+    load_dotenv()
+
+    vector_db = VectorDB()
+    if args.command == "info":
+        counts = vector_db.store.shard_counts() if vector_db.shards > 1 else [vector_db.store.count()]
+        print(json.dumps({"collection": vector_db.collection_name, "shards": vector_db.shards, "chunks": counts}, indent=2))
+        return
+    if args.shards < 1:
+        parser.error("rebalance needs the new shard count")
+    stats = vector_db.rebalance_shards(args.shards)
+    print(f"Rebalanced {stats['chunks']} chunks from {stats['previous_shards']} to {stats['shards']} shards in {stats['seconds']} s")
+
+
+if __name__ == "__main__":
+    main()
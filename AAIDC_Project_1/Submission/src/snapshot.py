@@ -0,0 +1,244 @@
+import argparse
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+"""
+Snapshot Module
+---------------
+Portable, single-file snapshots of a VectorDB collection, so a new replica can start
+serving from a file instead of re-embedding the corpus.
+
+File layout (little-endian):
+
+    magic      8 bytes   b"RAGSNAP\\0"
+    version    uint32
+    header     uint32 length + JSON: chunk count, embedding dimension, size of the
+               records block, creation time and the ingestion settings (embedding
+               model, chunking parameters, deduplication)
+    padding    up to the next multiple of 64 bytes
+    embeddings count x dimension float32, contiguous, memory-mapped on import
+    records    zlib-compressed JSON: chunk IDs, texts and metadata, the ingestion
+               manifest and the deduplication index
+
+A snapshot is only imported by a database with the same ingestion settings, and never
+by one using a different embedding model.
+
+Usage:
+    python -m src.snapshot export ./snapshots/rag_documents.snap
+    python -m src.snapshot import ./snapshots/rag_documents.snap
+    python -m src.snapshot info ./snapshots/rag_documents.snap
+"""
+
+SNAPSHOT_MAGIC = b"RAGSNAP\0"
+SNAPSHOT_VERSION = 1
+ALIGNMENT = 64
+
+# Manifest settings a snapshot must share with the importing database; the backend,
+# partitioning, chunk storage and HNSW settings are local to every replica
+SNAPSHOT_CONFIG_KEYS = ("embedding_model", "chunk_size", "chunk_overlap", "deduplication", "dedup_threshold")
+
+_PREAMBLE = struct.Struct("<8sII")
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class SnapshotWriter:
+    """
+    Writes a snapshot: the embeddings are streamed to a temporary file page by page,
+    the final file is assembled and moved into place atomically by close().
+    """
+
+    def __init__(self, path: str, config: Dict[str, Any], collection: str = ""):
+        """
+        Initialize the writer.
+
+        Args:
+            path: Path of the snapshot file
+            config: Ingestion settings of the exported database (see SNAPSHOT_CONFIG_KEYS)
+            collection: Name of the exported collection
+        """
+        self.path = path
+        self.config = config
+        self.collection = collection
+        self.dimension = 0
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict] = []
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._embeddings_path = f"{path}.embeddings.tmp"
+        self._embeddings_file = open(self._embeddings_path, "wb")
+
+    def add(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]) -> None:
+        """Appends a page of chunks."""
+        if not ids:
+            return
+        matrix = np.asarray(embeddings, dtype="<f4").reshape(len(ids), -1)
+        if self.dimension and matrix.shape[1] != self.dimension:
+            raise ValueError(f"Embedding dimension changed from {self.dimension} to {matrix.shape[1]}")
+        self.dimension = matrix.shape[1]
+        self._embeddings_file.write(np.ascontiguousarray(matrix).tobytes())
+        self.ids.extend(ids)
+        self.documents.extend(documents)
+        self.metadatas.extend(metadatas)
+
+    def close(self, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Writes the snapshot file.
+
+        Args:
+            state: Additional JSON state stored with the records (manifest, deduplication index)
+
+        Returns:
+            The header of the written snapshot
+        """
+        self._embeddings_file.close()
+        records = zlib.compress(
+            json.dumps(
+                {"ids": self.ids, "documents": self.documents, "metadatas": self.metadatas, "state": state or {}}
+            ).encode("utf-8"),
+            level=6,
+        )
+        header = {
+            "collection": self.collection,
+            "created": time.time(),
+            "count": len(self.ids),
+            "dimension": self.dimension,
+            "dtype": "float32",
+            "records_length": len(records),
+            "config": self.config,
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+        embeddings_offset = _aligned(_PREAMBLE.size + len(header_bytes))
+
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "wb") as file:
+                file.write(_PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header_bytes)))
+                file.write(header_bytes)
+                file.write(b"\0" * (embeddings_offset - _PREAMBLE.size - len(header_bytes)))
+                with open(self._embeddings_path, "rb") as embeddings:
+                    while True:
+                        block = embeddings.read(1 << 20)
+                        if not block:
+                            break
+                        file.write(block)
+                file.write(records)
+            os.replace(tmp_path, self.path)
+        finally:
+            os.remove(self._embeddings_path)
+        return header
+
+
+class Snapshot:
+    """
+    A snapshot file opened for reading: the header is parsed eagerly, the embeddings are
+    memory-mapped and the records are only decompressed by read_records().
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a snapshot file.
+
+        Args:
+            path: Path of the snapshot file
+
+        Raises:
+            ValueError: If the file is not a snapshot, of an unsupported version or truncated
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            preamble = file.read(_PREAMBLE.size)
+            if len(preamble) < _PREAMBLE.size:
+                raise ValueError(f"Not a snapshot file: {path}")
+            magic, version, header_length = _PREAMBLE.unpack(preamble)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"Not a snapshot file: {path}")
+            if version != SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported snapshot version {version} (supported: {SNAPSHOT_VERSION})")
+            self.header: Dict[str, Any] = json.loads(file.read(header_length).decode("utf-8"))
+        self.count = int(self.header["count"])
+        self.dimension = int(self.header["dimension"])
+        self.config: Dict[str, Any] = self.header.get("config", {})
+        self.embeddings_offset = _aligned(_PREAMBLE.size + header_length)
+        self.records_offset = self.embeddings_offset + self.count * self.dimension * 4
+        expected_size = self.records_offset + int(self.header["records_length"])
+        if os.path.getsize(path) != expected_size:
+            raise ValueError(f"Snapshot file is truncated or corrupt: {path}")
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """The embeddings as a read-only, memory-mapped (count, dimension) float32 array."""
+        if self.count == 0:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.memmap(self.path, dtype="<f4", mode="r", offset=self.embeddings_offset, shape=(self.count, self.dimension))
+
+    def read_records(self) -> Dict[str, Any]:
+        """Returns the 'ids', 'documents', 'metadatas' and 'state' of the snapshot."""
+        with open(self.path, "rb") as file:
+            file.seek(self.records_offset)
+            return json.loads(zlib.decompress(file.read(int(self.header["records_length"]))).decode("utf-8"))
+
+    def check_compatible(self, config: Dict[str, Any]) -> None:
+        """
+        Checks that the snapshot can be imported by a database with the given ingestion settings.
+
+        Args:
+            config: Ingestion settings of the importing database (see SNAPSHOT_CONFIG_KEYS)
+
+        Raises:
+            ValueError: If the embedding model or another setting differs
+        """
+        if self.config.get("embedding_model") != config.get("embedding_model"):
+            raise ValueError(
+                f"The snapshot was made with the embedding model {self.config.get('embedding_model')}, "
+                f"this database uses {config.get('embedding_model')}"
+            )
+        differences = [
+            f"{key}: {self.config.get(key)} (this database: {config.get(key)})"
+            for key in SNAPSHOT_CONFIG_KEYS
+            if self.config.get(key) != config.get(key)
+        ]
+        if differences:
+            raise ValueError(f"The snapshot was made with different ingestion settings: {', '.join(differences)}")
+
+
+def main():
+    """
+    Export the configured collection to a snapshot file, import one, or show its header.
+    """
+    from dotenv import load_dotenv
+    from .vectordb import VectorDB
+
+    parser = argparse.ArgumentParser(description="Export or import a portable snapshot of the vector database")
+    parser.add_argument("command", choices=["export", "import", "info"], help="What to do with the snapshot file")
+    parser.add_argument("path", help="Path of the snapshot file")
+    args = parser.parse_args()
+
+    os.environ['ANONYMIZED_TELEMETRY'] = 'False'
+    logging.getLogger('chromadb').setLevel(logging.ERROR)
+    load_dotenv()
+
+    if args.command == "info":
+        print(json.dumps(Snapshot(args.path).header, indent=2))
+        return
+    vector_db = VectorDB()
+    if args.command == "export":
+        header = vector_db.export_snapshot(args.path)
+        print(f"Exported {header['count']} chunks to {args.path}")
+    else:
+        stats = vector_db.import_snapshot(args.path)
+        print(f"Imported {stats['chunks']} chunks of {stats['sources']} sources in {stats['seconds']} s")
+
+
+if __name__ == "__main__":
+    main()
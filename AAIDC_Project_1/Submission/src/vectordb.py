@@ -1,17 +1,30 @@
 import logging
 import os
-import chromadb
-from chromadb.config import Settings
-from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
+import threading
+import time
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
 from .logmanager import LogManager
-import logging
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from .ingestionmanifest import IngestionManifest, content_hash, make_chunk_id
+from .ingestionpipeline import IngestionPipeline
+from .embeddingcache import EmbeddingCache
+from .embeddingengine import create_embedding_engine
+from .querycache import LRUCache, embedding_key
+from .bm25index import BM25Index
+from .vectorstore import HNSW_BUILD_KEYS, VectorStore, hnsw_settings
+from .chunking import CHUNK_RECORD_VERSION, RECORD_METADATA_KEYS, ChunkRecord, ChunkTextResolver, chunk_records, source_stamp, split_text
+from .deduplicator import DEDUPLICATION_MODES, ChunkDeduplicator
+from .partitioning import PARTITION_MODES, MetadataIndex, document_tags, filter_key, normalize_filters, partition_of
+from .sharding import ShardedVectorStore, create_store, read_shard_count, write_shard_count
+from .metrics import SIZE_BUCKETS, get_metrics
+from .snapshot import SNAPSHOT_CONFIG_KEYS, Snapshot, SnapshotWriter
+import copy
+import heapq
+import numpy as np
 
 
 class VectorDB:
     """
-    A simple vector database wrapper using ChromaDB with HuggingFace embeddings.
+    A simple vector database wrapper using ChromaDB (or a memory-mapped NumPy index) with HuggingFace embeddings.
     """
 
     def __init__(self, collection_name: str = "", embedding_model: str = ""):
@@ -25,6 +38,7 @@ class VectorDB:
         self.log = LogManager()
         self.log.add_logfile("vectordb")
         self.log.write_log("vectordb", logging.INFO, "VectorDB initialized")
+        self.metrics = get_metrics()
         self.collection_name = collection_name or os.getenv(
             "CHROMA_COLLECTION_NAME", "rag_documents"
         )
@@ -32,23 +46,140 @@ class VectorDB:
             "EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
         )
 
-        # Initialize ChromaDB client with telemetry disabled
-        settings = Settings(
-            anonymized_telemetry=False
+        self.persist_directory = os.getenv("VECTOR_DB_PATH", "./chroma_db")
+
+        # Embedding engine (EMBEDDING_ENGINE / EMBEDDING_RUNTIME), loaded on first use or by warm_up()
+        self.embedding_engine = create_embedding_engine(self.embedding_model_name)
+
+        # Persistent embedding cache keyed by model fingerprint and chunk text hash
+        self.embedding_cache = EmbeddingCache(self.embedding_engine.fingerprint)
+
+        # In-memory caches of the query path, invalidated whenever the collection changes
+        query_cache_size = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+        self.generation = 0
+        self.query_embedding_cache = LRUCache(query_cache_size)
+        self.retrieval_cache = LRUCache(query_cache_size)
+
+        # Storage backend: ChromaDB collection or exact-search memory-mapped NumPy index,
+        # optionally split into one sub-collection per tenant, source folder or source
+        self.backend = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+        self.partition_by = os.getenv("PARTITION_BY", "none")
+        if self.partition_by not in PARTITION_MODES:
+            raise ValueError(f"Unknown partitioning: {self.partition_by}. Use one of: {', '.join(PARTITION_MODES)}")
+
+        # Sharding: the chunks are spread over VECTOR_DB_SHARDS worker processes. An existing
+        # collection keeps its shard count until it is rebalanced (see src/sharding.py)
+        self.shards = int(os.getenv("VECTOR_DB_SHARDS", "1"))
+        if self.shards < 1:
+            raise ValueError(f"VECTOR_DB_SHARDS must be at least 1, got {self.shards}")
+        stored_shards = read_shard_count(self.persist_directory, self.collection_name)
+        if stored_shards is None and os.path.exists(os.path.join(self.persist_directory, f"ingestion_manifest_{self.collection_name}.json")):
+            stored_shards = 1
+        if stored_shards is not None and stored_shards != self.shards:
+            self.log.write_log(
+                "vectordb", logging.WARNING,
+                f"Collection {self.collection_name} has {stored_shards} shards, VECTOR_DB_SHARDS={self.shards} applies "
+                f"after: python -m src.sharding rebalance {self.shards}",
+            )
+            self.shards = stored_shards
+        self.store = self._open_store(self.shards)
+        if stored_shards is None:
+            write_shard_count(self.persist_directory, self.collection_name, self.shards)
+
+        # Chunking parameters used during ingestion
+        self.chunk_size = 250
+        self.chunk_overlap = 100
+
+        # Chunk text storage: 'inline' stores the text of every chunk in the vector store,
+        # 'offsets' only its byte offsets in the source file, read back for the returned hits
+        self.chunk_storage = os.getenv("CHUNK_STORAGE", "inline")
+        if self.chunk_storage not in ("inline", "offsets"):
+            raise ValueError(f"Unknown chunk storage: {self.chunk_storage}. Use 'inline' or 'offsets'")
+        self.text_resolver = ChunkTextResolver()
+
+        # Ingestion-time deduplication: 'exact' or 'near' duplicate chunks are linked to
+        # one stored canonical chunk instead of being embedded again
+        self.deduplication = os.getenv("DEDUPLICATION", "none")
+        if self.deduplication not in DEDUPLICATION_MODES:
+            raise ValueError(f"Unknown deduplication: {self.deduplication}. Use one of: {', '.join(DEDUPLICATION_MODES)}")
+        self.dedup_threshold = float(os.getenv("DEDUP_THRESHOLD", "0.7"))
+
+        # Ingestion manifest: content hashes and chunk IDs of every ingested source
+        manifest_config = {
+            "embedding_model": self.embedding_engine.fingerprint,
+            "backend": self.backend,
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+        }
+        if self.chunk_storage != "inline":
+            manifest_config["chunk_storage"] = self.chunk_storage
+            manifest_config["chunk_record_version"] = CHUNK_RECORD_VERSION
+        if self.partition_by != "none":
+            manifest_config["partition_by"] = self.partition_by
+        if self.deduplication != "none":
+            manifest_config["deduplication"] = self.deduplication
+            if self.deduplication == "near":
+                manifest_config["dedup_threshold"] = self.dedup_threshold
+        if self.backend == "chroma":
+            # A changed HNSW build setting rebuilds the collection; search_ef applies in place
+            hnsw_build = {key: value for key, value in hnsw_settings().items() if key in HNSW_BUILD_KEYS}
+            if hnsw_build:
+                manifest_config["hnsw"] = hnsw_build
+        self.manifest = IngestionManifest(
+            os.path.join(self.persist_directory, f"ingestion_manifest_{self.collection_name}.json"),
+            config=manifest_config,
         )
-        self.client = chromadb.PersistentClient(path="./chroma_db", settings=settings)
 
-        # Load embedding model
-        self.log.write_log("vectordb", logging.INFO, f"Loading embedding model: {self.embedding_model_name}")
-        self.embedding_model = SentenceTransformer(self.embedding_model_name)
+        # Lexical BM25 index kept next to the collection, used by the hybrid retrieval mode
+        self.retrieval_mode = os.getenv("RETRIEVAL_MODE", "dense")
+        self.lexical_index = BM25Index(
+            os.path.join(self.persist_directory, f"bm25_{self.collection_name}.json")
+        )
 
-        # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name=self.collection_name,
-            metadata={"description": "RAG document collection"},
+        # Document-level metadata of every source, used to resolve search filters
+        self.metadata_index = MetadataIndex(
+            os.path.join(self.persist_directory, f"metadata_index_{self.collection_name}.json")
         )
 
-        self.log.write_log("vectordb", logging.INFO, f"Vector database initialized with collection: {self.collection_name}")
+        # Links of duplicate chunks to their canonical chunks, kept next to the collection
+        self.deduplicator = None
+        if self.deduplication != "none":
+            self.deduplicator = ChunkDeduplicator(
+                os.path.join(self.persist_directory, f"dedup_index_{self.collection_name}.json"),
+                self.deduplication,
+                self.dedup_threshold,
+            )
+
+        if (
+            self.manifest.config_changed
+            or (not self.manifest.exists and self.store.count() > 0)
+            or (self.deduplicator is not None and not self.deduplicator.exists and self.manifest.files)
+        ):
+            self._reset_collection()
+        else:
+            if len(self.lexical_index) != self.store.count():
+                self._rebuild_lexical_index()
+            if not self.metadata_index.exists and self.manifest.files:
+                self._rebuild_metadata_index()
+
+        self.log.write_log("vectordb", logging.INFO, f"Vector database initialized with collection: {self.collection_name} ({self.backend} backend)")
+
+    def warm_up(self, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Load the embedding model ahead of the first query.
+
+        Args:
+            background: If True, load it in a background thread and return immediately
+
+        Returns:
+            The background thread, or None if the model was loaded in the calling thread
+        """
+        if not background:
+            self.embedding_engine.warm_up()
+            return None
+        thread = threading.Thread(target=self.embedding_engine.warm_up, name="embedding-warm-up", daemon=True)
+        thread.start()
+        return thread
 
     def chunk_text(self, text: str, chunk_size: int = 1000) -> List[str]:
         """
@@ -63,106 +194,838 @@ class VectorDB:
         Returns:
             List of text chunks
         """
-        # Use LangChain's RecursiveCharacterTextSplitter for intelligent chunking
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,          # ~200-250 words per chunk
-            chunk_overlap=100,              # Overlap to preserve context between chunks
-            separators=["\n\n", "\n", ". ", " ", ""],  # Try to split on these in order
-            length_function=len,
-        )
-        
-        chunks = text_splitter.split_text(text)
-        
-        return chunks
+        # LangChain's RecursiveCharacterTextSplitter, shared with the document loader workers
+        return split_text(text, chunk_size, self.chunk_overlap)
 
-    def add_documents(self, documents: List) -> None:
+    def add_documents(
+        self,
+        documents: Iterable,
+        prune: bool = False,
+        batch_size: int = 0,
+        keep_sources: Optional[Iterable[str]] = None,
+        allow_empty_prune: bool = False,
+    ) -> Dict[str, Any]:
         """
         Add documents to the vector database.
 
+        Only new or changed documents are chunked and embedded. Every document is identified
+        by its 'source' metadata, and its content hash is compared against the ingestion
+        manifest. Chunk IDs are derived from the source and the chunk text, so they stay
+        stable when other documents are added or removed.
+
+        Documents are streamed through the ingestion pipeline in fixed-size batches, so a
+        generator of documents can be ingested with bounded memory.
+
         Args:
-            documents: List of documents
-        """
-        # TODO: Implement document ingestion logic
-        # HINT: Loop through each document in the documents list
-        # HINT: Extract 'content' and 'metadata' from each document dict
-        # HINT: Use self.chunk_text() to split each document into chunks
-        # HINT: Create unique IDs for each chunk (e.g., "doc_0_chunk_0")
-        # HINT: Use self.embedding_model.encode() to create embeddings for all chunks
-        # HINT: Store the embeddings, documents, metadata, and IDs in your vector database
-        # HINT: Print progress messages to inform the user
-
-        self.log.write_log("vectordb", logging.INFO, f"Processing {len(documents)} documents...")
-        
-        all_chunks = []
-        all_ids = []
-        all_metadatas = []
-        
-        for doc_idx, doc in enumerate(documents):
-            # Handle both string documents and dict documents
-            if isinstance(doc, str):
-                content = doc
-                metadata = {"source": f"document_{doc_idx}"}
+            documents: List or generator of documents (strings or dicts with 'content' and 'metadata',
+                       and optionally the 'chunks' created by the loader with 'chunk_params' and
+                       the 'content_hash')
+            prune: If True, documents is the complete corpus and chunks of sources
+                   that are not part of it are deleted
+            batch_size: Number of chunks encoded and written together (default: INGEST_BATCH_SIZE)
+            keep_sources: Sources never pruned, e.g. DocumentLoader.failed_paths
+            allow_empty_prune: If True, an empty documents prunes every source; otherwise
+                               pruning with no documents raises a ValueError
+
+        Returns:
+            Dictionary with ingestion statistics
+        """
+        batch_size = batch_size or int(os.getenv("INGEST_BATCH_SIZE", "64"))
+        max_batch_size = self.store.max_batch_size
+        if max_batch_size:
+            batch_size = min(batch_size, max_batch_size)
+
+        self.log.write_log("vectordb", logging.INFO, f"Ingesting documents with batch size {batch_size}...")
+        pipeline = IngestionPipeline(self, batch_size=batch_size)
+        with self.metrics.span("vectordb_add_documents"):
+            stats = pipeline.run(documents, prune=prune, keep_sources=keep_sources, allow_empty_prune=allow_empty_prune)
+        self.metrics.inc("vectordb_documents_total", stats["documents"])
+        self.metrics.inc("vectordb_documents_skipped_total", stats["skipped_documents"])
+        if stats["chunks_embedded"] or stats["chunks_deleted"] or stats["skipped_documents"] < stats["documents"]:
+            self.invalidate_caches()
+        self.log.write_log("vectordb", logging.INFO, "Documents added to vector database")
+        return stats
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Create embeddings for the texts, reusing cached embeddings where possible.
+
+        Args:
+            texts: Texts to embed
+            batch_size: Batch size of the embedding model
+
+        Returns:
+            2D array of embeddings
+        """
+        return self.embedding_cache.encode(
+            texts, lambda missing: self.embedding_engine.encode(missing, batch_size=batch_size)
+        )
+
+    def prepare_document(self, doc_idx: int, doc) -> Dict[str, Any]:
+        """
+        Compare a document against the ingestion manifest and chunk it if it changed.
+
+        Args:
+            doc_idx: Position of the document in the input, used for documents without a source
+            doc: A string or a dict with 'content' and 'metadata'
+
+        Returns:
+            Dictionary with the 'source', whether it is 'unchanged', the new 'chunks' as
+            (id, text, metadata) tuples, the 'moved_ids' / 'moved_metadatas' of kept chunks
+            whose position changed, the 'stale_ids' to delete, the 'duplicate_ids' of new
+            chunks linked to a canonical chunk instead of being stored, and the manifest
+            'entry' to commit with commit_document() once the chunks are written
+        """
+        # Handle both string documents and dict documents
+        if isinstance(doc, str):
+            content = doc
+            metadata = {"source": f"document_{doc_idx}"}
+        else:
+            content = doc.get('content', str(doc))
+            metadata = doc.get('metadata', {"source": f"document_{doc_idx}"})
+
+        source = metadata.get("source", f"document_{doc_idx}")
+        if isinstance(metadata.get("tags"), (list, tuple, set)):
+            # Vector stores only keep scalar metadata
+            metadata = dict(metadata, tags=",".join(document_tags(metadata)))
+        prepared = {
+            "source": source,
+            "unchanged": False,
+            "chunks": [],
+            "moved_ids": [],
+            "moved_metadatas": [],
+            "stale_ids": [],
+            "duplicate_ids": [],
+        }
+        # Hashed by the loader workers when they chunk the documents
+        file_hash = doc.get("content_hash") if not isinstance(doc, str) else None
+        file_hash = file_hash or content_hash(content)
+        if self.manifest.is_current(source, file_hash):
+            prepared["unchanged"] = True
+            return prepared
+
+        # Split document into chunks, unless the loader already did with the same parameters
+        if not isinstance(doc, str) and doc.get("chunks") is not None and doc.get("chunk_params") == [self.chunk_size, self.chunk_overlap]:
+            chunks = doc["chunks"]
+        else:
+            chunks = self.chunk_text(content, chunk_size=self.chunk_size)
+
+        # Offsets of the chunks in the source file, if its bytes are exactly the loaded content
+        records = None
+        if self.chunk_storage == "offsets":
+            stamp = source_stamp(source, content)
+            if stamp is not None:
+                records = chunk_records(content, source, chunks, stamp)
+
+        # Create content-derived IDs and metadata for each chunk
+        old_ids = set(self.manifest.chunk_ids(source))
+        doc_ids = []
+        entries = []
+        occurrences = {}
+        for chunk_idx, chunk in enumerate(chunks):
+            occurrence = occurrences.get(chunk, 0)
+            occurrences[chunk] = occurrence + 1
+            chunk_id = make_chunk_id(source, chunk, occurrence)
+            doc_ids.append(chunk_id)
+            chunk_metadata = metadata.copy()
+            chunk_metadata['chunk_index'] = str(chunk_idx)  # Convert to string for ChromaDB
+            if records is not None:
+                chunk_metadata.update(records[chunk_idx].to_metadata())
+            entries.append((chunk_id, chunk, chunk_metadata))
+
+        prepared["stale_ids"] = list(old_ids.difference(doc_ids))
+        if self.deduplicator is not None:
+            # Unlink deleted chunks before linking new ones; kept duplicates of a deleted
+            # canonical chunk of this document are new again
+            prepared["stale_ids"] = self.forget_chunks(prepared["stale_ids"])
+            old_ids = set(self.manifest.chunk_ids(source))
+            scope = f"{metadata.get('tenant') or ''}|{partition_of(metadata, self.partition_by)}"
+
+        for chunk_id, chunk, chunk_metadata in entries:
+            if self.deduplicator is not None:
+                if chunk_id in old_ids and self.deduplicator.is_duplicate(chunk_id):
+                    continue
+                if self.deduplicator.deduplicate(chunk_id, chunk, scope, source) is not None:
+                    prepared["duplicate_ids"].append(chunk_id)
+                    continue
+                chunk_metadata = self.duplicate_metadata(chunk_id, chunk_metadata)
+            if chunk_id in old_ids and (records is not None or self.chunk_storage == "inline"):
+                # Unchanged chunk of an edited document: keep its embedding, refresh its position.
+                # Chunks stored as offsets of a file that no longer holds the content are added
+                # again with their text
+                prepared["moved_ids"].append(chunk_id)
+                prepared["moved_metadatas"].append(chunk_metadata)
             else:
-                content = doc.get('content', str(doc))
-                metadata = doc.get('metadata', {"source": f"document_{doc_idx}"})
-            
-            # Split document into chunks with better chunk size
-            chunks = self.chunk_text(content, chunk_size=250)
-            
-            # Create IDs and metadata for each chunk
-            for chunk_idx, chunk in enumerate(chunks):
-                all_chunks.append(chunk)
-                all_ids.append(f"doc_{doc_idx}_chunk_{chunk_idx}")
-                chunk_metadata = metadata.copy()
-                chunk_metadata['chunk_index'] = str(chunk_idx)  # Convert to string for ChromaDB
-                all_metadatas.append(chunk_metadata)
-        
-        if all_chunks:
-            # Create embeddings for all chunks
-            embeddings = self.embedding_model.encode(all_chunks)
-            
-            # Add to ChromaDB collection
-            self.collection.add(
-                embeddings=embeddings.tolist(),
-                documents=all_chunks,
-                metadatas=all_metadatas,
-                ids=all_ids
+                prepared["chunks"].append((chunk_id, chunk, chunk_metadata))
+
+        prepared["entry"] = (source, file_hash, doc_ids, metadata, partition_of(metadata, self.partition_by))
+        return prepared
+
+    def commit_document(self, entry: Tuple[str, str, List[str], Dict, str]) -> None:
+        """Records a written document (the 'entry' of prepare_document) in the manifest and the metadata index."""
+        source, file_hash, chunk_ids, metadata, partition = entry
+        self.manifest.update(source, file_hash, chunk_ids)
+        self.metadata_index.update(source, metadata, partition)
+
+    def forget_chunks(self, chunk_ids: List[str]) -> List[str]:
+        """
+        Removes deleted chunks from the deduplication index. The duplicates of a deleted
+        canonical chunk are not stored anywhere, so their sources are marked as changed
+        and ingested again.
+
+        Args:
+            chunk_ids: IDs of the deleted chunks
+
+        Returns:
+            The IDs of the deleted chunks that are stored in the vector store
+        """
+        if self.deduplicator is None:
+            return list(chunk_ids)
+        stored_ids = [chunk_id for chunk_id in chunk_ids if not self.deduplicator.is_duplicate(chunk_id)]
+        for source, orphan_ids in self.deduplicator.remove(chunk_ids).items():
+            self.manifest.invalidate(source, orphan_ids)
+            self.log.write_log(
+                "vectordb", logging.INFO, f"{len(orphan_ids)} duplicate chunks of {source} lost their canonical chunk, the source will be ingested again"
             )
-            self.log.write_log("vectordb", logging.INFO, f"Added {len(all_chunks)} chunks from {len(documents)} documents to vector database")
-        
-        self.log.write_log("vectordb", logging.INFO, "Documents added to vector database")
+        return stored_ids
+
+    def update_duplicate_metadata(self, page_size: int = 1000) -> None:
+        """Writes the 'duplicate_sources' metadata of the canonical chunks whose duplicates changed."""
+        if self.deduplicator is None:
+            return
+        canonical_ids = self.deduplicator.take_dirty()
+        for start in range(0, len(canonical_ids), page_size):
+            found = self.store.get(ids=canonical_ids[start:start + page_size], include=["metadatas"])
+            metadatas = [self.duplicate_metadata(chunk_id, metadata) for chunk_id, metadata in zip(found["ids"], found["metadatas"])]
+            self.store.update_metadata(found["ids"], metadatas)
+
+    def duplicate_metadata(self, chunk_id: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Returns the metadata of a chunk with the 'duplicate_sources' of a canonical chunk and
+        its 'canonical_id', which lets search filters on the sources of its duplicates match it.
+        """
+        if self.deduplicator is None:
+            return metadata
+        duplicate_sources = self.deduplicator.duplicate_sources(chunk_id)
+        if not duplicate_sources and "duplicate_sources" not in metadata:
+            return metadata
+        return dict(metadata, duplicate_sources=",".join(duplicate_sources), canonical_id=chunk_id)
+
+    def linked_canonical_ids(self, sources: Iterable[str]) -> List[str]:
+        """Returns the canonical chunks the duplicate chunks of the given sources are linked to."""
+        if self.deduplicator is None:
+            return []
+        canonical_ids = set()
+        for source in sources:
+            for chunk_id in self.manifest.chunk_ids(source):
+                canonical_id = self.deduplicator.canonical_of(chunk_id)
+                if canonical_id is not None:
+                    canonical_ids.add(canonical_id)
+        return sorted(canonical_ids)
+
+    def stored_documents(self, texts: List[str], metadatas: List[Dict]) -> List[str]:
+        """Returns the documents written to the vector store: empty for chunks stored as offsets."""
+        return ["" if "chunk_start" in metadata else text for text, metadata in zip(texts, metadatas)]
 
-    def search(self, query: str, n_results: int = 5) -> Dict[str, Any]:
+    def resolve_documents(self, documents: List[str], metadatas: List[Dict]) -> List[str]:
+        """
+        Returns the chunk texts of stored documents, reading the chunks stored as offsets
+        from their memory-mapped source files. A source file that changed since it was
+        ingested is not read: its chunks are returned empty and the source is marked as
+        changed, so the next ingestion stores its chunks again.
+
+        Args:
+            documents: Documents returned by the vector store
+            metadatas: Metadata of the documents
+
+        Returns:
+            The chunk texts
+        """
+        positions = []
+        records = []
+        for position, (document, metadata) in enumerate(zip(documents, metadatas)):
+            record = ChunkRecord.from_metadata(metadata) if not document else None
+            if record is not None:
+                positions.append(position)
+                records.append(record)
+        if not records:
+            return documents
+        documents = list(documents)
+        changed_sources = set()
+        for position, record, text in zip(positions, records, self.text_resolver.resolve(records)):
+            if text is None:
+                changed_sources.add(record.source)
+                text = ""
+            documents[position] = text
+        if changed_sources:
+            for source in sorted(changed_sources):
+                self.manifest.invalidate(source, [])
+                self.log.write_log("vectordb", logging.WARNING, f"{source} changed since it was ingested, its chunks are not read from it until it is ingested again")
+            self.manifest.save()
+        return documents
+
+    def _resolve_results(self, results: Dict[str, Any]) -> Dict[str, Any]:
+        """Resolves the chunk texts of a search result dictionary in place."""
+        if self.chunk_storage != "inline" and results.get("documents"):
+            results["documents"] = [
+                self.resolve_documents(documents, metadatas)
+                for documents, metadatas in zip(results["documents"], results["metadatas"])
+            ]
+        return results
+
+    def invalidate_caches(self) -> None:
+        """Marks every query cache as outdated after the collection changed."""
+        self.generation += 1
+        self.log.write_log("vectordb", logging.INFO, f"Collection changed, query caches invalidated (generation {self.generation})")
+
+    def _reset_collection(self) -> None:
+        """Deletes every chunk of the collection, e.g. after the ingestion settings changed."""
+        self.log.write_log("vectordb", logging.INFO, f"Resetting collection: {self.collection_name}")
+        self.store.clear()
+        self.store.flush()
+        self.manifest.files = {}
+        self.manifest.save()
+        self.lexical_index.clear()
+        self.lexical_index.save()
+        self.metadata_index.clear()
+        self.metadata_index.save()
+        if self.deduplicator is not None:
+            self.deduplicator.clear()
+            self.deduplicator.save()
+        self.invalidate_caches()
+
+    def _rebuild_lexical_index(self, page_size: int = 1000) -> None:
+        """Rebuilds the BM25 index from the documents stored in the collection."""
+        self.log.write_log("vectordb", logging.INFO, "Rebuilding BM25 index from the collection")
+        self.lexical_index.clear()
+        offset = 0
+        while True:
+            page = self.store.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            self.lexical_index.add(page["ids"], self.resolve_documents(page["documents"], page["metadatas"]))
+            offset += len(page["ids"])
+        self.lexical_index.save()
+
+    def _rebuild_metadata_index(self, page_size: int = 1000) -> None:
+        """Rebuilds the metadata index from the chunk metadata stored in the collection."""
+        self.log.write_log("vectordb", logging.INFO, "Rebuilding metadata index from the collection")
+        self.metadata_index.clear()
+        offset = 0
+        while True:
+            page = self.store.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            for metadata in page["metadatas"]:
+                source = metadata.get("source")
+                if source is not None and source not in self.metadata_index.sources:
+                    self.metadata_index.update(source, metadata, partition_of(metadata, self.partition_by))
+            offset += len(page["ids"])
+        self.metadata_index.save()
+
+    def export_snapshot(self, path: str, page_size: int = 1000) -> Dict[str, Any]:
+        """
+        Write every chunk with its embedding, text and metadata, the ingestion manifest and
+        the deduplication index to a portable snapshot file (see src/snapshot.py).
+        Chunks stored as offsets are exported with their text, so the snapshot does not
+        depend on the source files. Do not export while documents are being ingested.
+
+        Args:
+            path: Path of the snapshot file
+            page_size: Number of chunks read from the vector store at a time
+
+        Returns:
+            The header of the snapshot
+        """
+        self.log.write_log("vectordb", logging.INFO, f"Exporting snapshot of {self.collection_name} to {path}")
+        config = {key: value for key, value in self.manifest.config.items() if key in SNAPSHOT_CONFIG_KEYS}
+        writer = SnapshotWriter(path, config, collection=self.collection_name)
+        offset = 0
+        while True:
+            page = self.store.get(include=["documents", "metadatas", "embeddings"], limit=page_size, offset=offset)
+            if not len(page["ids"]):
+                break
+            documents = self.resolve_documents(page["documents"], page["metadatas"])
+            metadatas = [
+                {key: value for key, value in metadata.items() if key not in RECORD_METADATA_KEYS}
+                for metadata in page["metadatas"]
+            ]
+            writer.add(page["ids"], page["embeddings"], documents, metadatas)
+            offset += len(page["ids"])
+        state = {
+            "manifest": self.manifest.files,
+            "deduplication": self.deduplicator.canonicals if self.deduplicator is not None else {},
+        }
+        header = writer.close(state)
+        self.log.write_log("vectordb", logging.INFO, f"Exported {header['count']} chunks to {path}")
+        return header
+
+    def import_snapshot(self, path: str, batch_size: int = 1000) -> Dict[str, Any]:
+        """
+        Replace the collection with the contents of a snapshot file. The stored embeddings
+        are used as they are, so no document is embedded again. The chroma backend still
+        builds its HNSW index from them, which takes most of the import time.
+
+        Every record is validated before the collection is replaced, and a non-empty
+        collection is first exported to a backup snapshot next to it, which is imported
+        back if writing the snapshot fails, so a failed import leaves the collection as
+        it was.
+
+        Args:
+            path: Path of the snapshot file
+            batch_size: Number of chunks written to the vector store at a time
+
+        Returns:
+            Dictionary with the number of imported 'chunks' and 'sources' and the 'seconds' taken
+
+        Raises:
+            ValueError: If the file is not a valid snapshot, or was made with another embedding
+                        model or other ingestion settings
+        """
+        started = time.perf_counter()
+        snapshot = Snapshot(path)
+        snapshot.check_compatible({key: value for key, value in self.manifest.config.items() if key in SNAPSHOT_CONFIG_KEYS})
+        self.log.write_log("vectordb", logging.INFO, f"Importing snapshot {path} ({snapshot.count} chunks) into {self.collection_name}")
+        records = snapshot.read_records()
+        self._check_snapshot_records(snapshot, records)
+
+        backup_path = None
+        if self.store.count():
+            backup_path = os.path.join(self.persist_directory, f"{self.collection_name}.import-backup.snap")
+            self.export_snapshot(backup_path)
+        try:
+            self._load_snapshot(snapshot, records, batch_size)
+        except BaseException as e:
+            self.log.write_log("vectordb", logging.ERROR, f"Importing snapshot {path} failed: {e}")
+            if backup_path is not None:
+                backup = Snapshot(backup_path)
+                self._load_snapshot(backup, backup.read_records(), batch_size)
+                self.log.write_log("vectordb", logging.INFO, f"Restored {self.collection_name} from {backup_path}")
+            else:
+                self._reset_collection()
+            raise
+        finally:
+            if backup_path is not None and os.path.exists(backup_path):
+                os.remove(backup_path)
+        stats = {
+            "chunks": snapshot.count,
+            "sources": len(self.manifest.files),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        self.log.write_log("vectordb", logging.INFO, f"Imported snapshot {path}: {stats}")
+        return stats
+
+    @staticmethod
+    def _check_snapshot_records(snapshot: Snapshot, records: Dict[str, Any]) -> None:
+        """Raises a ValueError if the records of a snapshot cannot be written to the vector store."""
+        ids, documents, metadatas = records.get("ids"), records.get("documents"), records.get("metadatas")
+        if not all(isinstance(values, list) and len(values) == snapshot.count for values in (ids, documents, metadatas)):
+            raise ValueError(f"The snapshot records do not match its {snapshot.count} embeddings")
+        if len(set(ids)) != len(ids) or not all(isinstance(chunk_id, str) for chunk_id in ids):
+            raise ValueError("The snapshot chunk IDs are not unique strings")
+        if not all(isinstance(document, str) for document in documents):
+            raise ValueError("The snapshot chunk texts are not strings")
+        for chunk_id, metadata in zip(ids, metadatas):
+            if not isinstance(metadata, dict) or not all(
+                value is None or isinstance(value, (str, int, float, bool)) for value in metadata.values()
+            ):
+                raise ValueError(f"Invalid metadata of chunk {chunk_id} in the snapshot")
+        state = records.get("state", {})
+        if not isinstance(state, dict) or not isinstance(state.get("manifest", {}), dict):
+            raise ValueError("Invalid ingestion manifest in the snapshot")
+        embeddings = snapshot.embeddings
+        for start in range(0, snapshot.count, 10000):
+            if not np.isfinite(embeddings[start:start + 10000]).all():
+                raise ValueError("The snapshot embeddings are not finite")
+
+    def _load_snapshot(self, snapshot: Snapshot, records: Dict[str, Any], batch_size: int) -> None:
+        """Replaces the collection with the validated records of a snapshot."""
+        self._reset_collection()
+
+        max_batch_size = self.store.max_batch_size
+        if max_batch_size:
+            batch_size = min(batch_size, max_batch_size)
+        state = records.get("state", {})
+        if self.deduplicator is not None:
+            self.deduplicator.restore(state.get("deduplication", {}))
+        embeddings = snapshot.embeddings
+        ids, documents = records["ids"], records["documents"]
+        # Snapshots of older versions lack the 'canonical_id' of the canonical chunks
+        metadatas = [self.duplicate_metadata(chunk_id, metadata) for chunk_id, metadata in zip(ids, records["metadatas"])]
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            self.store.add(ids[start:end], embeddings[start:end].tolist(), documents[start:end], metadatas[start:end])
+            self.lexical_index.add(ids[start:end], documents[start:end])
+        for metadata in metadatas:
+            source = metadata.get("source")
+            if source is not None and source not in self.metadata_index.sources:
+                self.metadata_index.update(source, metadata, partition_of(metadata, self.partition_by))
+
+        self.manifest.files = state.get("manifest", {})
+        if self.deduplicator is not None:
+            self.deduplicator.save()
+        self.store.flush()
+        self.manifest.save()
+        self.lexical_index.save()
+        self.metadata_index.save()
+        self.invalidate_caches()
+
+    def rebalance_shards(self, shards: int, page_size: int = 1000) -> Dict[str, Any]:
+        """
+        Move every chunk to a new set of shards with their stored embeddings, so nothing is
+        embedded again. The old shards are deleted once the new ones are complete; an
+        interrupted rebalance leaves the collection unchanged. Do not rebalance while
+        documents are being ingested or other processes use the collection.
+
+        Args:
+            shards: New shard count (1 turns sharding off)
+            page_size: Number of chunks copied at a time
+
+        Returns:
+            Dictionary with the number of moved 'chunks', the 'previous_shards' and new
+            'shards' count and the 'seconds' taken
+        """
+        if shards < 1:
+            raise ValueError(f"The shard count must be at least 1, got {shards}")
+        started = time.perf_counter()
+        previous = self.shards
+        stats = {"chunks": 0, "previous_shards": previous, "shards": shards, "seconds": 0.0}
+        if shards == previous:
+            return stats
+        self.log.write_log("vectordb", logging.INFO, f"Rebalancing {self.collection_name} from {previous} to {shards} shards")
+
+        target = self._open_store(shards)
+        # Leftovers of an interrupted rebalance
+        target.clear()
+        max_batch_size = target.max_batch_size
+        if max_batch_size:
+            page_size = min(page_size, max_batch_size)
+        offset = 0
+        while True:
+            page = self.store.get(include=["documents", "metadatas", "embeddings"], limit=page_size, offset=offset)
+            if not len(page["ids"]):
+                break
+            embeddings = [np.asarray(embedding, dtype=np.float32).tolist() for embedding in page["embeddings"]]
+            target.add(page["ids"], embeddings, page["documents"], page["metadatas"])
+            offset += len(page["ids"])
+        target.flush()
+        write_shard_count(self.persist_directory, self.collection_name, shards)
+
+        source, self.store, self.shards = self.store, target, shards
+        if isinstance(source, ShardedVectorStore):
+            source.destroy()
+        else:
+            source.clear()
+            source.flush()
+        self.invalidate_caches()
+        stats["chunks"] = offset
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        self.log.write_log("vectordb", logging.INFO, f"Rebalanced {self.collection_name}: {stats}")
+        return stats
+
+    def _open_store(self, shards: int) -> VectorStore:
+        """Opens the vector store of the collection with the given shard count."""
+        if shards > 1:
+            return ShardedVectorStore(self.backend, self.persist_directory, self.collection_name, shards, self.partition_by)
+        return create_store(self.backend, self.persist_directory, self.collection_name, self.partition_by)
+
+    def search(
+        self,
+        query: str,
+        n_results: int = 5,
+        mode: str = "",
+        query_embedding: Optional[np.ndarray] = None,
+        include_embeddings: bool = False,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
         """
         Search for similar documents in the vector database.
 
         Args:
             query: Search query
             n_results: Number of results to return
+            mode: 'dense' for vector search only, 'hybrid' to fuse it with BM25 keyword
+                  search (default: RETRIEVAL_MODE or dense)
+            query_embedding: Already computed embedding of the query, if available
+            include_embeddings: If True, also return the 'embeddings' of the found chunks
+            filters: Only search the chunks of matching documents, e.g. {"tenant": "acme",
+                     "path_prefix": "./data/reports/", "tags": ["finance"], "modified_after": "2024-01-01"}
+                     (keys: source, path_prefix, tags, tenant, modified_after, modified_before)
 
         Returns:
             Dictionary containing search results with keys: 'documents', 'metadatas', 'distances', 'ids'
+            (and 'scores' in hybrid mode)
         """
-        # TODO: Implement similarity search logic
-        # HINT: Use self.embedding_model.encode([query]) to create query embedding
-        # HINT: Convert the embedding to appropriate format for your vector database
-        # HINT: Use your vector database's search/query method with the query embedding and n_results
-        # HINT: Return a dictionary with keys: 'documents', 'metadatas', 'distances', 'ids'
-        # HINT: Handle the case where results might be empty
-
         # Create query embedding
-        query_embedding = self.embedding_model.encode([query])
-        
-        # Search in ChromaDB
-        results = self.collection.query(
-            query_embeddings=query_embedding.tolist(),
-            n_results=n_results
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+        return self.search_many(
+            [query], n_results=n_results, mode=mode, query_embeddings=[query_embedding],
+            include_embeddings=include_embeddings, filters=filters,
+        )[0]
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Create the embedding of a search query, using the query embedding cache.
+
+        Args:
+            query: Search query
+
+        Returns:
+            1D array with the query embedding
+        """
+        return self.embed_queries([query])[0]
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Create the embeddings of several search queries in one forward pass of the model.
+        Queries found in the query embedding cache are not encoded again.
+
+        Args:
+            queries: Search queries
+
+        Returns:
+            2D array with one query embedding per row
+        """
+        generation = self.generation
+        embeddings = [self.query_embedding_cache.get(query, generation) for query in queries]
+        missing = [idx for idx, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            with self.metrics.span("vectordb_query_embedding"):
+                new_embeddings = self.encode([queries[idx] for idx in missing])
+            for row, idx in enumerate(missing):
+                embeddings[idx] = new_embeddings[row]
+                self.query_embedding_cache.put(queries[idx], new_embeddings[row], generation)
+        return np.stack(embeddings) if embeddings else np.zeros((0, 0), dtype=np.float32)
+
+    def search_by_embedding(self, query_embedding: np.ndarray, n_results: int = 5, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Search for similar documents using an already computed query embedding.
+
+        Args:
+            query_embedding: 1D array with the query embedding
+            n_results: Number of results to return
+            filters: Only search the chunks of matching documents (see search())
+
+        Returns:
+            Dictionary containing search results with keys: 'documents', 'metadatas', 'distances', 'ids'
+        """
+        return self.search_many_by_embedding([query_embedding], n_results=n_results, filters=filters)[0]
+
+    def search_many(
+        self,
+        queries: List[str],
+        n_results: int = 5,
+        mode: str = "",
+        query_embeddings: Optional[List[np.ndarray]] = None,
+        include_embeddings: bool = False,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Search for several queries at once: all queries are encoded in one forward pass
+        and sent to the vector store in one query.
+
+        Args:
+            queries: Search queries
+            n_results: Number of results to return per query
+            mode: 'dense' or 'hybrid' (default: RETRIEVAL_MODE or dense)
+            query_embeddings: Already computed embeddings of the queries, if available
+            include_embeddings: If True, also return the 'embeddings' of the found chunks
+            filters: Only search the chunks of matching documents (see search())
+
+        Returns:
+            List of search result dictionaries, one per query, in the format of search()
+        """
+        mode = mode or self.retrieval_mode
+        filters = normalize_filters(filters)
+        self.metrics.inc("vectordb_queries_total", len(queries))
+        with self.metrics.span("vectordb_search"):
+            if query_embeddings is None:
+                query_embeddings = self.embed_queries(queries)
+            query_embeddings = list(query_embeddings)
+            if mode != "hybrid":
+                return self.search_many_by_embedding(
+                    query_embeddings, n_results=n_results, include_embeddings=include_embeddings, filters=filters
+                )
+
+            candidates = max(n_results * 4, int(os.getenv("HYBRID_CANDIDATES", "20")))
+            dense_results = self.search_many_by_embedding(
+                query_embeddings, n_results=candidates, include_embeddings=include_embeddings, resolve_text=False, filters=filters
+            )
+            allowed_ids = self._filtered_chunk_ids(filters) if filters else None
+            with self.metrics.span("vectordb_hybrid_fusion"):
+                return [
+                    self._resolve_results(self._fuse_results(
+                        query, results, n_results, candidates, include_embeddings=include_embeddings, allowed_ids=allowed_ids
+                    ))
+                    for query, results in zip(queries, dense_results)
+                ]
+
+    def _fuse_results(
+        self,
+        query: str,
+        dense_results: Dict[str, Any],
+        n_results: int,
+        candidates: int,
+        rrf_k: int = 60,
+        include_embeddings: bool = False,
+        allowed_ids: Optional[Set[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Merge dense and BM25 results of one query with reciprocal rank fusion.
+
+        Args:
+            query: Search query
+            dense_results: Dense search results of the query
+            n_results: Number of results to return
+            candidates: Number of BM25 candidates to fuse
+            rrf_k: Rank offset of reciprocal rank fusion
+            include_embeddings: If True, also return the 'embeddings' of the fused chunks
+            allowed_ids: If set, only these chunks are considered by the keyword search
+
+        Returns:
+            Search result dictionary with the fused 'scores' and the dense 'distances'
+            (None for chunks found by keyword search only)
+        """
+        found = {}
+        scores = {}
+        if dense_results.get("ids"):
+            for rank, chunk_id in enumerate(dense_results["ids"][0]):
+                found[chunk_id] = (
+                    dense_results["documents"][0][rank],
+                    dense_results["metadatas"][0][rank],
+                    dense_results["distances"][0][rank],
+                    dense_results["embeddings"][0][rank] if include_embeddings else None,
+                )
+                scores[chunk_id] = 1.0 / (rrf_k + rank + 1)
+        for rank, (chunk_id, _) in enumerate(self.lexical_index.search(query, k=candidates, allowed=allowed_ids)):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+
+        top = heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+        missing = [chunk_id for chunk_id, _ in top if chunk_id not in found]
+        if missing:
+            include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+            lexical_only = self.store.get(ids=missing, include=include)
+            for row, chunk_id in enumerate(lexical_only["ids"]):
+                found[chunk_id] = (
+                    lexical_only["documents"][row],
+                    lexical_only["metadatas"][row],
+                    None,
+                    lexical_only["embeddings"][row] if include_embeddings else None,
+                )
+
+        top = [(chunk_id, score) for chunk_id, score in top if chunk_id in found]
+        fused = {
+            "documents": [[found[chunk_id][0] for chunk_id, _ in top]],
+            "metadatas": [[found[chunk_id][1] for chunk_id, _ in top]],
+            "distances": [[found[chunk_id][2] for chunk_id, _ in top]],
+            "ids": [[chunk_id for chunk_id, _ in top]],
+            "scores": [[score for _, score in top]],
+        }
+        if include_embeddings:
+            fused["embeddings"] = [[found[chunk_id][3] for chunk_id, _ in top]]
+        return fused
+
+    def search_many_by_embedding(
+        self,
+        query_embeddings: List[np.ndarray],
+        n_results: int = 5,
+        include_embeddings: bool = False,
+        resolve_text: bool = True,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Search for several already computed query embeddings in one vector store query.
+        Results found in the retrieval cache are not queried again.
+
+        Args:
+            query_embeddings: Query embeddings (1D arrays)
+            n_results: Number of results to return per query
+            include_embeddings: If True, also return the 'embeddings' of the found chunks
+            resolve_text: If False, chunks stored as offsets are returned with empty documents
+            filters: Only search the chunks of matching documents (see search())
+
+        Returns:
+            List of search result dictionaries, one per query embedding
+        """
+        filters = normalize_filters(filters)
+        generation = self.generation
+        scope_key = filter_key(filters)
+        cache_keys = [(embedding_key(embedding), n_results, include_embeddings, scope_key) for embedding in query_embeddings]
+        all_results = []
+        for cache_key in cache_keys:
+            cached = self.retrieval_cache.get(cache_key, generation)
+            all_results.append(copy.deepcopy(cached) if cached is not None else None)
+
+        missing = [idx for idx, results in enumerate(all_results) if results is None]
+        self.metrics.inc("vectordb_retrieval_cache_hits_total", len(all_results) - len(missing))
+        if missing:
+            # Search in the vector store
+            with self.metrics.span("vectordb_store_query"):
+                results = self._query_store(
+                    [np.asarray(query_embeddings[idx]).tolist() for idx in missing],
+                    n_results,
+                    include_embeddings,
+                    filters,
+                )
+            keys = ("documents", "metadatas", "distances", "ids") + (("embeddings",) if include_embeddings else ())
+            for row, idx in enumerate(missing):
+                # Return results in the expected format (lists of lists, one list per query)
+                query_results = {
+                    key: [results[key][row]] if results.get(key) is not None else []
+                    for key in keys
+                }
+                self.retrieval_cache.put(cache_keys[idx], copy.deepcopy(query_results), generation)
+                all_results[idx] = query_results
+        if resolve_text:
+            for results in all_results:
+                self._resolve_results(results)
+        return all_results
+
+    def _query_store(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int,
+        include_embeddings: bool,
+        filters: Optional[Dict[str, Any]],
+    ) -> Dict[str, List]:
+        """
+        Queries the vector store. With filters, only the partitions of the matching sources
+        are searched, restricted to those sources unless every source of a partition matches.
+        The restriction includes the canonical chunks of their deduplicated chunks, which are
+        stored under the source of their canonical chunk (in the same partition).
+        """
+        if filters is None:
+            return self.store.query(query_embeddings=query_embeddings, n_results=n_results, include_embeddings=include_embeddings)
+
+        scope = self.metadata_index.resolve(filters)
+        self.metrics.inc("vectordb_filtered_queries_total", len(query_embeddings))
+        self.metrics.observe("vectordb_filter_partitions", len(scope), SIZE_BUCKETS)
+        if not scope:
+            keys = ("ids", "documents", "metadatas", "distances") + (("embeddings",) if include_embeddings else ())
+            return {key: [[] for _ in query_embeddings] for key in keys}
+        wheres = {}
+        for partition, sources in scope.items():
+            if sources is None:
+                wheres[partition] = None
+                continue
+            where = {"source": {"$in": sources}}
+            canonical_ids = self.linked_canonical_ids(sources)
+            if canonical_ids:
+                where = {"$or": [where, {"canonical_id": {"$in": canonical_ids}}]}
+            wheres[partition] = where
+        if self.partition_by != "none":
+            return self.store.query_partitions(query_embeddings, n_results, wheres, include_embeddings=include_embeddings)
+        return self.store.query(
+            query_embeddings=query_embeddings, n_results=n_results, where=wheres[""], include_embeddings=include_embeddings
         )
-        
-        # Return results in the expected format
-        return {
-            "documents": results.get("documents", []),
-            "metadatas": results.get("metadatas", []),
-            "distances": results.get("distances", []),
-            "ids": results.get("ids", []),
-        }
\ No newline at end of file
+
+    def _filtered_chunk_ids(self, filters: Dict[str, Any]) -> Set[str]:
+        """Returns the IDs of every chunk of the documents matching the filters, with the canonical chunks of their duplicates."""
+        chunk_ids = set()
+        for partition, sources in self.metadata_index.resolve(filters).items():
+            sources = sources if sources is not None else self.metadata_index.partition_sources(partition)
+            for source in sources:
+                chunk_ids.update(self.manifest.chunk_ids(source))
+            chunk_ids.update(self.linked_canonical_ids(sources))
+        return chunk_ids
@@ -0,0 +1,767 @@
+import heapq
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from .logmanager import LogManager
+from .quantization import get_quantizer
+
+"""
+Vector Store Module
+-------------------
+Storage backends of the VectorDB. Every backend stores chunk IDs, embeddings, documents
+and metadata and supports add, delete, query and count.
+
+Backends:
+- ChromaVectorStore: ChromaDB persistent collection (HNSW index, tuned with the
+  CHROMA_HNSW_* settings, see hnsw_settings())
+- NumpyFlatVectorStore: exact search over normalized float16 embeddings kept in a
+  memory-mapped .npy file, scored with one vectorized matrix-vector product. Several
+  worker processes opening the same directory share its pages through the OS page cache.
+- QuantizedFlatVectorStore: flat store with an int8 or binary candidate search in RAM,
+  followed by full-precision rescoring of the candidates
+
+Usage:
+    store = create_vector_store("flat", "./chroma_db", "rag_documents")
+    store.add(ids, embeddings, documents, metadatas)
+    results = store.query(query_embeddings, n_results=5)
+"""
+
+
+# HNSW settings of ChromaDB collections: environment variable -> collection metadata key
+HNSW_SETTINGS = {
+    "CHROMA_HNSW_SPACE": "hnsw:space",
+    "CHROMA_HNSW_M": "hnsw:M",
+    "CHROMA_HNSW_CONSTRUCTION_EF": "hnsw:construction_ef",
+    "CHROMA_HNSW_SEARCH_EF": "hnsw:search_ef",
+}
+# Settings fixed when the index is built; hnsw:search_ef can change on an existing collection
+HNSW_BUILD_KEYS = ("hnsw:space", "hnsw:M", "hnsw:construction_ef")
+
+
+def hnsw_settings() -> Dict[str, Any]:
+    """
+    Returns the HNSW settings configured in the environment as ChromaDB collection metadata.
+    Unset values keep ChromaDB's defaults (l2 space, M=16, construction_ef=100).
+    """
+    settings = {}
+    for variable, key in HNSW_SETTINGS.items():
+        value = os.getenv(variable, "")
+        if value:
+            settings[key] = value if key == "hnsw:space" else int(value)
+    space = settings.get("hnsw:space")
+    if space is not None and space not in ("l2", "cosine", "ip"):
+        raise ValueError(f"Unknown HNSW space: {space}. Use 'l2', 'cosine' or 'ip'")
+    return settings
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluates a ChromaDB-style metadata filter against one metadata dictionary.
+    Supports $and, $or and the operators $eq, $ne, $in, $nin, $gt, $gte, $lt, $lte.
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_where(metadata, sub) for sub in condition):
+                return False
+            continue
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator == "$eq" and value != operand:
+                return False
+            if operator == "$ne" and value == operand:
+                return False
+            if operator == "$in" and value not in operand:
+                return False
+            if operator == "$nin" and value in operand:
+                return False
+            if operator in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if operator == "$gt" and not value > operand:
+                    return False
+                if operator == "$gte" and not value >= operand:
+                    return False
+                if operator == "$lt" and not value < operand:
+                    return False
+                if operator == "$lte" and not value <= operand:
+                    return False
+    return True
+
+
+def merge_query_results(partial: List[Dict[str, List]], queries: int, n_results: int, include_embeddings: bool = False) -> Dict[str, List]:
+    """
+    Merges the query results of several stores into the n_results nearest chunks of every query.
+
+    Args:
+        partial: Query results of every store, in the format of VectorStore.query()
+        queries: Number of query embeddings
+        n_results: Number of results per query
+        include_embeddings: If True, also merge the 'embeddings' of the found chunks
+
+    Returns:
+        Query results in the format of VectorStore.query()
+    """
+    keys = ["ids", "documents", "metadatas", "distances"] + (["embeddings"] if include_embeddings else [])
+    merged = {key: [] for key in keys}
+    for row in range(queries):
+        hits = [
+            (results["distances"][row][rank], part, rank)
+            for part, results in enumerate(partial)
+            for rank in range(len(results["ids"][row]))
+        ]
+        best = heapq.nsmallest(n_results, hits)
+        for key in keys:
+            merged[key].append([partial[part][key][row][rank] for _, part, rank in best])
+    return merged
+
+
+class VectorStore:
+    """
+    Interface of a vector store backend. Query results use ChromaDB's format: a dictionary
+    of lists with one inner list per query embedding.
+    """
+
+    max_batch_size: Optional[int] = None
+
+    def add(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]) -> None:
+        """Adds chunks, replacing existing chunks with the same IDs."""
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]) -> None:
+        """Deletes chunks by ID."""
+        raise NotImplementedError
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]) -> None:
+        """Replaces the metadata of existing chunks."""
+        raise NotImplementedError
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 5, where: Optional[Dict] = None, include_embeddings: bool = False) -> Dict[str, List]:
+        """
+        Returns the nearest chunks of every query embedding ('ids', 'documents', 'metadatas',
+        'distances', and 'embeddings' if include_embeddings is True).
+        """
+        raise NotImplementedError
+
+    def get(self, ids: Optional[List[str]] = None, include: Optional[List[str]] = None, limit: Optional[int] = None, offset: int = 0) -> Dict[str, List]:
+        """Returns chunks by ID, or a page of all chunks if ids is None."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """Returns the number of stored chunks."""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Persists pending changes."""
+
+    def clear(self) -> None:
+        """Deletes every chunk."""
+        ids = self.get(include=[])["ids"]
+        if ids:
+            self.delete(ids)
+
+
+class ChromaVectorStore(VectorStore):
+    """
+    Vector store backed by a ChromaDB persistent collection.
+    """
+
+    def __init__(self, persist_directory: str, collection_name: str, collection_metadata: Optional[Dict] = None):
+        """
+        Initialize the ChromaDB client and get or create the collection.
+
+        Args:
+            persist_directory: Directory of the ChromaDB persistent client
+            collection_name: Name of the ChromaDB collection
+            collection_metadata: Metadata of the collection when it is created, including its
+                                 'hnsw:' index settings
+        """
+        self.log = LogManager()
+        self.log.add_logfile("vectordb")
+        # Initialize ChromaDB client with telemetry disabled
+        import chromadb
+        from chromadb.config import Settings
+        settings = Settings(
+            anonymized_telemetry=False
+        )
+        self.client = chromadb.PersistentClient(path=persist_directory, settings=settings)
+        self.collection_name = collection_name
+        self.collection_metadata = collection_metadata or {"description": "RAG document collection"}
+        self.collection = self.client.get_or_create_collection(name=collection_name, metadata=self.collection_metadata)
+        self.max_batch_size = getattr(self.client, "max_batch_size", None)
+
+        existing = self.collection.metadata or {}
+        changed = [key for key in HNSW_BUILD_KEYS if key in self.collection_metadata and existing.get(key) != self.collection_metadata[key]]
+        if changed:
+            self.log.write_log(
+                "vectordb", logging.WARNING,
+                f"Collection {collection_name} was built with other HNSW settings ({', '.join(changed)}); they apply after clear()",
+            )
+        search_ef = self.collection_metadata.get("hnsw:search_ef")
+        if search_ef is not None and existing.get("hnsw:search_ef") != search_ef:
+            self.set_search_ef(search_ef)
+
+    def add(self, ids, embeddings, documents, metadatas) -> None:
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def delete(self, ids) -> None:
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def update_metadata(self, ids, metadatas) -> None:
+        if ids:
+            self.collection.update(ids=ids, metadatas=metadatas)
+
+    def query(self, query_embeddings, n_results=5, where=None, include_embeddings=False) -> Dict[str, List]:
+        include = ["documents", "metadatas", "distances"] + (["embeddings"] if include_embeddings else [])
+        return self.collection.query(query_embeddings=query_embeddings, n_results=n_results, where=where or None, include=include)
+
+    def get(self, ids=None, include=None, limit=None, offset=0) -> Dict[str, List]:
+        include = ["documents", "metadatas"] if include is None else include
+        if ids is not None:
+            return self.collection.get(ids=ids, include=include)
+        return self.collection.get(include=include, limit=limit, offset=offset)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def clear(self) -> None:
+        """Deletes the collection and creates it again, so changed HNSW settings take effect."""
+        self.client.delete_collection(self.collection_name)
+        self.collection = self.client.get_or_create_collection(name=self.collection_name, metadata=self.collection_metadata)
+
+    def set_search_ef(self, search_ef: int) -> bool:
+        """
+        Changes the search_ef of the existing HNSW index.
+
+        Returns:
+            False if this ChromaDB version cannot change it without rebuilding the collection
+        """
+        try:
+            # ChromaDB >= 1.0 keeps the HNSW settings in the collection configuration
+            self.collection.modify(configuration={"hnsw": {"ef_search": int(search_ef)}})
+        except TypeError:
+            try:
+                self.collection.modify(metadata={**(self.collection.metadata or {}), "hnsw:search_ef": int(search_ef)})
+            except Exception as e:
+                self.log.write_log("vectordb", logging.WARNING, f"search_ef of {self.collection_name} unchanged, it applies after clear(): {str(e)}")
+                return False
+        self.collection_metadata = {**self.collection_metadata, "hnsw:search_ef": int(search_ef)}
+        return True
+
+
+class NumpyFlatVectorStore(VectorStore):
+    """
+    Exact-search vector store over normalized float16 embeddings in a memory-mapped .npy file.
+
+    The store files only grow between compactions, so rows that other processes sharing the
+    directory have loaded never change under them. New and replaced chunks are appended as
+    new rows, a deleted row is left as a hole, and flush() appends the changes (added records,
+    deleted rows, metadata updates) to the records.jsonl log. When more than compaction_ratio
+    of the rows are holes, flush() writes the live rows to a new embeddings file and rewrites
+    the log, each replacing the old file with os.replace().
+
+    float16 halves the memory and disk use, but every query converts the scanned rows to
+    float32. float32 storage skips that conversion, which makes single queries several
+    times faster at twice the size.
+    """
+
+    # Fraction of deleted rows at which flush() compacts the store files
+    compaction_ratio = 0.25
+
+    def __init__(self, store_path: str, query_block_rows: int = 65536, dtype: str = "float16"):
+        """
+        Initialize the store and open the files in store_path if they exist.
+
+        Args:
+            store_path: Directory of the store files
+            query_block_rows: Rows scored at a time, bounds the temporary float32 memory of a query
+            dtype: Storage data type of new stores (float16 or float32); existing stores keep theirs
+        """
+        self.log = LogManager()
+        self.log.add_logfile("vectordb")
+        self.store_path = store_path
+        self.records_path = os.path.join(store_path, "records.jsonl")
+        # Files of stores written before the records log; converted on the next flush()
+        self.legacy_records_path = os.path.join(store_path, "records.json")
+        self.generation = 0
+        self.embeddings_path = self._embeddings_file(self.generation)
+        self.query_block_rows = query_block_rows
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.RLock()
+        self._embeddings = None
+        # Per row; None marks a deleted row
+        self.ids: List[Optional[str]] = []
+        self.documents: List[Optional[str]] = []
+        self.metadatas: List[Optional[Dict]] = []
+        self._rows: Dict[str, int] = {}
+        self._live = np.zeros(0, dtype=bool)
+        self._holes = 0
+        # Changes not yet written to the log
+        self._pending: List[Dict] = []
+        # (inode, size) of the log as far as it has been read or written
+        self._log_state: Optional[Tuple[int, int]] = None
+        self._rewrite_needed = False
+        os.makedirs(store_path, exist_ok=True)
+        self._load()
+
+    def add(self, ids, embeddings, documents, metadatas) -> None:
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            first = len(self.ids)
+            self._ensure_capacity(first + len(ids), vectors.shape[1])
+            self._embeddings[first:first + len(ids)] = vectors
+            self._change({"add": [[chunk_id, document, metadata] for chunk_id, document, metadata in zip(ids, documents, metadatas)]})
+
+    def delete(self, ids) -> None:
+        with self._lock:
+            rows = [self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows]
+            if rows:
+                self._change({"delete": rows})
+
+    def update_metadata(self, ids, metadatas) -> None:
+        with self._lock:
+            updates = [[self._rows[chunk_id], metadata] for chunk_id, metadata in zip(ids, metadatas) if chunk_id in self._rows]
+            if updates:
+                self._change({"metadata": updates})
+
+    def query(self, query_embeddings, n_results=5, where=None, include_embeddings=False) -> Dict[str, List]:
+        self._reload_if_changed()
+        queries = self._normalize(np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1))
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if include_embeddings:
+            results["embeddings"] = []
+        with self._lock:
+            allowed = self._live[:len(self.ids)] if self._holes else None
+            if where:
+                allowed = np.array(
+                    [metadata is not None and matches_where(metadata, where) for metadata in self.metadatas], dtype=bool
+                )
+            k = min(n_results, len(self._rows) if allowed is None else int(allowed.sum()))
+            for rows, similarities in self._search(queries, k, allowed):
+                results["ids"].append([self.ids[row] for row in rows])
+                results["documents"].append([self.documents[row] for row in rows])
+                results["metadatas"].append([self.metadatas[row] for row in rows])
+                # Cosine distance, like ChromaDB's 'cosine' space
+                results["distances"].append([float(1.0 - similarity) for similarity in similarities])
+                if include_embeddings:
+                    results["embeddings"].append(np.asarray(self._embeddings[rows], dtype=np.float32))
+        return results
+
+    def _search(self, queries: np.ndarray, k: int, allowed: Optional[np.ndarray]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Exact search of normalized query embeddings.
+
+        Returns:
+            One (rows, cosine similarities) tuple per query, best first
+        """
+        count = len(self.ids)
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        for start in range(0, count, self.query_block_rows):
+            block = self._embeddings[start:min(start + self.query_block_rows, count)]
+            if block.dtype != np.float32:
+                block = block.astype(np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        if allowed is not None:
+            scores[:, ~allowed] = -np.inf
+        return [self._top_k(query_scores, k) for query_scores in scores]
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the positions and values of the k highest scores, best first."""
+        if k <= 0:
+            return np.array([], dtype=int), np.array([], dtype=np.float32)
+        k = min(k, len(scores))
+        positions = np.argpartition(-scores, k - 1)[:k]
+        positions = positions[np.argsort(-scores[positions])]
+        return positions, scores[positions]
+
+    def get(self, ids=None, include=None, limit=None, offset=0) -> Dict[str, List]:
+        self._reload_if_changed()
+        include = ["documents", "metadatas"] if include is None else include
+        with self._lock:
+            if ids is not None:
+                rows = [self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows]
+            else:
+                live_rows = np.flatnonzero(self._live[:len(self.ids)])
+                end = len(live_rows) if limit is None else offset + limit
+                rows = live_rows[offset:end].tolist()
+            results = {"ids": [self.ids[row] for row in rows]}
+            if "documents" in include:
+                results["documents"] = [self.documents[row] for row in rows]
+            if "metadatas" in include:
+                results["metadatas"] = [self.metadatas[row] for row in rows]
+            if "embeddings" in include:
+                results["embeddings"] = [np.asarray(self._embeddings[row], dtype=np.float32) for row in rows]
+        return results
+
+    def count(self) -> int:
+        self._reload_if_changed()
+        return len(self._rows)
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._pending and not self._rewrite_needed:
+                return
+            if self._rewrite_needed or self._holes > self.compaction_ratio * len(self.ids):
+                self._compact()
+            else:
+                # Rows first: a process reading the log must find the rows of the added records
+                self._embeddings.flush()
+                self._write_log(self._pending)
+            self._pending = []
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _embeddings_file(self, generation: int) -> str:
+        return os.path.join(self.store_path, f"embeddings_{generation}.npy")
+
+    def _change(self, change: Dict) -> None:
+        """Applies a change to the in-memory records and queues it for the log."""
+        self._apply(change)
+        self._pending.append(change)
+
+    def _apply(self, change: Dict) -> None:
+        """
+        Applies a logged change: 'add' appends records ([id, document, metadata]) as new rows
+        (a record with the ID of a stored chunk replaces it), 'delete' and 'metadata' refer to rows.
+        """
+        added = change.get("add", ())
+        if len(self._live) < len(self.ids) + len(added):
+            live = np.zeros(max(1024, len(self.ids) + len(added), 2 * len(self._live)), dtype=bool)
+            live[:len(self._live)] = self._live
+            self._live = live
+        for chunk_id, document, metadata in added:
+            self._remove_row(self._rows.get(chunk_id))
+            self._rows[chunk_id] = len(self.ids)
+            self._live[len(self.ids)] = True
+            self.ids.append(chunk_id)
+            self.documents.append(document)
+            self.metadatas.append(metadata)
+        for row in change.get("delete", ()):
+            self._remove_row(row)
+        for row, metadata in change.get("metadata", ()):
+            self.metadatas[row] = metadata
+
+    def _remove_row(self, row: Optional[int]) -> None:
+        """Turns a row into a hole."""
+        if row is None or self.ids[row] is None:
+            return
+        del self._rows[self.ids[row]]
+        self.ids[row] = self.documents[row] = self.metadatas[row] = None
+        self._live[row] = False
+        self._holes += 1
+
+    def _reset_records(self) -> None:
+        self.ids, self.documents, self.metadatas = [], [], []
+        self._rows = {}
+        self._live = np.zeros(0, dtype=bool)
+        self._holes = 0
+
+    def _write_log(self, changes: List[Dict], rewrite: bool = False) -> None:
+        """Appends changes to the log, or writes a new log (atomically) starting with its header."""
+        lines = "".join(json.dumps(change) + "\n" for change in changes)
+        if rewrite or self._log_state is None:
+            tmp_path = f"{self.records_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                file.write(json.dumps({"generation": self.generation}) + "\n" + lines)
+            os.replace(tmp_path, self.records_path)
+        else:
+            with open(self.records_path, "a", encoding="utf-8") as file:
+                file.write(lines)
+        stat = os.stat(self.records_path)
+        self._log_state = (stat.st_ino, stat.st_size)
+
+    def _compact(self) -> None:
+        """Writes the live rows to the embeddings file of the next generation and rewrites the log."""
+        rows = np.flatnonzero(self._live[:len(self.ids)])
+        previous_path = self.embeddings_path
+        self.generation += 1
+        self.embeddings_path = self._embeddings_file(self.generation)
+        if self._embeddings is not None:
+            tmp_path = f"{self.embeddings_path}.tmp.npy"
+            compacted = np.lib.format.open_memmap(
+                tmp_path, mode="w+", dtype=self.dtype, shape=(max(1024, len(rows)), self._embeddings.shape[1])
+            )
+            for start in range(0, len(rows), self.query_block_rows):
+                block = rows[start:start + self.query_block_rows]
+                compacted[start:start + len(block)] = self._embeddings[block]
+            compacted.flush()
+            del compacted
+            self._embeddings = None
+            os.replace(tmp_path, self.embeddings_path)
+            self._embeddings = np.load(self.embeddings_path, mmap_mode="r+")
+        self._compacted(rows)
+        records = [[self.ids[row], self.documents[row], self.metadatas[row]] for row in rows]
+        self._reset_records()
+        self._apply({"add": records})
+        self._write_log([{"add": records}] if records else [], rewrite=True)
+        self._rewrite_needed = False
+        self.log.write_log("vectordb", logging.INFO, f"Compacted flat vector store {self.store_path}: {len(records)} rows")
+        # Processes that still map the previous files keep reading them until they reload
+        for path in (previous_path, self.legacy_records_path):
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _compacted(self, rows: np.ndarray) -> None:
+        """Called by _compact() with the live rows, in their new order, before the records are rewritten."""
+
+    def _records_loaded(self, first: int) -> None:
+        """Called after records from the first row on were read from the store files."""
+
+    def _load(self) -> None:
+        """Opens the records log and the memory-mapped embeddings of its generation."""
+        if not os.path.exists(self.records_path):
+            self._load_legacy()
+            return
+        with self._lock:
+            # Another process may compact the store while it is read; the log then names a new file
+            for _ in range(3):
+                with open(self.records_path, "rb") as file:
+                    self._reset_records()
+                    self.generation = json.loads(file.readline())["generation"]
+                    self.embeddings_path = self._embeddings_file(self.generation)
+                    self._embeddings = None
+                    try:
+                        self._read_log(file)
+                    except FileNotFoundError:
+                        continue
+                return
+            raise RuntimeError(f"Flat vector store changed while loading: {self.store_path}")
+
+    def _load_legacy(self) -> None:
+        """Opens a store written before the records log (records.json and embeddings.npy)."""
+        legacy_embeddings_path = os.path.join(self.store_path, "embeddings.npy")
+        if not os.path.exists(self.legacy_records_path) or not os.path.exists(legacy_embeddings_path):
+            return
+        with self._lock:
+            with open(self.legacy_records_path, "r", encoding="utf-8") as file:
+                records = json.load(file)
+            self.embeddings_path = legacy_embeddings_path
+            self._embeddings = np.load(self.embeddings_path, mmap_mode="r+")
+            self.dtype = self._embeddings.dtype
+            self._apply({"add": list(zip(records["ids"], records["documents"], records["metadatas"]))})
+            self._records_loaded(0)
+            self._rewrite_needed = True
+
+    def _read_log(self, file) -> None:
+        """Applies the complete change lines of the log from the current position of file."""
+        first = len(self.ids)
+        offset = file.tell()
+        for line in file:
+            if not line.endswith(b"\n"):
+                # Being appended by another process
+                break
+            self._apply(json.loads(line))
+            offset += len(line)
+        self._log_state = (os.fstat(file.fileno()).st_ino, offset)
+        if self.ids and (self._embeddings is None or self._embeddings.shape[0] < len(self.ids)):
+            # New, or grown (replaced) by another process
+            self._embeddings = np.load(self.embeddings_path, mmap_mode="r+")
+            self.dtype = self._embeddings.dtype
+        self._records_loaded(first)
+
+    def _reload_if_changed(self) -> None:
+        """Picks up changes flushed by another process sharing the same store directory."""
+        if self._pending:
+            return
+        try:
+            stat = os.stat(self.records_path)
+        except FileNotFoundError:
+            return
+        if self._log_state == (stat.st_ino, stat.st_size):
+            return
+        with self._lock:
+            if self._log_state is not None and self._log_state[0] == stat.st_ino:
+                with open(self.records_path, "rb") as file:
+                    file.seek(self._log_state[1])
+                    try:
+                        self._read_log(file)
+                        return
+                    except FileNotFoundError:
+                        pass
+            # Compacted by another process
+            self.log.write_log("vectordb", logging.INFO, f"Reloading flat vector store: {self.store_path}")
+            self._load()
+
+    def _ensure_capacity(self, rows: int, dim: int) -> None:
+        """Grows the memory-mapped file (doubling its capacity) so it can hold the given number of rows."""
+        if self._embeddings is not None and self._embeddings.shape[0] >= rows:
+            return
+        capacity = max(1024, rows, 2 * (self._embeddings.shape[0] if self._embeddings is not None else 0))
+        tmp_path = f"{self.embeddings_path}.tmp.npy"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=self.dtype, shape=(capacity, dim))
+        if self._embeddings is not None and self.ids:
+            grown[:len(self.ids)] = self._embeddings[:len(self.ids)]
+        grown.flush()
+        del grown
+        self._embeddings = None
+        os.replace(tmp_path, self.embeddings_path)
+        self._embeddings = np.load(self.embeddings_path, mmap_mode="r+")
+
+
+class QuantizedFlatVectorStore(NumpyFlatVectorStore):
+    """
+    Flat vector store that searches compact int8 or binary codes held in RAM and rescores
+    a small candidate set with the full-precision embeddings of the memory-mapped file.
+    Only the codes and the pages of the candidate rows need to be resident in memory.
+
+    The codes are saved by flush() when they cover twice the rows of the saved file; rows
+    the saved codes miss (and rows other processes add) are quantized when they are loaded.
+    """
+
+    def __init__(self, store_path: str, quantization: str = "int8", rescore_factor: int = 4, dtype: str = "float16"):
+        """
+        Initialize the store.
+
+        Args:
+            store_path: Directory of the store files
+            quantization: 'int8' (scalar) or 'binary' (sign bits, Hamming distance)
+            rescore_factor: Candidates rescored per requested result
+            dtype: Storage data type of the full-precision embeddings
+        """
+        self.quantizer = get_quantizer(quantization)
+        self.rescore_factor = max(1, rescore_factor)
+        self.codes_path = os.path.join(store_path, f"codes_{quantization}.npz")
+        self._codes = None
+        self._scales = None
+        # (generation, rows) of the saved codes
+        self._saved_codes: Optional[Tuple[int, int]] = None
+        super().__init__(store_path, dtype=dtype)
+
+    def add(self, ids, embeddings, documents, metadatas) -> None:
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            first = len(self.ids)
+            super().add(ids, vectors, documents, metadatas)
+            codes, scales = self.quantizer.encode(vectors)
+            self._ensure_code_capacity(len(self.ids), codes.shape[1])
+            self._codes[first:first + len(ids)] = codes
+            self._scales[first:first + len(ids)] = scales
+
+    def flush(self) -> None:
+        with self._lock:
+            super().flush()
+            count = len(self.ids)
+            if self._codes is None or not count:
+                return
+            if self._saved_codes is None or self._saved_codes[0] != self.generation or count >= 2 * self._saved_codes[1]:
+                tmp_path = f"{self.codes_path}.tmp.npz"
+                np.savez(tmp_path, codes=self._codes[:count], scales=self._scales[:count], generation=self.generation)
+                os.replace(tmp_path, self.codes_path)
+                self._saved_codes = (self.generation, count)
+
+    def _search(self, queries, k, allowed):
+        count = len(self.ids)
+        if count == 0 or k <= 0:
+            return [self._top_k(np.array([], dtype=np.float32), 0) for _ in queries]
+        candidates = min(count, k * self.rescore_factor)
+        results = []
+        for query in queries:
+            # Candidate pass over the compact codes
+            approximate = self.quantizer.scores(self._codes[:count], self._scales[:count], query)
+            if allowed is not None:
+                approximate[~allowed] = -np.inf
+            rows, _ = self._top_k(approximate, candidates)
+            if allowed is not None:
+                rows = rows[allowed[rows]]
+
+            # Rescore the candidates with the full-precision embeddings
+            rows = np.sort(rows)
+            exact = np.asarray(self._embeddings[rows], dtype=np.float32) @ query
+            positions, similarities = self._top_k(exact, k)
+            results.append((rows[positions], similarities))
+        return results
+
+    def _compacted(self, rows: np.ndarray) -> None:
+        if self._codes is None:
+            return
+        codes, scales = self._codes[rows], self._scales[rows]
+        self._codes = None
+        self._ensure_code_capacity(len(rows), codes.shape[1])
+        self._codes[:len(rows)] = codes
+        self._scales[:len(rows)] = scales
+
+    def _records_loaded(self, first: int) -> None:
+        count = len(self.ids)
+        if first == 0:
+            self._codes = None
+            if count and os.path.exists(self.codes_path):
+                with np.load(self.codes_path) as data:
+                    # Codes files of older versions have no generation and are quantized again
+                    if "generation" in data.files and int(data["generation"]) == self.generation and len(data["codes"]) <= count:
+                        codes, scales = data["codes"], data["scales"]
+                        self._ensure_code_capacity(count, codes.shape[1])
+                        self._codes[:len(codes)] = codes
+                        self._scales[:len(codes)] = scales
+                        self._saved_codes = (self.generation, len(codes))
+                        first = len(codes)
+        if first >= count:
+            return
+        self.log.write_log("vectordb", logging.INFO, f"Quantizing {count - first} stored embeddings ({self.quantizer.name})")
+        for start in range(first, count, self.query_block_rows):
+            end = min(start + self.query_block_rows, count)
+            codes, scales = self.quantizer.encode(np.asarray(self._embeddings[start:end], dtype=np.float32))
+            self._ensure_code_capacity(count, codes.shape[1])
+            self._codes[start:end] = codes
+            self._scales[start:end] = scales
+
+    def _ensure_code_capacity(self, rows: int, width: int) -> None:
+        """Grows the in-memory code arrays (doubling their capacity) to hold the given number of rows."""
+        if self._codes is not None and len(self._codes) >= rows:
+            return
+        capacity = max(1024, rows, 2 * (len(self._codes) if self._codes is not None else 0))
+        codes = np.zeros((capacity, width), dtype=np.int8 if self.quantizer.name == "int8" else np.uint8)
+        scales = np.ones(capacity, dtype=np.float32)
+        if self._codes is not None:
+            codes[:len(self._codes)] = self._codes
+            scales[:len(self._scales)] = self._scales
+        self._codes, self._scales = codes, scales
+
+
+def create_vector_store(backend: str, persist_directory: str, collection_name: str) -> VectorStore:
+    """
+    Creates the configured vector store backend.
+
+    Args:
+        backend: 'chroma' or 'flat'
+        persist_directory: Root directory of the persistent data
+        collection_name: Name of the collection
+
+    Returns:
+        The vector store
+    """
+    if backend == "chroma":
+        return ChromaVectorStore(
+            persist_directory, collection_name, {"description": "RAG document collection", **hnsw_settings()}
+        )
+    if backend == "flat":
+        store_path = os.path.join(persist_directory, f"flat_{collection_name}")
+        dtype = os.getenv("FLAT_STORE_DTYPE", "float16")
+        quantization = os.getenv("FLAT_STORE_QUANTIZATION", "none")
+        if quantization != "none":
+            return QuantizedFlatVectorStore(
+                store_path,
+                quantization=quantization,
+                rescore_factor=int(os.getenv("QUANTIZATION_RESCORE_FACTOR", "4")),
+                dtype=dtype,
+            )
+        return NumpyFlatVectorStore(store_path, dtype=dtype)
+    raise ValueError(f"Unknown vector store backend: {backend}. Use 'chroma' or 'flat'")
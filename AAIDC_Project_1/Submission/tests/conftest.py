@@ -0,0 +1,119 @@
+import hashlib
+import os
+import sys
+import tempfile
+import types
+import numpy as np
+import pytest
+
+"""
+Test fixtures: a stub sentence-transformers model and VectorDB instances in temporary
+directories. The stub embeds a text as the normalized bag of its hashed words, so texts
+that share words are near each other and no model has to be downloaded.
+
+Usage (from the project directory):
+    python -m pytest tests
+"""
+
+STUB_DIMENSION = 32
+
+# Settings read by VectorDB that must not leak in from the environment or a .env file
+VECTOR_DB_SETTINGS = (
+    "CHROMA_COLLECTION_NAME", "EMBEDDING_MODEL", "EMBEDDING_ENGINE", "EMBEDDING_RUNTIME", "EMBEDDING_WORKERS",
+    "VECTOR_STORE_BACKEND", "FLAT_STORE_DTYPE", "FLAT_STORE_QUANTIZATION", "QUANTIZATION_RESCORE_FACTOR",
+    "PARTITION_BY", "CHUNK_STORAGE", "DEDUPLICATION", "DEDUP_THRESHOLD", "RETRIEVAL_MODE", "INGEST_BATCH_SIZE",
+    "VECTOR_DB_SHARDS", "VECTOR_DB_SNAPSHOT", "CHROMA_HNSW_SPACE", "CHROMA_HNSW_M", "CHROMA_HNSW_CONSTRUCTION_EF",
+    "CHROMA_HNSW_SEARCH_EF", "QUERY_CACHE_SIZE",
+)
+
+
+def stub_embedding(text: str) -> np.ndarray:
+    """Returns the normalized bag of the hashed words of a text."""
+    vector = np.zeros(STUB_DIMENSION, dtype=np.float32)
+    for word in text.lower().split():
+        vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % STUB_DIMENSION] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class StubSentenceTransformer:
+    """Stand-in for sentence_transformers.SentenceTransformer."""
+
+    encoded_texts = 0
+
+    def __init__(self, model_name_or_path: str = "", **kwargs):
+        self.model_name = model_name_or_path
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return STUB_DIMENSION
+
+    def encode(self, texts, batch_size: int = 32, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        StubSentenceTransformer.encoded_texts += len(texts)
+        return np.array([stub_embedding(text) for text in texts], dtype=np.float32).reshape(len(texts), STUB_DIMENSION)
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.modules["sentence_transformers"] = types.SimpleNamespace(SentenceTransformer=StubSentenceTransformer)
+os.environ["ANONYMIZED_TELEMETRY"] = "False"
+
+from src.logmanager import LogManager  # noqa: E402
+
+LogManager.log_files_path = tempfile.mkdtemp(prefix="rag_test_logs_")
+
+
+@pytest.fixture
+def make_vector_db(tmp_path, monkeypatch):
+    """
+    Returns a function creating a VectorDB in a temporary directory. Keyword arguments are
+    VectorDB settings (environment variables); the same directory is reused by every call,
+    so calling it again simulates a restart.
+    """
+    for variable in VECTOR_DB_SETTINGS:
+        monkeypatch.delenv(variable, raising=False)
+    monkeypatch.setenv("VECTOR_DB_PATH", str(tmp_path / "vector_db"))
+    monkeypatch.setenv("EMBEDDING_CACHE_DIR", str(tmp_path / "embedding_cache"))
+    created = []
+
+    def make(collection_name: str = "test_documents", embedding_model: str = "stub-model", **settings):
+        from src.vectordb import VectorDB
+
+        for variable, value in settings.items():
+            monkeypatch.setenv(variable, str(value))
+        vector_db = VectorDB(collection_name, embedding_model)
+        created.append(vector_db)
+        return vector_db
+
+    yield make
+    for vector_db in created:
+        close = getattr(vector_db.store, "close", None)
+        if close is not None:
+            close()
+
+
+def make_documents(sources, paragraphs: int = 6, tenant: str = ""):
+    """Returns documents of distinct paragraphs, long enough for several chunks each."""
+    documents = []
+    for doc_idx, source in enumerate(sources):
+        content = "\n\n".join(
+            f"Document {source} paragraph {idx} covers topic{doc_idx}x{idx} and subject{idx * 7 + doc_idx} "
+            f"with words alpha{doc_idx} beta{idx} gamma{doc_idx + idx} delta{doc_idx * idx} and more text."
+            for idx in range(paragraphs)
+        )
+        metadata = {"source": source}
+        if tenant:
+            metadata["tenant"] = tenant
+        documents.append({"content": content, "metadata": metadata})
+    return documents
+
+
+def assert_same_ranking(results: dict, expected: dict, tolerance: float = 2e-3) -> None:
+    """
+    Checks that two result lists of one query rank alike: the same distances, and the same chunks
+    above the last distance (chunks tied with it may be cut off in any order).
+    """
+    distances, expected_distances = results["distances"][0], expected["distances"][0]
+    assert distances == pytest.approx(expected_distances, abs=tolerance)
+    cutoff = expected_distances[-1] - tolerance
+    assert {chunk_id for chunk_id, distance in zip(results["ids"][0], distances) if distance < cutoff} == {
+        chunk_id for chunk_id, distance in zip(expected["ids"][0], expected_distances) if distance < cutoff
+    }
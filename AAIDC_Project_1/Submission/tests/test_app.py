@@ -0,0 +1,67 @@
+import asyncio
+import os
+import subprocess
+import sys
+import pytest
+from conftest import make_documents
+from benchmarks.fakellm import FakeChatModel
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUESTION = "What does paragraph 2 cover about topic1x2?"
+
+
+@pytest.fixture
+def make_assistant(make_vector_db, monkeypatch):
+    """Returns a function creating a RAGAssistant with a fake LLM over a small corpus."""
+    monkeypatch.chdir(PROJECT_DIR)
+
+    def make(**settings):
+        from src.app import RAGAssistant
+
+        make_vector_db(VECTOR_STORE_BACKEND="flat", EMBEDDING_MODEL="stub-model", QUERY_CACHE_SIZE=0, **settings)
+        assistant = RAGAssistant(llm=FakeChatModel(answer_tokens=12))
+        assistant.add_documents(make_documents(["./data/a.md", "./data/b.md"]))
+        return assistant
+
+    return make
+
+
+def test_async_and_streamed_answers_match_invoke(make_assistant):
+    assistant = make_assistant()
+    answer = assistant.invoke(QUESTION)
+    assert len(answer.split()) == 12
+
+    async def stream():
+        return [token async for token in assistant.astream(QUESTION)]
+
+    tokens = asyncio.run(stream())
+    assert len(tokens) > 1
+    assert "".join(tokens) == answer
+    assert asyncio.run(assistant.ainvoke(QUESTION)) == answer
+
+
+def test_streamed_answer_is_served_from_the_answer_cache(make_assistant):
+    assistant = make_assistant(ANSWER_CACHE_THRESHOLD="0.95")
+
+    async def stream():
+        return [token async for token in assistant.astream(QUESTION)]
+
+    answer = "".join(asyncio.run(stream()))
+    # A cached answer comes back in one piece, without calling the LLM
+    assistant.answer_chain = None
+    assert asyncio.run(stream()) == [answer]
+    assert assistant.invoke(QUESTION) == answer
+
+
+def test_importing_the_app_defers_heavy_modules():
+    heavy = ("chromadb", "sentence_transformers", "torch", "openai", "groq", "langchain_openai", "langchain_groq", "langchain_google_genai", "src.llmrouter")
+    code = f"import sys\nimport src.app\nprint(','.join(name for name in {heavy!r} if name in sys.modules))"
+    completed = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_DIR, capture_output=True, text=True, check=True)
+    assert completed.stdout.strip() == ""
+
+
+def test_embedding_model_is_loaded_on_first_use(make_vector_db):
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND="flat")
+    assert vector_db.embedding_engine._model is None
+    vector_db.search("topic0x1", n_results=1)
+    assert vector_db.embedding_engine._model is not None
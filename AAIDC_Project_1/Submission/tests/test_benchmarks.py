@@ -0,0 +1,35 @@
+import asyncio
+import os
+import pytest
+from langchain_core.messages import HumanMessage
+from benchmarks.corpus import generate_corpus
+from benchmarks.fakellm import FakeChatModel
+
+
+def read_corpus(directory) -> dict:
+    return {name: (directory / name).read_text(encoding="utf-8") for name in sorted(os.listdir(directory))}
+
+
+def test_corpus_is_reproducible_and_sized(tmp_path):
+    files = generate_corpus(str(tmp_path / "first"), size_mb=0.1, file_size_kb=16, seed=7)
+    assert files == len(os.listdir(tmp_path / "first")) == 7
+    corpus = read_corpus(tmp_path / "first")
+    size = sum(len(text) for text in corpus.values())
+    assert 0.1 * 1024 * 1024 <= size < 0.1 * 1024 * 1024 + 16 * 1024
+
+    generate_corpus(str(tmp_path / "second"), size_mb=0.1, file_size_kb=16, seed=7)
+    assert read_corpus(tmp_path / "second") == corpus
+    generate_corpus(str(tmp_path / "other"), size_mb=0.1, file_size_kb=16, seed=8)
+    assert read_corpus(tmp_path / "other") != corpus
+
+
+def test_fake_llm_answers_deterministically():
+    llm = FakeChatModel(answer_tokens=6)
+    answer = llm.invoke([HumanMessage(content="context A")]).content
+    assert len(answer.split()) == 6
+    assert llm.invoke([HumanMessage(content="context A")]).content == answer
+    assert llm.invoke([HumanMessage(content="context B")]).content != answer
+    assert asyncio.run(llm.ainvoke([HumanMessage(content="context A")])).content == answer
+
+    with pytest.raises(RuntimeError):
+        FakeChatModel(failure_probability=1.0).invoke([HumanMessage(content="context A")])
@@ -0,0 +1,55 @@
+import pytest
+from conftest import make_documents
+from src.bm25index import BM25Index, tokenize
+
+TEXTS = {
+    "chunk_1": "Error ERR_4242 is raised by module foo.bar when the cache is full",
+    "chunk_2": "The cache keeps recent embeddings of the corpus",
+    "chunk_3": "Retrieval combines the vector search with keyword search",
+}
+
+
+def make_index(tmp_path) -> BM25Index:
+    index = BM25Index(str(tmp_path / "bm25.json"))
+    index.add(list(TEXTS), list(TEXTS.values()))
+    return index
+
+
+def test_compound_identifiers_are_indexed_whole_and_by_parts():
+    assert tokenize("ERR_4242 in foo.bar-baz") == ["err_4242", "err", "4242", "in", "foo.bar-baz", "foo", "bar", "baz"]
+
+
+def test_search_updates_and_persistence(tmp_path):
+    index = make_index(tmp_path)
+    assert [doc_id for doc_id, _ in index.search("ERR_4242")] == ["chunk_1"]
+    assert [doc_id for doc_id, _ in index.search("4242")] == ["chunk_1"]
+    assert {doc_id for doc_id, _ in index.search("cache", k=5)} == {"chunk_1", "chunk_2"}
+    assert [doc_id for doc_id, _ in index.search("cache", allowed={"chunk_2"})] == ["chunk_2"]
+    index.save()
+
+    reloaded = BM25Index(index.index_path)
+    assert reloaded.search("cache keyword") == pytest.approx(index.search("cache keyword"))
+
+    index.add(["chunk_1"], ["A replaced text without the identifier"])
+    index.remove(["chunk_2"])
+    assert index.search("ERR_4242") == []
+    assert index.search("embeddings") == []
+    assert len(index) == 2
+
+
+def test_hybrid_search_finds_exact_terms(make_vector_db):
+    documents = make_documents(["./data/a.md", "./data/b.md", "./data/c.md"])
+    documents.append({"content": "Troubleshooting: the code XQ-7781 means the upstream timed out.", "metadata": {"source": "./data/errors.md"}})
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND="flat", QUERY_CACHE_SIZE=0)
+    vector_db.add_documents(documents)
+    assert len(vector_db.lexical_index) == vector_db.store.count()
+
+    results = vector_db.search("XQ-7781", n_results=3, mode="hybrid")
+    assert results["metadatas"][0][0]["source"] == "./data/errors.md"
+    assert results["scores"][0] == sorted(results["scores"][0], reverse=True)
+
+    # Deleted chunks leave the lexical index too
+    vector_db.add_documents(documents[:3], prune=True)
+    assert len(vector_db.lexical_index) == vector_db.store.count()
+    results = vector_db.search("XQ-7781", n_results=3, mode="hybrid")
+    assert "./data/errors.md" not in [metadata["source"] for metadata in results["metadatas"][0]]
@@ -0,0 +1,73 @@
+import os
+from conftest import make_documents
+from src.ingestionmanifest import content_hash
+
+QUERY = "paragraph 3 covers topic0x3 and subject21 with words alpha0 beta3 gamma3 delta0"
+
+
+def write_documents(tmp_path, names: list) -> list:
+    """Writes the documents of make_documents() to files and returns them with the file paths as sources."""
+    paths = [str(tmp_path / "data" / name) for name in names]
+    documents = make_documents(paths)
+    os.makedirs(tmp_path / "data", exist_ok=True)
+    for path, doc in zip(paths, documents):
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            file.write(doc["content"])
+    return documents
+
+
+def all_chunks(vector_db, source: str) -> dict:
+    chunk_ids = vector_db.manifest.chunk_ids(source)
+    page = vector_db.store.get(ids=chunk_ids, include=["documents", "metadatas"])
+    return dict(zip(page["ids"], zip(vector_db.resolve_documents(page["documents"], page["metadatas"]), page["metadatas"])))
+
+
+def test_offsets_are_only_stored_for_files_holding_the_content(make_vector_db, tmp_path):
+    documents = write_documents(tmp_path, ["own.md", "foreign.md"])
+    # The same size as the ingested content, other bytes
+    foreign = documents[1]["metadata"]["source"]
+    with open(foreign, "w", encoding="utf-8", newline="") as file:
+        file.write("x" * len(documents[1]["content"]))
+
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND="flat", CHUNK_STORAGE="offsets", QUERY_CACHE_SIZE=0)
+    vector_db.add_documents(documents)
+    for doc in documents:
+        chunks = all_chunks(vector_db, doc["metadata"]["source"])
+        assert chunks
+        for text, metadata in chunks.values():
+            assert text and text in doc["content"]
+            assert ("chunk_start" in metadata) == (doc is documents[0])
+    results = vector_db.search("paragraph 2 covers topic1x2 and subject15 with words alpha1 beta2 gamma3 delta2", n_results=1)
+    assert results["metadatas"][0][0]["source"] == foreign
+    assert "topic1x2" in results["documents"][0][0]
+
+
+def test_chunks_of_a_changed_file_are_refused_and_ingested_again(make_vector_db, tmp_path):
+    documents = write_documents(tmp_path, ["a.md", "b.md"])
+    source = documents[0]["metadata"]["source"]
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND="flat", CHUNK_STORAGE="offsets", QUERY_CACHE_SIZE=0)
+    vector_db.add_documents(documents)
+    assert vector_db.search(QUERY, n_results=1)["documents"][0][0].startswith(f"Document {source} paragraph 3")
+
+    # Rewritten with other bytes of the same size: the stored offsets no longer match
+    changed = documents[0]["content"].replace("paragraph 3 covers", "paragraph 3 COVERS")
+    with open(source, "w", encoding="utf-8", newline="") as file:
+        file.write(changed)
+    results = vector_db.search(QUERY, n_results=1)
+    assert results["metadatas"][0][0]["source"] == source
+    assert results["documents"][0][0] == ""
+    assert not vector_db.manifest.is_current(source, content_hash(documents[0]["content"]))
+
+    documents[0]["content"] = changed
+    stats = vector_db.add_documents(documents)
+    assert stats["skipped_documents"] == 1
+    assert "COVERS" in vector_db.search(QUERY, n_results=1)["documents"][0][0]
+
+    # Touched only: refused until ingested again, then the unchanged chunks are not embedded again
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert vector_db.search(QUERY, n_results=1)["documents"][0][0] == ""
+    stats = vector_db.add_documents(documents)
+    assert stats["skipped_documents"] == 1
+    assert stats["chunks_embedded"] == 0
+    assert all(text for text, _ in all_chunks(vector_db, source).values())
@@ -0,0 +1,50 @@
+import numpy as np
+from src.contextassembler import ContextAssembler, merge_overlapping
+
+FIRST = "The retrieval step returns the chunks closest to the question embedding"
+SECOND = "closest to the question embedding, which the prompt then quotes as context."
+
+
+def results(documents, metadatas=None, embeddings=None) -> dict:
+    found = {"documents": [documents], "metadatas": [metadatas or [{} for _ in documents]]}
+    if embeddings is not None:
+        found["embeddings"] = [embeddings]
+    return found
+
+
+def test_merge_overlapping_keeps_the_shared_text_once():
+    assert merge_overlapping(FIRST, SECOND) == FIRST + SECOND[len("closest to the question embedding"):]
+    assert merge_overlapping("No shared text here", "at all.") == "No shared text here at all."
+
+
+def test_adjacent_chunks_of_a_source_are_merged_in_rank_order():
+    documents = ["Another passage about something else entirely.", SECOND, FIRST]
+    metadatas = [
+        {"source": "b.md", "chunk_index": "0"},
+        {"source": "a.md", "chunk_index": "4"},
+        {"source": "a.md", "chunk_index": "3"},
+    ]
+    context = ContextAssembler(token_budget=0).assemble(results(documents, metadatas))
+    assert context == documents[0] + "\n\n" + merge_overlapping(FIRST, SECOND)
+
+
+def test_near_duplicates_are_dropped_and_mmr_prefers_diverse_chunks():
+    query = np.array([1.0, 0.0, 0.0])
+    embeddings = [[0.9, 0.1, 0.0], [0.9, 0.1, 0.001], [0.8, 0.0, 0.6], [0.7, 0.5, 0.1]]
+    documents = ["best match", "near-duplicate of the best match", "relevant and different", "more relevant, similar to the best match"]
+    assembler = ContextAssembler(token_budget=0, mmr_lambda=0.5, duplicate_threshold=0.99)
+    context = assembler.assemble(results(documents, embeddings=embeddings), query)
+    assert context.split("\n\n") == ["best match", "relevant and different", "more relevant, similar to the best match"]
+
+    # Without embeddings, exact duplicates are dropped and the ranking is kept
+    context = assembler.assemble(results(["a text", "a text", "other text"]))
+    assert context.split("\n\n") == ["a text", "other text"]
+
+
+def test_context_fits_the_token_budget():
+    documents = ["short chunk one", "a much longer chunk " * 40, "short chunk two"]
+    assembler = ContextAssembler(token_budget=40)
+    context = assembler.assemble(results(documents))
+    assert context.split("\n\n") == ["short chunk one", "short chunk two"]
+    assert assembler.count_tokens(context) <= 40
+    assert assembler.assemble(results(documents), max_chunks=1) == "short chunk one"
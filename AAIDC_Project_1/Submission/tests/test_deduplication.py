@@ -0,0 +1,77 @@
+import pytest
+from conftest import make_documents
+
+
+def _copy(document, source, edit=False):
+    content = document["content"]
+    if edit:
+        # One word changed in every paragraph: a near duplicate of every chunk
+        content = "\n\n".join(paragraph.replace("covers", "handles", 1) for paragraph in content.split("\n\n"))
+    return {"content": content, "metadata": dict(document["metadata"], source=source)}
+
+
+@pytest.mark.parametrize("backend", ["flat", "chroma"])
+def test_exact_duplicates_are_linked_not_stored(make_vector_db, backend):
+    original = make_documents(["./data/a.md"])[0]
+    vector_db = make_vector_db(DEDUPLICATION="exact", VECTOR_STORE_BACKEND=backend)
+    stats = vector_db.add_documents([original, _copy(original, "./data/aaa/dup.md")])
+
+    chunks = len(vector_db.manifest.chunk_ids("./data/a.md"))
+    assert stats["chunks_embedded"] == chunks
+    assert stats["chunks_deduplicated"] == chunks
+    assert vector_db.store.count() == chunks
+    stored = vector_db.store.get(include=["metadatas"])
+    assert all(metadata["duplicate_sources"] == "./data/aaa/dup.md" for metadata in stored["metadatas"])
+
+
+@pytest.mark.parametrize("backend", ["flat", "chroma"])
+@pytest.mark.parametrize("mode", ["dense", "hybrid"])
+def test_source_filter_finds_exact_duplicate_document(make_vector_db, backend, mode):
+    documents = make_documents(["./data/a.md", "./data/b.md"])
+    documents.append(_copy(documents[0], "./data/aaa/dup.md"))
+    vector_db = make_vector_db(DEDUPLICATION="exact", VECTOR_STORE_BACKEND=backend)
+    vector_db.add_documents(documents)
+    # The copy owns no stored chunk
+    assert not vector_db.store.get(ids=vector_db.manifest.chunk_ids("./data/aaa/dup.md"), include=[])["ids"]
+
+    results = vector_db.search("paragraph topic0x1 alpha0", n_results=3, mode=mode, filters={"source": "./data/aaa/dup.md"})
+    assert results["ids"][0]
+    for chunk_id, metadata in zip(results["ids"][0], results["metadatas"][0]):
+        assert vector_db.deduplicator.duplicate_sources(chunk_id) == ["./data/aaa/dup.md"]
+        assert metadata["source"] == "./data/a.md"
+
+
+@pytest.mark.parametrize("partition_by", ["none", "tenant"])
+def test_path_prefix_filter_finds_near_duplicate_document(make_vector_db, partition_by):
+    documents = make_documents(["./data/a.md", "./data/b.md"], tenant="acme")
+    documents.append(_copy(documents[0], "./data/sub/copy.md", edit=True))
+    vector_db = make_vector_db(DEDUPLICATION="near", VECTOR_STORE_BACKEND="flat", PARTITION_BY=partition_by)
+    stats = vector_db.add_documents(documents)
+    assert stats["chunks_deduplicated"] > 0
+
+    results = vector_db.search("paragraph topic0x2 alpha0", n_results=5, filters={"path_prefix": "./data/sub/"})
+    assert results["ids"][0]
+    for metadata in results["metadatas"][0]:
+        assert metadata["source"].startswith("./data/sub/") or "./data/sub/copy.md" in metadata["duplicate_sources"].split(",")
+
+
+def test_filters_do_not_match_canonical_chunks_of_other_documents(make_vector_db):
+    documents = make_documents(["./data/a.md", "./data/b.md"])
+    documents.append(_copy(documents[0], "./data/aaa/dup.md"))
+    vector_db = make_vector_db(DEDUPLICATION="exact", VECTOR_STORE_BACKEND="flat")
+    vector_db.add_documents(documents)
+
+    results = vector_db.search("paragraph topic0x1 alpha0", n_results=10, filters={"source": "./data/b.md"})
+    assert results["ids"][0]
+    assert {metadata["source"] for metadata in results["metadatas"][0]} == {"./data/b.md"}
+
+
+def test_filtered_search_after_the_duplicate_document_is_removed(make_vector_db):
+    documents = make_documents(["./data/a.md", "./data/b.md"])
+    vector_db = make_vector_db(DEDUPLICATION="exact", VECTOR_STORE_BACKEND="flat")
+    vector_db.add_documents(documents + [_copy(documents[0], "./data/aaa/dup.md")])
+    vector_db.add_documents(documents, prune=True)
+
+    assert vector_db.search("paragraph topic0x1", n_results=3, filters={"source": "./data/aaa/dup.md"})["ids"][0] == []
+    stored = vector_db.store.get(include=["metadatas"])
+    assert not any(metadata.get("duplicate_sources") for metadata in stored["metadatas"])
@@ -0,0 +1,51 @@
+import os
+import numpy as np
+from conftest import stub_embedding
+from src.embeddingcache import EmbeddingCache
+
+TEXTS = ["first text", "second text", "third text", "fourth text"]
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.encoded = []
+
+    def __call__(self, texts):
+        self.encoded.extend(texts)
+        return np.array([stub_embedding(text) for text in texts])
+
+
+def open_cache(tmp_path, **kwargs) -> EmbeddingCache:
+    return EmbeddingCache("stub-model", cache_dir=str(tmp_path), max_entries=3, dtype="float32", **kwargs)
+
+
+def test_recency_of_hits_survives_a_restart(tmp_path):
+    cache = open_cache(tmp_path)
+    encoder = CountingEncoder()
+    cache.encode(TEXTS[:3], encoder)
+    # A hit makes the first text the most recently used one
+    cache.encode(TEXTS[:1], encoder)
+    cache.flush()
+
+    cache = open_cache(tmp_path)
+    assert len(cache) == 3
+    encoder = CountingEncoder()
+    cache.encode(TEXTS[3:], encoder)
+    embeddings = cache.encode(TEXTS, encoder)
+    # The fourth text evicted the least recently used second text, which is encoded again
+    assert encoder.encoded == [TEXTS[3], TEXTS[1]]
+    assert np.allclose(embeddings, [stub_embedding(text) for text in TEXTS], atol=1e-6)
+
+
+def test_flush_does_not_rewrite_the_index(tmp_path):
+    cache = open_cache(tmp_path, flush_every=2)
+    encoder = CountingEncoder()
+    cache.encode(TEXTS[:2], encoder)
+    index_stat = os.stat(cache.index_path)
+
+    cache.encode(TEXTS[:2], encoder)
+    assert encoder.encoded == TEXTS[:2]
+    # The hits were flushed to the recency array, the index file was left alone
+    assert cache._dirty == 0
+    assert os.stat(cache.index_path).st_mtime_ns == index_stat.st_mtime_ns
+    assert sorted(np.load(cache.used_path)[:2]) == [3, 4]
@@ -0,0 +1,82 @@
+import multiprocessing
+import numpy as np
+import pytest
+from conftest import STUB_DIMENSION, stub_embedding
+from src.embeddingengine import InProcessEngine, MultiProcessEngine, create_embedding_engine, validate_engine
+
+TEXTS = ["a short text", "a somewhat longer text with more words", "x", "medium length text", "another text"]
+
+
+class RecordingQueue:
+    """Task queue wrapper that records the texts of every task."""
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.parts = []
+
+    def put(self, task):
+        if task is not None:
+            self.parts.append(task[2])
+        self.queue.put(task)
+
+
+class NegatedEngine(InProcessEngine):
+    """Engine whose embeddings point the other way, so it fails validation."""
+
+    def _encode(self, texts, batch_size):
+        return -super()._encode(texts, batch_size)
+
+
+def test_create_embedding_engine_reads_the_environment(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_ENGINE", "multiprocess")
+    monkeypatch.setenv("EMBEDDING_RUNTIME", "onnx")
+    engine = create_embedding_engine("stub-model")
+    assert isinstance(engine, MultiProcessEngine)
+    assert engine.fingerprint == "stub-model#onnx"
+
+    engine = create_embedding_engine("stub-model", engine="inprocess", runtime="torch")
+    assert isinstance(engine, InProcessEngine)
+    assert engine.fingerprint == "stub-model"
+    assert not engine.needs_validation
+    with pytest.raises(ValueError):
+        create_embedding_engine("stub-model", engine="threads")
+    with pytest.raises(ValueError):
+        create_embedding_engine("stub-model", runtime="tensorrt")
+
+
+def test_onnx_engine_is_validated_once_against_torch():
+    engine = InProcessEngine("stub-model", "onnx")
+    embeddings = engine.encode(TEXTS)
+    assert embeddings.dtype == np.float32
+    assert np.allclose(embeddings, [stub_embedding(text) for text in TEXTS])
+    assert engine.validation["min_cosine"] == pytest.approx(1.0)
+
+    failing = NegatedEngine("stub-model", "onnx")
+    with pytest.raises(ValueError):
+        validate_engine(failing)
+    # The failed validation is remembered instead of being repeated on every call
+    for _ in range(2):
+        with pytest.raises(ValueError, match="failed validation"):
+            failing.encode(TEXTS)
+    assert failing.validation is None
+
+
+def test_multiprocess_engine_splits_a_batch_and_keeps_the_order(monkeypatch):
+    engine = MultiProcessEngine("stub-model", workers=2, threads_per_worker=1)
+    # Forked workers inherit the stub model of the test process
+    monkeypatch.setattr(engine, "_context", multiprocessing.get_context("fork"))
+    try:
+        embeddings = engine.encode(TEXTS, batch_size=32)
+        assert embeddings.shape == (len(TEXTS), STUB_DIMENSION)
+        assert np.allclose(embeddings, [stub_embedding(text) for text in TEXTS])
+        assert len(engine._processes) == 2
+
+        # One batch is cut into length-sorted parts, one per worker
+        engine._tasks = RecordingQueue(engine._tasks)
+        embeddings = engine.encode(TEXTS, batch_size=32)
+        assert engine._tasks.parts == [["x", "a short text", "another text"], ["medium length text", TEXTS[1]]]
+        assert np.allclose(embeddings, [stub_embedding(text) for text in TEXTS])
+        assert engine.encode([]).shape == (0, 0)
+    finally:
+        engine.close()
+    assert engine._processes == []
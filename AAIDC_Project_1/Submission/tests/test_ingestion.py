@@ -0,0 +1,172 @@
+import pytest
+from conftest import StubSentenceTransformer, make_documents
+from src.documentloader import DocumentLoader
+from src.ingestionpipeline import IngestionPipeline
+
+SOURCES = ["./data/a.md", "./data/b.md", "./data/c.md"]
+
+
+@pytest.mark.parametrize("backend", ["flat", "chroma"])
+def test_unchanged_documents_are_not_ingested_again(make_vector_db, backend):
+    documents = make_documents(SOURCES)
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND=backend)
+    stats = vector_db.add_documents(documents)
+    assert stats["chunks_embedded"] == vector_db.store.count() > 0
+
+    # After a restart
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND=backend)
+    encoded_texts = StubSentenceTransformer.encoded_texts
+    stats = vector_db.add_documents(documents)
+    assert stats["skipped_documents"] == len(SOURCES)
+    assert stats["chunks_embedded"] == stats["chunks_deleted"] == 0
+    assert StubSentenceTransformer.encoded_texts == encoded_texts
+
+
+@pytest.mark.parametrize("backend", ["flat", "chroma"])
+def test_changed_document_replaces_its_chunks(make_vector_db, backend):
+    documents = make_documents(SOURCES)
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND=backend)
+    vector_db.add_documents(documents)
+    old_chunk_ids = set(vector_db.manifest.chunk_ids("./data/b.md"))
+
+    documents[1]["content"] = documents[1]["content"].replace("paragraph 2 covers", "paragraph 2 about zeppelins and lighthouses covers")
+    stats = vector_db.add_documents(documents)
+    assert stats["skipped_documents"] == len(SOURCES) - 1
+    new_chunk_ids = set(vector_db.manifest.chunk_ids("./data/b.md"))
+    assert old_chunk_ids - new_chunk_ids
+    assert stats["chunks_deleted"] == len(old_chunk_ids - new_chunk_ids)
+    assert vector_db.store.count() == sum(len(vector_db.manifest.chunk_ids(source)) for source in SOURCES)
+    assert not vector_db.store.get(ids=list(old_chunk_ids - new_chunk_ids), include=[])["ids"]
+
+    results = vector_db.search("zeppelins and lighthouses", n_results=1)
+    assert results["metadatas"][0][0]["source"] == "./data/b.md"
+    assert "zeppelins" in results["documents"][0][0]
+
+
+@pytest.mark.parametrize("backend", ["flat", "chroma"])
+def test_prune_deletes_removed_documents(make_vector_db, backend):
+    documents = make_documents(SOURCES)
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND=backend)
+    vector_db.add_documents(documents)
+    removed_chunk_ids = vector_db.manifest.chunk_ids("./data/c.md")
+
+    stats = vector_db.add_documents(documents[:2], prune=True)
+    assert stats["chunks_embedded"] == 0
+    assert stats["chunks_deleted"] == len(removed_chunk_ids)
+    assert "./data/c.md" not in vector_db.manifest.files
+    assert not vector_db.store.get(ids=removed_chunk_ids, include=[])["ids"]
+    assert vector_db.search("topic2x1 alpha2", n_results=2, filters={"source": "./data/c.md"})["ids"][0] == []
+
+    # Still deleted after a restart
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND=backend)
+    assert vector_db.store.count() == sum(len(vector_db.manifest.chunk_ids(source)) for source in SOURCES[:2])
+
+
+def test_prune_keeps_sources_that_failed_to_load(make_vector_db, tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for name, doc in zip(["a.md", "b.md"], make_documents(["a", "b"])):
+        (data_dir / name).write_text(doc["content"], encoding="utf-8")
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND="flat")
+    loader = DocumentLoader(str(data_dir), workers=1)
+    vector_db.add_documents(loader.iter_documents(), prune=True, keep_sources=loader.failed_paths)
+    sources = sorted(vector_db.manifest.files)
+    assert len(sources) == 2
+
+    # Not valid utf-8: logged and skipped by the loader, its chunks are kept
+    (data_dir / "b.md").write_bytes(b"\xff\xfe broken")
+    stats = vector_db.add_documents(loader.iter_documents(), prune=True, keep_sources=loader.failed_paths)
+    assert loader.failed_paths == [sources[1]]
+    assert stats["chunks_deleted"] == 0
+    assert sorted(vector_db.manifest.files) == sources
+
+
+def test_prune_refuses_an_empty_or_missing_corpus(make_vector_db, tmp_path):
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND="flat")
+    vector_db.add_documents(make_documents(SOURCES))
+    chunks = vector_db.store.count()
+
+    with pytest.raises(ValueError):
+        vector_db.add_documents(DocumentLoader(str(tmp_path / "missing"), workers=1).iter_documents(), prune=True)
+    with pytest.raises(ValueError):
+        vector_db.add_documents([], prune=True)
+    assert sorted(vector_db.manifest.files) == SOURCES
+    assert vector_db.store.count() == chunks
+
+    stats = vector_db.add_documents([], prune=True, allow_empty_prune=True)
+    assert stats["chunks_deleted"] == chunks
+    assert vector_db.store.count() == 0
+
+
+@pytest.mark.parametrize("backend", ["flat", "chroma"])
+def test_failed_write_leaves_documents_to_ingest_again(make_vector_db, monkeypatch, backend):
+    documents = make_documents(SOURCES)
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND=backend, INGEST_BATCH_SIZE=4)
+    vector_db.add_documents(documents[:1])
+    manifest_files = dict(vector_db.manifest.files)
+
+    def failing_add(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(vector_db.store, "add", failing_add)
+    with pytest.raises(OSError):
+        vector_db.add_documents(documents)
+    assert vector_db.manifest.files == manifest_files
+    assert set(vector_db.metadata_index.sources) == {SOURCES[0]}
+
+    monkeypatch.undo()
+    stats = vector_db.add_documents(documents)
+    assert stats["skipped_documents"] == 1
+    assert vector_db.store.count() == sum(len(vector_db.manifest.chunk_ids(source)) for source in SOURCES)
+    assert vector_db.search("topic2x1 alpha2", n_results=1)["metadatas"][0][0]["source"] == SOURCES[2]
+
+
+def test_loader_skips_chunking_unchanged_files(make_vector_db, tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for name, doc in zip(["a.md", "b.md"], make_documents(["a", "b"])):
+        (data_dir / name).write_text(doc["content"], encoding="utf-8")
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND="flat")
+    chunk_params = {"chunk_size": vector_db.chunk_size, "chunk_overlap": vector_db.chunk_overlap, "workers": 1}
+    vector_db.add_documents(DocumentLoader(str(data_dir), **chunk_params).iter_documents())
+
+    (data_dir / "b.md").write_text("A new text about zeppelins and lighthouses.", encoding="utf-8")
+    loader = DocumentLoader(str(data_dir), known_hashes=vector_db.manifest.hashes(), **chunk_params)
+    documents = list(loader.iter_documents())
+    assert "chunks" not in documents[0]
+    assert documents[1]["chunks"] == ["A new text about zeppelins and lighthouses."]
+    stats = vector_db.add_documents(documents)
+    assert stats["skipped_documents"] == 1
+    assert vector_db.search("zeppelins and lighthouses", n_results=1)["metadatas"][0][0]["source"].endswith("b.md")
+
+
+def test_pipeline_streams_a_lazy_corpus_in_bounded_batches(make_vector_db, monkeypatch):
+    documents = make_documents([f"./data/doc_{idx}.md" for idx in range(40)])
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND="flat")
+    yielded = []
+    written = []
+    add = vector_db.store.add
+
+    def record_add(ids, embeddings, texts, metadatas):
+        # Documents read from the generator before this batch was written
+        written.append((len(ids), len(yielded)))
+        add(ids, embeddings, texts, metadatas)
+
+    def generate():
+        for doc in documents:
+            yielded.append(doc["metadata"]["source"])
+            yield doc
+
+    monkeypatch.setattr(vector_db.store, "add", record_add)
+    reports = []
+    pipeline = IngestionPipeline(vector_db, batch_size=4, queue_size=1, progress_callback=reports.append)
+    stats = pipeline.run(generate())
+
+    assert stats["documents"] == len(documents)
+    assert stats["chunks_embedded"] == vector_db.store.count() == sum(size for size, _ in written)
+    assert stats["batches"] == len(written)
+    assert max(size for size, _ in written) == 4
+    # The first batch was written long before the generator was exhausted
+    assert written[0][1] < len(documents) // 2
+    assert reports[-1] == stats
+    assert sorted(vector_db.manifest.files) == sorted(yielded)
@@ -0,0 +1,87 @@
+import asyncio
+import time
+import pytest
+from benchmarks.fakellm import FakeChatModel
+from src.llmrouter import LLMRouter
+
+PROMPT = "What does the context say?"
+
+
+def make_router(*providers, **settings) -> LLMRouter:
+    return LLMRouter([(f"provider_{idx}", llm) for idx, llm in enumerate(providers)], **settings)
+
+
+def candidate_names(router: LLMRouter, kind: str = "invoke") -> list:
+    return [name for name, _ in router._candidates(kind)]
+
+
+def test_unmeasured_providers_follow_measured_ones_in_configured_order():
+    router = make_router(*(FakeChatModel() for _ in range(4)))
+    assert candidate_names(router) == ["provider_0", "provider_1", "provider_2", "provider_3"]
+
+    router.stats["provider_3"].record_success(0.5, "invoke")
+    router.stats["provider_2"].record_success(0.1, "invoke")
+    assert candidate_names(router) == ["provider_2", "provider_3", "provider_0", "provider_1"]
+
+
+@pytest.mark.parametrize("method", ["invoke", "astream"])
+def test_slow_provider_is_hedged(method):
+    slow = FakeChatModel(latency_seconds=2.0, answer_tokens=4)
+    fast = FakeChatModel(latency_seconds=0.01, answer_tokens=8)
+    router = make_router(slow, fast, hedge_after_ms=50, max_parallel=2)
+
+    started = time.perf_counter()
+    if method == "invoke":
+        answer = router.invoke(PROMPT).content
+    else:
+        answer = "".join(asyncio.run(collect_stream(router)))
+    assert time.perf_counter() - started < 1.0
+    assert len(answer.split()) == 8
+    assert router.hedged_requests == 1
+    # The fast provider is measured now and tried first
+    assert candidate_names(router, "stream" if method == "astream" else "invoke")[0] == "provider_1"
+
+
+async def collect_stream(router: LLMRouter) -> list:
+    return [chunk.content async for chunk in router.astream(PROMPT)]
+
+
+def test_failed_request_fails_over_to_the_next_provider():
+    failing = FakeChatModel(failure_probability=1.0)
+    working = FakeChatModel(answer_tokens=8)
+    router = make_router(failing, working, max_parallel=1)
+    assert len(router.invoke(PROMPT).content.split()) == 8
+    assert len(asyncio.run(router.ainvoke(PROMPT)).content.split()) == 8
+    assert router.provider_stats()["provider_0"]["error_rate"] == 1.0
+    assert router.hedged_requests == 0
+
+    router = make_router(FakeChatModel(failure_probability=1.0), max_parallel=1)
+    with pytest.raises(RuntimeError):
+        router.invoke(PROMPT)
+
+
+def test_circuit_breaker_opens_and_half_opens():
+    flaky = FakeChatModel(failure_probability=1.0)
+    router = make_router(flaky, max_parallel=1, error_rate=0.5, min_requests=2, reset_seconds=0.2)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            router.invoke(PROMPT)
+    assert router.provider_stats()["provider_0"]["circuit_open"]
+    with pytest.raises(RuntimeError, match="unavailable"):
+        router.invoke(PROMPT)
+
+    # Half-open after the reset period: one trial request, whose failure opens it again
+    time.sleep(0.25)
+    stats = router.stats["provider_0"]
+    assert stats.available()
+    with pytest.raises(RuntimeError, match="failed"):
+        router.invoke(PROMPT)
+    assert not stats.available()
+
+    # A successful trial closes it with a clean history
+    time.sleep(0.25)
+    flaky.failure_probability = 0.0
+    router.invoke(PROMPT)
+    assert not router.provider_stats()["provider_0"]["circuit_open"]
+    assert stats.error_rate() == 0.0
+    router.invoke(PROMPT)
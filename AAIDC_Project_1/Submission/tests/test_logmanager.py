@@ -0,0 +1,64 @@
+import datetime
+import logging
+import os
+from src.logmanager import DailyFileHandler, LogManager
+
+
+class FormattedOnce:
+    """Argument that counts how often it is formatted into a message."""
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "formatted"
+
+
+def read_log(name: str) -> str:
+    path = os.path.join(LogManager.log_files_path, f"{name}_{datetime.date.today():%Y-%m-%d}.log")
+    with open(path, "r", encoding="utf-8") as file:
+        return file.read()
+
+
+def test_records_are_written_by_the_writer_thread_once(monkeypatch):
+    monkeypatch.setenv("LOG_LEVEL_TEST_WRITER", "INFO")
+    first, second = LogManager(), LogManager()
+    first.add_logfile("test_writer")
+    second.add_logfile("test_writer")
+    first.add_logfile("test_writer")
+    assert logging.getLogger("test_writer").handlers == [LogManager._queue_handler]
+
+    below_level = FormattedOnce()
+    first.write_log("test_writer", logging.INFO, "Loaded %d chunks", 42)
+    second.write_log("test_writer", logging.DEBUG, "Not written: %s", below_level)
+    # Flushes the queue and stops the writer; the next LogManager starts it again
+    LogManager.shutdown()
+    LogManager()
+
+    lines = read_log("test_writer").splitlines()
+    assert len(lines) == 1
+    assert lines[0].endswith("test_writer - INFO - Loaded 42 chunks")
+    assert below_level.formatted == 0
+
+
+def test_level_is_set_per_log(monkeypatch):
+    monkeypatch.setenv("LOG_LEVEL", "WARNING")
+    monkeypatch.setenv("LOG_LEVEL_TEST_VERBOSE", "DEBUG")
+    log = LogManager()
+    log.add_logfile("test_verbose")
+    log.add_logfile("test_quiet")
+    assert log.is_enabled("test_verbose", logging.DEBUG)
+    assert not log.is_enabled("test_quiet", logging.INFO)
+    assert log.is_enabled("test_quiet", logging.WARNING)
+
+
+def test_daily_file_handler_switches_files_with_the_date(tmp_path):
+    handler = DailyFileHandler(str(tmp_path), "daily")
+    for day in (1, 1, 2):
+        record = logging.LogRecord("daily", logging.INFO, __file__, 1, f"message of day {day}", None, None)
+        record.created = datetime.datetime(2024, 5, day, 12).timestamp()
+        handler.handle(record)
+    handler.close()
+    assert sorted(os.listdir(tmp_path)) == ["daily_2024-05-01.log", "daily_2024-05-02.log"]
+    assert (tmp_path / "daily_2024-05-01.log").read_text(encoding="utf-8").count("message of day 1") == 2
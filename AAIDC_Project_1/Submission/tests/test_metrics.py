@@ -0,0 +1,28 @@
+import urllib.request
+import pytest
+from src import metrics
+
+
+@pytest.fixture
+def prometheus_registry(monkeypatch):
+    """Returns a fresh process-wide registry with the Prometheus exporter on a free port."""
+    monkeypatch.setattr(metrics, "_registry", None)
+    monkeypatch.setenv("METRICS_EXPORTER", "prometheus")
+    monkeypatch.setenv("METRICS_PORT", "0")
+    monkeypatch.delenv("METRICS_HOST", raising=False)
+    registry = metrics.get_metrics()
+    yield registry
+    for exporter in registry.exporters:
+        exporter.server.shutdown()
+        exporter.server.server_close()
+
+
+def test_prometheus_endpoint_listens_on_loopback_by_default(prometheus_registry):
+    exporter = prometheus_registry.exporters[0]
+    host, port = exporter.server.server_address[:2]
+    assert host == "127.0.0.1"
+
+    prometheus_registry.inc("ingest_chunks_embedded_total", 3)
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+        body = response.read().decode("utf-8")
+    assert "ingest_chunks_embedded_total 3" in body
@@ -0,0 +1,56 @@
+import pytest
+from conftest import make_documents
+from src.partitioning import MetadataIndex, normalize_filters, partition_of
+
+
+def test_filters_are_normalized_and_validated():
+    filters = normalize_filters({"source": "./a.md", "path_prefix": "./data//reports/", "tags": ["b", "a", "b"], "modified_after": 10})
+    assert filters == {"source": ["./a.md"], "path_prefix": "data/reports/", "tags": ["a", "b"], "modified_after": 10.0}
+    assert normalize_filters({"tenant": None}) is None
+    with pytest.raises(ValueError):
+        normalize_filters({"author": "me"})
+    with pytest.raises(ValueError):
+        normalize_filters({"modified_before": True})
+
+
+def test_metadata_index_resolves_filters_by_partition(tmp_path):
+    index = MetadataIndex(str(tmp_path / "metadata_index.json"))
+    documents = {
+        "./data/a.md": {"tenant": "acme", "tags": "finance, q1", "mtime": 100},
+        "./data/b.md": {"tenant": "acme", "tags": ["hr"], "mtime": 200},
+        "./data/c.md": {"tenant": "globex", "mtime": 300},
+    }
+    for source, metadata in documents.items():
+        index.update(source, metadata, partition_of(metadata, "tenant"))
+    index.save()
+
+    index = MetadataIndex(index.index_path)
+    # A partition whose every source matches is searched without a source filter
+    assert index.resolve(normalize_filters({"tenant": "acme"})) == {"acme": None}
+    assert index.resolve(normalize_filters({"tags": "finance"})) == {"acme": ["./data/a.md"]}
+    assert index.resolve(normalize_filters({"modified_after": 200})) == {"acme": ["./data/b.md"], "globex": None}
+    assert index.resolve(normalize_filters({"path_prefix": "./other/"})) == {}
+
+
+def test_filtered_search_only_searches_matching_partitions(make_vector_db, monkeypatch):
+    documents = make_documents(["./data/a.md", "./data/b.md"], tenant="acme")
+    documents += make_documents(["./data/c.md"], tenant="globex")
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND="flat", PARTITION_BY="tenant", QUERY_CACHE_SIZE=0)
+    vector_db.add_documents(documents)
+    assert sorted(vector_db.store.partitions) == ["acme", "globex"]
+
+    searched = []
+    query_partitions = vector_db.store.query_partitions
+
+    def record_partitions(query_embeddings, n_results, scopes, include_embeddings=False):
+        searched.append(dict(scopes))
+        return query_partitions(query_embeddings, n_results, scopes, include_embeddings)
+
+    monkeypatch.setattr(vector_db.store, "query_partitions", record_partitions)
+    results = vector_db.search("paragraph 2 covers topic0x2", n_results=5, filters={"tenant": "globex"})
+    assert searched == [{"globex": None}]
+    assert {metadata["source"] for metadata in results["metadatas"][0]} == {"./data/c.md"}
+
+    results = vector_db.search("paragraph 2 covers topic0x2", n_results=5, filters={"source": "./data/b.md"})
+    assert list(searched[-1]) == ["acme"]
+    assert {metadata["source"] for metadata in results["metadatas"][0]} == {"./data/b.md"}
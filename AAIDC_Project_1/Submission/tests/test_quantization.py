@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from conftest import assert_same_ranking, make_documents
+from src.quantization import BinaryQuantizer, Int8Quantizer
+from src.vectorstore import NumpyFlatVectorStore, QuantizedFlatVectorStore
+
+DIMENSION = 64
+
+
+def embeddings(count: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(count, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_int8_scores_approximate_dot_products():
+    vectors, queries = embeddings(200), embeddings(5, seed=1)
+    quantizer = Int8Quantizer()
+    codes, scales = quantizer.encode(vectors)
+    assert codes.dtype == np.int8
+    for query in queries:
+        assert np.abs(quantizer.scores(codes, scales, query) - vectors @ query).max() < 0.02
+
+
+def test_binary_scores_are_negative_hamming_distances():
+    vectors = embeddings(50)
+    quantizer = BinaryQuantizer()
+    codes, scales = quantizer.encode(vectors)
+    assert codes.shape == (50, DIMENSION // 8)
+    expected = -((vectors > 0) != (vectors[7] > 0)).sum(axis=1)
+    assert np.array_equal(quantizer.scores(codes, scales, vectors[7]), expected)
+
+
+@pytest.mark.parametrize("quantization", ["int8", "binary"])
+def test_rescored_results_match_the_float_store(tmp_path, quantization):
+    vectors, queries = embeddings(500), embeddings(10, seed=1)
+    ids = [f"chunk_{idx}" for idx in range(len(vectors))]
+    documents = [f"text of {chunk_id}" for chunk_id in ids]
+    metadatas = [{"source": chunk_id} for chunk_id in ids]
+    float_store = NumpyFlatVectorStore(str(tmp_path / "float"), dtype="float32")
+    float_store.add(ids, vectors.tolist(), documents, metadatas)
+    # Binary codes keep 1 bit per dimension: a larger candidate set makes up for it
+    rescore_factor = 10 if quantization == "int8" else 40
+    store = QuantizedFlatVectorStore(str(tmp_path / quantization), quantization=quantization, rescore_factor=rescore_factor, dtype="float32")
+    store.add(ids, vectors.tolist(), documents, metadatas)
+
+    expected = float_store.query(queries.tolist(), n_results=5)
+    results = store.query(queries.tolist(), n_results=5)
+    recall = np.mean([len(set(found) & set(wanted)) / 5 for found, wanted in zip(results["ids"], expected["ids"])])
+    assert recall >= 0.9
+    # Returned distances are the full-precision ones
+    for row_ids, row_distances, query in zip(results["ids"], results["distances"], queries):
+        rows = [int(chunk_id.split("_")[1]) for chunk_id in row_ids]
+        assert row_distances == pytest.approx((1 - vectors[rows] @ query).tolist(), abs=1e-5)
+
+
+def test_int8_search_ranks_like_chroma(make_vector_db):
+    documents = make_documents([f"./data/doc_{idx}.md" for idx in range(8)])
+    chroma_db = make_vector_db("chroma_documents", VECTOR_STORE_BACKEND="chroma", CHROMA_HNSW_SPACE="cosine", QUERY_CACHE_SIZE=0)
+    chroma_db.add_documents(documents)
+    int8_db = make_vector_db(
+        "int8_documents", VECTOR_STORE_BACKEND="flat", FLAT_STORE_DTYPE="float32",
+        FLAT_STORE_QUANTIZATION="int8", QUANTIZATION_RESCORE_FACTOR=10,
+    )
+    int8_db.add_documents(documents)
+    assert isinstance(int8_db.store, QuantizedFlatVectorStore)
+
+    queries = ["topic3x2 alpha3", "subject20 beta4 gamma5", "Document ./data/doc_6.md paragraph 1", "more text with words"]
+    for chroma_results, int8_results in zip(chroma_db.search_many(queries, n_results=5), int8_db.search_many(queries, n_results=5)):
+        assert_same_ranking(int8_results, chroma_results)
@@ -0,0 +1,53 @@
+import pytest
+from conftest import StubSentenceTransformer, make_documents
+from src.querycache import LRUCache
+
+SOURCES = ["./data/a.md", "./data/b.md", "./data/c.md"]
+
+
+def count_store_queries(vector_db, monkeypatch) -> list:
+    """Counts the queries that reach the vector store."""
+    calls = []
+    query = vector_db.store.query
+
+    def counting_query(*args, **kwargs):
+        calls.append(1)
+        return query(*args, **kwargs)
+
+    monkeypatch.setattr(vector_db.store, "query", counting_query)
+    return calls
+
+
+def test_lru_cache_drops_entries_of_older_generations():
+    cache = LRUCache(4)
+    cache.put("query", "old results", generation=1)
+    assert cache.get("query", generation=1) == "old results"
+    assert cache.get("query", generation=2) is None
+    # A slow request of the previous generation cannot store outdated results
+    cache.put("query", "outdated results", generation=1)
+    assert cache.get("query", generation=2) is None
+
+
+@pytest.mark.parametrize("backend", ["flat", "chroma"])
+def test_ingestion_invalidates_cached_search_results(make_vector_db, monkeypatch, backend):
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND=backend)
+    vector_db.add_documents(make_documents(SOURCES))
+    calls = count_store_queries(vector_db, monkeypatch)
+
+    first = vector_db.search("zeppelins over lighthouses", n_results=2)
+    encoded_texts = StubSentenceTransformer.encoded_texts
+    assert vector_db.search("zeppelins over lighthouses", n_results=2) == first
+    assert len(calls) == 1
+    assert StubSentenceTransformer.encoded_texts == encoded_texts
+
+    generation = vector_db.generation
+    vector_db.add_documents([{"content": "Zeppelins over lighthouses.", "metadata": {"source": "./data/new.md"}}])
+    assert vector_db.generation > generation
+    results = vector_db.search("zeppelins over lighthouses", n_results=2)
+    assert len(calls) == 2
+    assert results["metadatas"][0][0]["source"] == "./data/new.md"
+
+    # Unchanged documents do not invalidate the caches
+    generation = vector_db.generation
+    vector_db.add_documents([{"content": "Zeppelins over lighthouses.", "metadata": {"source": "./data/new.md"}}])
+    assert vector_db.generation == generation
@@ -0,0 +1,16 @@
+import pytest
+from conftest import make_documents
+
+SOURCES = ["./data/a.md", "./data/b.md", "./data/c.md"]
+
+
+@pytest.mark.parametrize("mode", ["dense", "hybrid"])
+def test_search_many_matches_single_searches(make_vector_db, mode):
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND="flat", QUERY_CACHE_SIZE=0)
+    vector_db.add_documents(make_documents(SOURCES))
+    queries = ["topic0x1 alpha0", "subject15 beta2 gamma3", "Document ./data/c.md paragraph 4"]
+    batched = vector_db.search_many(queries, n_results=3, mode=mode)
+    for query, results in zip(queries, batched):
+        single = vector_db.search(query, n_results=3, mode=mode)
+        assert results["ids"] == single["ids"]
+        assert results["distances"][0] == pytest.approx(single["distances"][0])
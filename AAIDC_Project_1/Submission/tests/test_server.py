@@ -0,0 +1,41 @@
+import asyncio
+import types
+import numpy as np
+import pytest
+from src.server import HTTPError, RAGServer
+
+
+def read_request(raw: bytes, max_body_bytes: int = 1024):
+    """Parses raw request bytes with RAGServer._read_request."""
+    assistant = types.SimpleNamespace(vector_db=types.SimpleNamespace(embed_queries=lambda texts: np.zeros((len(texts), 1))))
+    server = RAGServer(assistant, max_body_bytes=max_body_bytes)
+
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await server._read_request(reader)
+
+    return asyncio.run(read())
+
+
+def test_request_with_body():
+    method, path, headers, body = read_request(b'POST /ask?x=1 HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}')
+    assert (method, path, body) == ("POST", "/ask", b"{}")
+
+
+def test_request_without_content_length_has_no_body():
+    assert read_request(b"GET /health HTTP/1.1\r\nHost: x\r\n\r\n")[3] == b""
+
+
+@pytest.mark.parametrize("value", [b"abc", b"-5", b"+5", b"1_0", b"1.5", b"\xb2"])
+def test_invalid_content_length_is_a_bad_request(value):
+    with pytest.raises(HTTPError) as error:
+        read_request(b"POST /ask HTTP/1.1\r\nContent-Length: " + value + b"\r\n\r\n{}")
+    assert error.value.status == 400
+
+
+def test_too_large_body_is_rejected():
+    with pytest.raises(HTTPError) as error:
+        read_request(b"POST /ask HTTP/1.1\r\nContent-Length: 2048\r\n\r\n", max_body_bytes=1024)
+    assert error.value.status == 413
@@ -0,0 +1,54 @@
+import pytest
+from conftest import StubSentenceTransformer, assert_same_ranking, make_documents
+from src.sharding import ShardedVectorStore, read_shard_count, shard_of
+
+SOURCES = [f"./data/{folder}/doc_{idx}.md" for folder in ("a", "b") for idx in range(4)]
+QUERIES = ["topic3x2 alpha3", "subject20 beta4 gamma5", "Document ./data/b/doc_1.md paragraph 1", "more text with words"]
+
+
+def search_all(vector_db, **kwargs) -> list:
+    return [vector_db.search(query, n_results=5, **kwargs) for query in QUERIES]
+
+
+def assert_same_results(results: list, expected: list) -> None:
+    for query_results, expected_results in zip(results, expected):
+        assert_same_ranking(query_results, expected_results)
+
+
+def test_shard_of_is_stable_and_spread():
+    ids = [f"chunk_{idx}" for idx in range(3000)]
+    assignments = [shard_of(chunk_id, 3) for chunk_id in ids]
+    assert assignments == [shard_of(chunk_id, 3) for chunk_id in ids]
+    assert all(900 < assignments.count(shard) < 1100 for shard in range(3))
+
+
+@pytest.mark.parametrize("backend", ["flat", "chroma"])
+def test_rebalance_between_two_and_three_shards_keeps_the_results(make_vector_db, backend):
+    settings = {"VECTOR_STORE_BACKEND": backend, "CHROMA_HNSW_SPACE": "cosine", "QUERY_CACHE_SIZE": 0}
+    vector_db = make_vector_db(VECTOR_DB_SHARDS=2, **settings)
+    vector_db.add_documents(make_documents(SOURCES))
+    assert isinstance(vector_db.store, ShardedVectorStore)
+    chunks = vector_db.store.count()
+    expected = search_all(vector_db)
+    expected_filtered = search_all(vector_db, filters={"path_prefix": "./data/b/"})
+
+    encoded_texts = StubSentenceTransformer.encoded_texts
+    stats = vector_db.rebalance_shards(3)
+    assert stats["chunks"] == chunks
+    assert (stats["previous_shards"], stats["shards"]) == (2, 3)
+    assert StubSentenceTransformer.encoded_texts == encoded_texts
+    assert read_shard_count(vector_db.persist_directory, vector_db.collection_name) == 3
+    assert sum(vector_db.store.shard_counts()) == chunks
+    assert_same_results(search_all(vector_db), expected)
+    assert_same_results(search_all(vector_db, filters={"path_prefix": "./data/b/"}), expected_filtered)
+
+    # Reopened with the stored shard count, whatever VECTOR_DB_SHARDS says
+    vector_db.store.close()
+    vector_db = make_vector_db(VECTOR_DB_SHARDS=2, **settings)
+    assert vector_db.shards == 3
+    assert_same_results(search_all(vector_db), expected)
+
+    vector_db.rebalance_shards(2)
+    assert len(vector_db.store.shard_counts()) == 2
+    assert_same_results(search_all(vector_db), expected)
+    assert vector_db.add_documents(make_documents(SOURCES))["skipped_documents"] == len(SOURCES)
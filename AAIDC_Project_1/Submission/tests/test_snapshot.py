@@ -0,0 +1,109 @@
+import os
+import pytest
+from conftest import StubSentenceTransformer, assert_same_ranking, make_documents
+from src.snapshot import Snapshot, SnapshotWriter
+
+SOURCES = ["./data/a.md", "./data/b.md", "./data/reports/c.md"]
+QUERIES = ["topic0x1 alpha0", "subject15 beta2 gamma3", "Document ./data/reports/c.md paragraph 4"]
+
+
+@pytest.mark.parametrize("replica_backend", ["flat", "chroma"])
+def test_snapshot_round_trip(make_vector_db, tmp_path, replica_backend):
+    source_db = make_vector_db(VECTOR_STORE_BACKEND="flat", FLAT_STORE_DTYPE="float32", DEDUPLICATION="exact")
+    source_db.add_documents(make_documents(SOURCES))
+    path = str(tmp_path / "documents.snap")
+    header = source_db.export_snapshot(path)
+    assert header["count"] == Snapshot(path).count == source_db.store.count()
+
+    replica = make_vector_db(
+        VECTOR_DB_PATH=tmp_path / "replica", VECTOR_STORE_BACKEND=replica_backend, FLAT_STORE_DTYPE="float32",
+        DEDUPLICATION="exact", PARTITION_BY="directory", CHROMA_HNSW_SPACE="cosine",
+    )
+    encoded_texts = StubSentenceTransformer.encoded_texts
+    stats = replica.import_snapshot(path)
+    assert StubSentenceTransformer.encoded_texts == encoded_texts
+    assert stats["chunks"] == replica.store.count() == source_db.store.count()
+    assert stats["sources"] == len(SOURCES)
+
+    for query in QUERIES:
+        expected = source_db.search(query, n_results=3)
+        results = replica.search(query, n_results=3)
+        assert_same_ranking(results, expected)
+        for chunk_id, document in zip(results["ids"][0], results["documents"][0]):
+            assert document == source_db.store.get(ids=[chunk_id])["documents"][0]
+    filtered = replica.search(QUERIES[0], n_results=3, filters={"path_prefix": "./data/reports/"})
+    assert {metadata["source"] for metadata in filtered["metadatas"][0]} == {"./data/reports/c.md"}
+
+    # The imported manifest makes the documents unchanged
+    encoded_texts = StubSentenceTransformer.encoded_texts
+    stats = replica.add_documents(make_documents(SOURCES))
+    assert stats["skipped_documents"] == len(SOURCES)
+    assert StubSentenceTransformer.encoded_texts == encoded_texts
+
+
+@pytest.mark.parametrize("settings", [{"embedding_model": "other-model"}, {"DEDUPLICATION": "near"}])
+def test_snapshot_of_other_settings_is_refused(make_vector_db, tmp_path, settings):
+    source_db = make_vector_db(VECTOR_STORE_BACKEND="flat")
+    source_db.add_documents(make_documents(SOURCES))
+    path = str(tmp_path / "documents.snap")
+    source_db.export_snapshot(path)
+
+    replica = make_vector_db(VECTOR_DB_PATH=tmp_path / "replica", VECTOR_STORE_BACKEND="flat", **settings)
+    replica.add_documents(make_documents(["./data/replica.md"]))
+    with pytest.raises(ValueError):
+        replica.import_snapshot(path)
+    # The collection of the replica is left as it was
+    assert list(replica.manifest.files) == ["./data/replica.md"]
+    assert replica.store.count() == len(replica.manifest.chunk_ids("./data/replica.md"))
+
+
+def replica_with_documents(make_vector_db, tmp_path, backend: str):
+    source_db = make_vector_db(VECTOR_STORE_BACKEND="flat")
+    source_db.add_documents(make_documents(SOURCES))
+    path = str(tmp_path / "documents.snap")
+    source_db.export_snapshot(path)
+
+    replica = make_vector_db(VECTOR_DB_PATH=tmp_path / "replica", VECTOR_STORE_BACKEND=backend, QUERY_CACHE_SIZE=0)
+    replica.add_documents(make_documents(["./data/replica.md"]))
+    return replica, path
+
+
+def assert_replica_unchanged(replica, expected: dict) -> None:
+    assert list(replica.manifest.files) == ["./data/replica.md"]
+    assert replica.store.count() == len(replica.manifest.chunk_ids("./data/replica.md"))
+    assert replica.search("topic0x1 alpha0", n_results=3)["ids"] == expected["ids"]
+
+
+@pytest.mark.parametrize("backend", ["flat", "chroma"])
+def test_failed_import_restores_the_collection(make_vector_db, tmp_path, monkeypatch, backend):
+    replica, path = replica_with_documents(make_vector_db, tmp_path, backend)
+    expected = replica.search("topic0x1 alpha0", n_results=3)
+    store_add = type(replica.store).add
+    calls = []
+
+    def failing_add(store, *args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        store_add(store, *args)
+
+    monkeypatch.setattr(type(replica.store), "add", failing_add)
+    with pytest.raises(OSError):
+        replica.import_snapshot(path, batch_size=4)
+    assert_replica_unchanged(replica, expected)
+    assert not any(name.endswith(".import-backup.snap") for name in os.listdir(replica.persist_directory))
+
+
+def test_invalid_snapshot_records_are_refused_before_the_import(make_vector_db, tmp_path):
+    replica, path = replica_with_documents(make_vector_db, tmp_path, "flat")
+    expected = replica.search("topic0x1 alpha0", n_results=3)
+    snapshot = Snapshot(path)
+    records = snapshot.read_records()
+    records["metadatas"][5] = {"source": "./data/a.md", "tags": ["nested"]}
+    writer = SnapshotWriter(str(tmp_path / "invalid.snap"), snapshot.config)
+    writer.add(records["ids"], snapshot.embeddings, records["documents"], records["metadatas"])
+    writer.close(records["state"])
+
+    with pytest.raises(ValueError):
+        replica.import_snapshot(str(tmp_path / "invalid.snap"))
+    assert_replica_unchanged(replica, expected)
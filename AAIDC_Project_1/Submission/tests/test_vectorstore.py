@@ -0,0 +1,186 @@
+import json
+import os
+import numpy as np
+import pytest
+from conftest import assert_same_ranking, make_documents
+from src.vectorstore import NumpyFlatVectorStore, QuantizedFlatVectorStore, hnsw_settings
+
+DIMENSION = 16
+
+
+def embeddings(count: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(count, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def add_chunks(store, vectors: np.ndarray, first: int = 0) -> list:
+    ids = [f"chunk_{idx}" for idx in range(first, first + len(vectors))]
+    store.add(ids, vectors.tolist(), [f"text of {chunk_id}" for chunk_id in ids], [{"source": chunk_id} for chunk_id in ids])
+    return ids
+
+
+def nearest(store, vector: np.ndarray, n_results: int = 1) -> list:
+    return store.query([vector.tolist()], n_results=n_results)["ids"][0]
+
+
+@pytest.fixture(params=["flat", "int8"])
+def open_store(request, tmp_path):
+    """Returns a function opening the store directory, like a process sharing it would."""
+    def open_store():
+        if request.param == "flat":
+            return NumpyFlatVectorStore(str(tmp_path / "store"), dtype="float32")
+        return QuantizedFlatVectorStore(str(tmp_path / "store"), quantization="int8", rescore_factor=10, dtype="float32")
+    return open_store
+
+
+def test_reader_sees_consistent_rows_after_deletes(open_store):
+    vectors = embeddings(40)
+    writer = open_store()
+    ids = add_chunks(writer, vectors)
+    writer.flush()
+    reader = open_store()
+    assert reader.count() == 40
+
+    # Fewer deletions than the compaction ratio: the rows stay where they are
+    writer.delete(ids[:5])
+    for row in range(40):
+        assert nearest(reader, vectors[row]) == [ids[row]]
+    writer.flush()
+    assert reader.count() == 35
+    for row in range(5, 40):
+        assert nearest(reader, vectors[row]) == [ids[row]]
+    assert reader.get(ids=ids[:5])["ids"] == []
+
+
+def test_compaction_replaces_the_store_files(open_store):
+    vectors = embeddings(40)
+    writer = open_store()
+    ids = add_chunks(writer, vectors)
+    writer.flush()
+    reader = open_store()
+    first_embeddings_path = writer.embeddings_path
+
+    writer.delete(ids[::2])
+    # Until the flush, the reader keeps the rows of the previous files
+    assert nearest(reader, vectors[0]) == [ids[0]]
+    writer.flush()
+    assert writer.embeddings_path != first_embeddings_path
+    assert not os.path.exists(first_embeddings_path)
+    assert writer.count() == reader.count() == 20
+    for row in range(1, 40, 2):
+        assert nearest(writer, vectors[row]) == [ids[row]]
+        assert nearest(reader, vectors[row]) == [ids[row]]
+    assert open_store().get(include=[])["ids"] == ids[1::2]
+
+
+def test_flush_appends_only_the_changes(open_store):
+    writer = open_store()
+    ids = add_chunks(writer, embeddings(40))
+    writer.flush()
+    size = os.path.getsize(writer.records_path)
+    inode = os.stat(writer.records_path).st_ino
+
+    writer.update_metadata([ids[3]], [{"source": "renamed.md"}])
+    writer.flush()
+    assert os.stat(writer.records_path).st_ino == inode
+    with open(writer.records_path, "r", encoding="utf-8") as file:
+        file.seek(size)
+        assert [json.loads(line) for line in file] == [{"metadata": [[3, {"source": "renamed.md"}]]}]
+    assert open_store().get(ids=[ids[3]])["metadatas"] == [{"source": "renamed.md"}]
+
+
+def test_readers_pick_up_added_and_replaced_chunks(open_store):
+    vectors = embeddings(1500)
+    writer = open_store()
+    ids = add_chunks(writer, vectors[:10])
+    writer.flush()
+    reader = open_store()
+    assert reader.count() == 10
+
+    # Grows the embeddings file past its initial capacity
+    ids += add_chunks(writer, vectors[10:], first=10)
+    writer.add([ids[0]], [vectors[1000].tolist()], ["replaced"], [{"source": "replaced.md"}])
+    writer.flush()
+    assert reader.count() == 1500
+    assert nearest(reader, vectors[1200]) == [ids[1200]]
+    assert sorted(nearest(reader, vectors[1000], n_results=2)) == sorted([ids[0], ids[1000]])
+    assert reader.get(ids=[ids[0]])["documents"] == ["replaced"]
+
+
+def test_where_filter_skips_deleted_rows(open_store):
+    vectors = embeddings(20)
+    writer = open_store()
+    ids = add_chunks(writer, vectors)
+    writer.delete([ids[4]])
+    results = writer.query([vectors[4].tolist()], n_results=3, where={"source": {"$in": [ids[4], ids[5]]}})
+    assert results["ids"][0] == [ids[5]]
+
+
+def test_store_of_the_previous_format_is_converted(tmp_path):
+    store_path = tmp_path / "store"
+    store_path.mkdir()
+    vectors = embeddings(10)
+    matrix = np.lib.format.open_memmap(str(store_path / "embeddings.npy"), mode="w+", dtype=np.float16, shape=(1024, DIMENSION))
+    matrix[:10] = vectors
+    matrix.flush()
+    del matrix
+    ids = [f"chunk_{idx}" for idx in range(10)]
+    with open(store_path / "records.json", "w", encoding="utf-8") as file:
+        json.dump({"ids": ids, "documents": ids, "metadatas": [{"source": chunk_id} for chunk_id in ids]}, file)
+
+    store = NumpyFlatVectorStore(str(store_path))
+    assert nearest(store, vectors[7]) == [ids[7]]
+    store.flush()
+    assert sorted(os.listdir(store_path)) == ["embeddings_1.npy", "records.jsonl"]
+    assert nearest(NumpyFlatVectorStore(str(store_path)), vectors[7]) == [ids[7]]
+
+
+@pytest.mark.parametrize("settings", [
+    {"VECTOR_STORE_BACKEND": "flat"},
+    {"VECTOR_STORE_BACKEND": "flat", "FLAT_STORE_DTYPE": "float32"},
+])
+def test_flat_search_ranks_like_chroma(make_vector_db, settings):
+    documents = make_documents([f"./data/doc_{idx}.md" for idx in range(8)])
+    chroma_db = make_vector_db("chroma_documents", VECTOR_STORE_BACKEND="chroma", CHROMA_HNSW_SPACE="cosine", QUERY_CACHE_SIZE=0)
+    chroma_db.add_documents(documents)
+    flat_db = make_vector_db("flat_documents", **settings)
+    flat_db.add_documents(documents)
+    assert flat_db.store.count() == chroma_db.store.count()
+
+    queries = ["topic3x2 alpha3", "subject20 beta4 gamma5", "Document ./data/doc_6.md paragraph 1", "more text with words"]
+    for chroma_results, flat_results in zip(chroma_db.search_many(queries, n_results=5), flat_db.search_many(queries, n_results=5)):
+        assert_same_ranking(flat_results, chroma_results)
+
+
+def test_hnsw_settings_are_read_from_the_environment(monkeypatch):
+    monkeypatch.setenv("CHROMA_HNSW_SPACE", "cosine")
+    monkeypatch.setenv("CHROMA_HNSW_M", "32")
+    monkeypatch.setenv("CHROMA_HNSW_CONSTRUCTION_EF", "")
+    monkeypatch.delenv("CHROMA_HNSW_SEARCH_EF", raising=False)
+    assert hnsw_settings() == {"hnsw:space": "cosine", "hnsw:M": 32}
+    monkeypatch.setenv("CHROMA_HNSW_SPACE", "manhattan")
+    with pytest.raises(ValueError):
+        hnsw_settings()
+
+
+def test_search_ef_applies_in_place_and_build_settings_rebuild(make_vector_db):
+    documents = make_documents(["./data/a.md", "./data/b.md"])
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND="chroma", CHROMA_HNSW_SPACE="cosine", CHROMA_HNSW_M="16")
+    vector_db.add_documents(documents)
+    count = vector_db.store.count()
+    assert count > 0
+
+    # search_ef changes the existing index and keeps its chunks
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND="chroma", CHROMA_HNSW_SPACE="cosine", CHROMA_HNSW_M="16", CHROMA_HNSW_SEARCH_EF="50")
+    assert vector_db.store.count() == count
+    assert vector_db.store.collection_metadata["hnsw:search_ef"] == 50
+    configuration = getattr(vector_db.store.collection, "configuration", None) or {}
+    if "hnsw" in configuration:
+        assert configuration["hnsw"]["ef_search"] == 50
+
+    # A build setting only takes effect in a new index: the collection is reset and rebuilt
+    vector_db = make_vector_db(VECTOR_STORE_BACKEND="chroma", CHROMA_HNSW_SPACE="cosine", CHROMA_HNSW_M="32")
+    assert vector_db.store.count() == 0
+    assert vector_db.store.collection.metadata["hnsw:M"] == 32
+    vector_db.add_documents(documents)
+    assert vector_db.store.count() == count